@@ -0,0 +1,165 @@
+"""
+Compares the size on disk and the write and read throughputs of the tfrecord files, for each compression codec and
+level.
+
+Usage:
+    python -m benchmarks.benchmark_compression
+"""
+import logging
+import os
+import time
+import tempfile
+import numpy as np
+
+import tfrecorder.factory as tf_factory
+import tfrecorder.helpers.engine as engine
+import tfrecorder.helpers.utils as utils
+from unittests.helpers.toy_example_2 import ToyExample2
+
+# (compression type, compression level), the first one being the reference
+COMPRESSIONS = [(None, None),
+                ('ZLIB', 1), ('ZLIB', 6), ('ZLIB', 9),
+                ('GZIP', 1), ('GZIP', 6), ('GZIP', 9)]
+
+
+def generate_spectrogram_examples(directory_path, num_examples=32, data_shape=(512, 128)):
+    """
+    Saves float32 data that compress like magnitude spectrograms (smooth spectral envelope, noisy bins, silences),
+    rather than uniform noise that does not compress at all.
+
+    Args:
+        directory_path: str, where to save the data.
+        num_examples: int
+        data_shape: tuple, number of frames and bins of the source and target data of each example.
+
+    Returns:
+        examples: list, of ToyExample2 objects.
+        kwargs: dict, arguments for their load method.
+    """
+    data_dirpaths = [os.path.join(directory_path, 'src'), os.path.join(directory_path, 'tgt')]
+    for dirpath in data_dirpaths:
+        os.makedirs(dirpath, exist_ok=True)
+
+    num_frames, num_bins = data_shape
+    envelope = np.exp(-np.arange(num_bins) / (num_bins / 8))
+
+    examples = []
+    for i in range(num_examples):
+
+        name = 'example_%d' % i
+        for dirpath in data_dirpaths:
+            data = envelope * np.random.exponential(size=data_shape)
+            data[np.random.random(num_frames) < 0.2] = 0 # silent frames
+            np.save(os.path.join(dirpath, '%s.npy' % name), np.round(data, 3).astype(np.float32))
+
+        examples.append(ToyExample2(str(i), name))
+
+    kwargs = dict(src_data_dirpath=data_dirpaths[0],
+                  tgt_data_dirpath=data_dirpaths[1],
+                  chunk_size_in_bins=128)
+
+    return examples, kwargs
+
+
+def get_directory_size_in_bytes(tfrecord_filepaths):
+    return sum(os.path.getsize(fp) for fp in tfrecord_filepaths)
+
+
+def write(save_directory_path, examples, compression_type, compression_level, **kwargs):
+    """
+    Returns:
+        write_time: float, the time spent writing the examples in tfrecord files, in seconds.
+    """
+    # the examples are released once written, so each write instantiates them again
+    examples = [ToyExample2.from_csv_row(example.to_csv_row()) for example in examples]
+
+    start_time = time.time()
+    engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                          examples,
+                                                          examples_tfrecords_files_max_size_in_bytes=1e8,
+                                                          examples_log_in_csv_file=False,
+                                                          examples_tfrecords_files_compression_type=compression_type,
+                                                          examples_tfrecords_files_compression_level=compression_level,
+                                                          **kwargs)
+    return time.time() - start_time
+
+
+def run_benchmark(num_examples=32, data_shape=(512, 128), compressions=COMPRESSIONS, num_writes=3, num_reads=3):
+    """
+    Writes and reads the same examples with each compression.
+
+    Args:
+        num_examples: int, number of examples to write.
+        data_shape: tuple, shape of the source and target data of each example.
+        compressions: list, of (compression type, compression level) tuples, the first one being the reference for
+                      the throughputs and the compression ratios.
+        num_writes: int, number of times the files are written, the fastest write being kept.
+        num_reads: int, number of times the files are read, the fastest read being kept.
+
+    Returns:
+        results: list, of dict, one per compression.
+    """
+    # only the warnings of the engine
+    utils.get_logger(name=engine.LOGGER_NAME, level=logging.WARNING)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+        examples, kwargs = generate_spectrogram_examples(os.path.join(tmp_directory_path, 'corpus'),
+                                                         num_examples=num_examples,
+                                                         data_shape=data_shape)
+
+        # an untimed write, so that the reference does not pay for warming tensorflow and the engine up
+        write(os.path.join(tmp_directory_path, 'warm_up'), examples, None, None, **kwargs)
+
+        content_size_in_bytes = None
+        for compression_type, compression_level in compressions:
+
+            # the best of a few writes, in fresh directories as they are overwritten otherwise
+            write_time = np.inf
+            for i in range(num_writes):
+                save_directory_path = os.path.join(tmp_directory_path, '%s_%s_%d' % (compression_type, compression_level, i))
+                write_time = min(write_time, write(save_directory_path, examples, compression_type, compression_level,
+                                                   **kwargs))
+
+            tfrecord_filepaths = tf_factory.get_tfrecord_filepaths(save_directory_path)
+            size_in_bytes = get_directory_size_in_bytes(tfrecord_filepaths)
+
+            # the throughputs are given for the uncompressed content, so that they can be compared
+            if content_size_in_bytes is None:
+                content_size_in_bytes = size_in_bytes
+
+            # the best of a few reads, as the first one also warms tensorflow up
+            read_time = None
+            for _ in range(num_reads):
+                start_time = time.time()
+                for _ in tf_factory.generate_dataset(tfrecord_filepaths, ToyExample2):
+                    pass
+                read_time = min(read_time or np.inf, time.time() - start_time)
+
+            results.append({'compression_type': compression_type,
+                            'compression_level': compression_level,
+                            'size_in_bytes': size_in_bytes,
+                            'compression_ratio': content_size_in_bytes / size_in_bytes,
+                            'write_throughput_in_mb_per_s': content_size_in_bytes / write_time / 1e6,
+                            'read_throughput_in_mb_per_s': content_size_in_bytes / read_time / 1e6})
+
+    return results
+
+
+def main():
+
+    results = run_benchmark()
+
+    print('%-6s %-6s %12s %8s %14s %14s' % ('codec', 'level', 'size (MB)', 'ratio', 'write (MB/s)', 'read (MB/s)'))
+    for r in results:
+        print('%-6s %-6s %12.2f %8.2f %14.1f %14.1f' % (r['compression_type'] or 'none',
+                                                         r['compression_level'] if r['compression_level'] is not None else '-',
+                                                         r['size_in_bytes'] / 1e6,
+                                                         r['compression_ratio'],
+                                                         r['write_throughput_in_mb_per_s'],
+                                                         r['read_throughput_in_mb_per_s']))
+
+
+if __name__ == '__main__':
+    main()
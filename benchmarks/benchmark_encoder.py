@@ -0,0 +1,153 @@
+"""
+Compares the time it takes to serialize an example with tensorflow (Example.serialize_to_string), with the python
+encoder dispatching on the dtype of each field (encode_feature, the reference of the unit tests), and with the
+encoder compiled for its class (encoder.encode_example), for a schema of small scalars and for a schema holding an
+array.
+
+Usage:
+    python -m benchmarks.benchmark_encoder
+"""
+import time
+import numpy as np
+
+import tfrecorder.helpers.encoder as encoder
+from tfrecorder.helpers.decorator import tfrecordable
+from tfrecorder.helpers.marshaller import Example
+from unittests.helpers.toy_example_1 import ToyExample1
+from unittests.helpers.test_encoder import encode_feature
+
+
+class ScalarsExample(Example):
+    """
+    An example made of small scalars only, e.g. the metadata of an event.
+    """
+
+    def __init__(self, i):
+        super(ScalarsExample, self).__init__()
+        self.i = i
+
+    @tfrecordable(dtype=Example.Field.TYPE_STRING)
+    def name(self):
+        return 'event_%d' % self.i
+
+    @tfrecordable(dtype=Example.Field.TYPE_BOOL)
+    def is_valid(self):
+        return self.i % 2 == 0
+
+    @tfrecordable(dtype=Example.Field.TYPE_INT32)
+    def label(self):
+        return self.i % 10
+
+    @tfrecordable(dtype=Example.Field.TYPE_INT32)
+    def num_frames(self):
+        return 1000 + self.i
+
+    @tfrecordable(dtype=Example.Field.TYPE_INT64)
+    def timestamp(self):
+        return 1600000000000 + self.i
+
+    @tfrecordable(dtype=Example.Field.TYPE_FLOAT)
+    def likelihood(self):
+        return 0.5
+
+    @tfrecordable(dtype=Example.Field.TYPE_FLOAT)
+    def start_time(self):
+        return 0.1 * self.i
+
+    @tfrecordable(dtype=Example.Field.TYPE_DOUBLE)
+    def duration(self):
+        return 3.25
+
+    def to_csv_row(self):
+        return [self.i]
+
+    @classmethod
+    def from_csv_row(cls, row, **kwargs):
+        return cls(int(row[0]))
+
+
+def encode_example_per_field(example):
+    """
+    Serializes an example with the python encoder, dispatching on the dtype of each field, as before the encoders
+    were compiled.
+    """
+    features = []
+    for k, t in example.get_tfrecordable_ordered_dict().items():
+        map_entry = encoder.encode_length_delimited(encoder.MAP_ENTRY_KEY_TAG, k.encode('utf-8')) + \
+                    encoder.encode_length_delimited(encoder.MAP_ENTRY_VALUE_TAG,
+                                                    encode_feature(t, getattr(example, k), example.Field))
+        features.append(encoder.encode_length_delimited(encoder.FEATURES_FEATURE_TAG, map_entry))
+
+    return encoder.encode_length_delimited(encoder.EXAMPLE_FEATURES_TAG, b''.join(features))
+
+
+# name, serialization function
+SERIALIZERS = [('tensorflow', lambda example: example.serialize_to_string()),
+               ('python per field', encode_example_per_field),
+               ('python compiled', encoder.encode_example)]
+
+
+def get_examples(num_examples=1000, data_shape=(64, 32)):
+    """
+    Returns:
+        examples: dict, list of examples of each schema.
+    """
+    array_examples = []
+    for i in range(num_examples):
+        example = ToyExample1('example_%d' % i, i % 10, 0.5, None)
+        example.data = np.random.random(data_shape).astype(np.float32)
+        array_examples.append(example)
+
+    return {'scalars': [ScalarsExample(i) for i in range(num_examples)],
+            'array %s' % 'x'.join(str(d) for d in data_shape): array_examples}
+
+
+def run_benchmark(num_examples=1000, num_runs=5, serializers=SERIALIZERS):
+    """
+    Serializes the same examples with each serializer.
+
+    Args:
+        num_examples: int, number of examples of each schema.
+        num_runs: int, number of times the examples are serialized, the fastest run being kept.
+        serializers: list, of (name, function) tuples, the first one being the reference for the speedups.
+
+    Returns:
+        results: list, of dict, one per schema and serializer.
+    """
+    results = []
+    for schema, examples in get_examples(num_examples).items():
+
+        reference_time = None
+        for name, serialize in serializers:
+
+            # the sizes are the same whatever the order of the features
+            assert len(serialize(examples[0])) == len(examples[0].serialize_to_string())
+
+            run_time = np.inf
+            for _ in range(num_runs):
+                start_time = time.perf_counter()
+                for example in examples:
+                    serialize(example)
+                run_time = min(run_time, time.perf_counter() - start_time)
+
+            reference_time = reference_time or run_time
+
+            results.append({'schema': schema,
+                            'serializer': name,
+                            'time_per_example_in_us': run_time / len(examples) * 1e6,
+                            'speedup': reference_time / run_time})
+
+    return results
+
+
+def main():
+
+    results = run_benchmark()
+
+    print('%-14s %-18s %14s %8s' % ('schema', 'serializer', 'time (us)', 'speedup'))
+    for r in results:
+        print('%-14s %-18s %14.2f %8.2f' % (r['schema'], r['serializer'], r['time_per_example_in_us'], r['speedup']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Measures the time it takes to import the modules of tfrecorder in a fresh interpreter, and tells whether tensorflow
+is imported with them. Only the modules that actually use tensorflow should import it, when first called.
+
+Usage:
+    python -m benchmarks.benchmark_import
+"""
+import os
+import sys
+import json
+import subprocess
+
+# the modules a worker or a script typically imports, tensorflow being the reference
+MODULES = ['tensorflow',
+           'tfrecorder.helpers.marshaller',
+           'tfrecorder.helpers.engine',
+           'tfrecorder.helpers.reader',
+           'tfrecorder.factory',
+           'tfrecorder.helpers.checker',
+           'unittests.helpers.toy_example_2']
+
+ROOT_DIRECTORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_CODE = '''
+import sys, time, json, importlib
+start_time = time.perf_counter()
+importlib.import_module(%r)
+print(json.dumps([time.perf_counter() - start_time, 'tensorflow' in sys.modules]))
+'''
+
+
+def measure_import_time(module_name):
+    """
+    Imports a module in a fresh interpreter.
+
+    Returns:
+        import_time: float, in seconds.
+        imports_tensorflow: bool
+    """
+    completed_process = subprocess.run([sys.executable, '-c', IMPORT_CODE % module_name],
+                                       cwd=ROOT_DIRECTORY_PATH,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL,
+                                       check=True)
+
+    return tuple(json.loads(completed_process.stdout.decode('utf-8').strip().splitlines()[-1]))
+
+
+def run_benchmark(modules=MODULES, num_runs=3):
+    """
+    Imports each module a few times, each time in a fresh interpreter.
+
+    Args:
+        modules: list, of module names.
+        num_runs: int, number of imports of each module, the fastest being kept.
+
+    Returns:
+        results: list, of dict, one per module.
+    """
+    results = []
+    for module_name in modules:
+
+        import_times = []
+        for _ in range(num_runs):
+            import_time, imports_tensorflow = measure_import_time(module_name)
+            import_times.append(import_time)
+
+        results.append({'module': module_name,
+                        'import_time_in_s': min(import_times),
+                        'imports_tensorflow': imports_tensorflow})
+
+    return results
+
+
+def main():
+
+    results = run_benchmark()
+
+    print('%-36s %16s %12s' % ('module', 'import time (s)', 'tensorflow'))
+    for r in results:
+        print('%-36s %16.3f %12s' % (r['module'], r['import_time_in_s'], 'yes' if r['imports_tensorflow'] else 'no'))
+
+    # the regression the unit tests guard against: tensorflow imported by a module that does not need it
+    if any(r['imports_tensorflow'] for r in results if r['module'] != 'tensorflow'):
+        sys.exit('Some modules import tensorflow.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+Measures the per record cost of Example._to_tf_example_proto, Example.serialize_to_string and Example.parse_from_string
+(in a dataset map, as generate_dataset calls it) for each Example.Field type, and a range of sizes for the strings
+and the arrays. With --update-baselines, the costs are saved as the baselines of this machine, in benchmarks/baselines.
+Otherwise, they are compared with the baselines saved beforehand on this machine, and the run fails if any of them
+regresses beyond a tolerance, or if there are no baselines.
+
+Baselines depend on the machine, so they are not committed (benchmarks/baselines is ignored by git). The benchmarks
+workflow (.github/workflows/benchmarks.yml) records them on the base commit of a pull request, then compares its head
+with them on the same runner. Keep the machine quiet while measuring.
+
+Usage:
+    python -m benchmarks.benchmark_marshaller
+    python -m benchmarks.benchmark_marshaller --tolerance 0.3
+    python -m benchmarks.benchmark_marshaller --update-baselines
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+
+from tfrecorder.helpers.decorator import tfrecordable
+from tfrecorder.helpers.marshaller import Example
+
+BASELINES_FILEPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'benchmark_marshaller.json')
+
+# the number of elements of the strings and the arrays, the scalars having a single size
+SIZES = [16, 1024, 65536]
+
+FUNCTIONS = ['_to_tf_example_proto', 'serialize_to_string', 'parse_from_string']
+
+
+def get_field_types():
+    """
+    Returns:
+        field_types: dict, of name: dtype, of every Example.Field type.
+    """
+    return {k: v for k, v in vars(Example.Field).items() if k.startswith('TYPE_')}
+
+
+def get_example_class(dtype):
+    """
+    Returns:
+        example_class: an Example subclass with a single @tfrecordable attribute of the given dtype.
+    """
+
+    class SingleFieldExample(Example):
+
+        def __init__(self, value):
+            super(SingleFieldExample, self).__init__()
+            self._value = value
+
+        @tfrecordable(dtype=dtype)
+        def value(self):
+            return self._value
+
+        def to_csv_row(self):
+            return []
+
+        @classmethod
+        def from_csv_row(cls, row, **kwargs):
+            raise NotImplementedError('The examples of the benchmark are not saved in csv files.')
+
+    return SingleFieldExample
+
+
+def get_value(dtype, size):
+    """
+    Returns:
+        value: the value of an attribute of the given dtype and size.
+    """
+    Field = Example.Field
+    values = {Field.TYPE_BOOL: True,
+              Field.TYPE_INT32: 123456,
+              Field.TYPE_INT64: 2 ** 40,
+              Field.TYPE_FLOAT: 0.5,
+              Field.TYPE_STRING: 'x' * size,
+              Field.TYPE_ARRAY_INT32: np.arange(size, dtype=np.int32),
+              Field.TYPE_ARRAY_FLOAT32: np.random.random(size).astype(np.float32)}
+
+    return values[dtype]
+
+
+def get_cases(sizes=SIZES):
+    """
+    Returns:
+        cases: list, of (field type name, size) tuples, the size being None for the scalars.
+    """
+    Field = Example.Field
+
+    cases = []
+    for name, dtype in get_field_types().items():
+        if dtype in [Field.TYPE_STRING, Field.TYPE_ARRAY_INT32, Field.TYPE_ARRAY_FLOAT32]:
+            cases += [(name, size) for size in sizes]
+        else:
+            cases.append((name, None))
+
+    return cases
+
+
+def time_per_record(function, num_records, num_runs):
+    """
+    Returns:
+        time: float, the best time of a few runs of the function, in microseconds per record.
+    """
+    run_time = np.inf
+    for _ in range(num_runs):
+        start_time = time.perf_counter()
+        function()
+        run_time = min(run_time, time.perf_counter() - start_time)
+
+    return run_time / num_records * 1e6
+
+
+def get_case_functions(field_type_name, size):
+    """
+    Builds the records of a field type and size, and the functions processing them.
+
+    Returns:
+        num_records: int
+        functions: dict, of function name: function processing all the records.
+    """
+    import tensorflow as tf
+
+    dtype = get_field_types()[field_type_name]
+    example_class = get_example_class(dtype)
+
+    # fewer records for the large ones
+    num_records = 1000 if size is None or size <= 1024 else 100
+    examples = [example_class(get_value(dtype, size or 1)) for _ in range(num_records)]
+    serialized_examples = [e.serialize_to_string() for e in examples]
+
+    # the parsed records are batched so that the cost of iterating the dataset in python does not hide theirs
+    dataset = tf.data.Dataset.from_tensor_slices(serialized_examples).map(example_class.parse_from_string).batch(100)
+
+    def to_tf_example_proto():
+        for e in examples:
+            e._to_tf_example_proto()
+
+    def serialize_to_string():
+        for e in examples:
+            e.serialize_to_string()
+
+    def parse_from_string():
+        for _ in dataset:
+            pass
+
+    return num_records, {'_to_tf_example_proto': to_tf_example_proto,
+                         'serialize_to_string': serialize_to_string,
+                         'parse_from_string': parse_from_string}
+
+
+def run_benchmark(sizes=SIZES, num_runs=5):
+    """
+    Measures the per record cost of each function, for each field type and size.
+
+    Args:
+        sizes: list, of number of elements of the strings and the arrays.
+        num_runs: int, number of times each function is run on the records, the fastest run being kept.
+
+    Returns:
+        results: list, of dict, one per function, field type and size.
+    """
+    results = []
+    for field_type_name, size in get_cases(sizes):
+
+        num_records, functions = get_case_functions(field_type_name, size)
+
+        for function_name in FUNCTIONS:
+            results.append({'function': function_name,
+                            'field_type': field_type_name,
+                            'size': size,
+                            'time_per_record_in_us': time_per_record(functions[function_name], num_records, num_runs)})
+
+    return results
+
+
+def remeasure(result, num_runs=5):
+    """
+    Measures a result again, keeping the best of both measures: the cost of a record varies a lot on a busy machine.
+    """
+    num_records, functions = get_case_functions(result['field_type'], result['size'])
+    time_per_record_in_us = time_per_record(functions[result['function']], num_records, num_runs)
+
+    return dict(result, time_per_record_in_us=min(result['time_per_record_in_us'], time_per_record_in_us))
+
+
+def get_result_key(result):
+    return '%s %s %s' % (result['function'], result['field_type'], result['size'] or '-')
+
+
+def compare_with_baselines(results, baselines, tolerance, num_retries=2):
+    """
+    Args:
+        results: list, of dict.
+        baselines: dict, of result key: time per record.
+        tolerance: float, relative increase of the time per record beyond which a result is a regression.
+        num_retries: int, number of times a result beyond the tolerance is measured again before it is reported as a
+                     regression.
+
+    Returns:
+        regressions: list, of (result, baseline time per record) tuples.
+    """
+    regressions = []
+    for r in results:
+
+        baseline = baselines.get(get_result_key(r))
+        if baseline is None:
+            continue
+
+        for _ in range(num_retries):
+            if r['time_per_record_in_us'] <= (1 + tolerance) * baseline:
+                break
+            r = remeasure(r)
+
+        if r['time_per_record_in_us'] > (1 + tolerance) * baseline:
+            regressions.append((r, baseline))
+
+    return regressions
+
+
+def load_baselines(filepath=BASELINES_FILEPATH):
+    with open(filepath) as f:
+        return json.load(f)
+
+
+def save_baselines(results, filepath=BASELINES_FILEPATH):
+    import tensorflow as tf
+
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'w') as f:
+        json.dump({'environment': {'python': platform.python_version(),
+                                   'numpy': np.__version__,
+                                   'tensorflow': tf.__version__,
+                                   'platform': platform.platform(),
+                                   'num_cpus': os.cpu_count()},
+                   'time_per_record_in_us': {get_result_key(r): round(r['time_per_record_in_us'], 3) for r in results}},
+                  f,
+                  indent=2)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Per field type costs of the marshaller.')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='relative increase of the cost of a record beyond which the run fails.')
+    parser.add_argument('--num-retries', type=int, default=2,
+                        help='number of times a record beyond the tolerance is measured again before failing.')
+    parser.add_argument('--update-baselines', action='store_true', help='save the results as the new baselines.')
+    args = parser.parse_args()
+
+    # without baselines, nothing would be checked
+    if not args.update_baselines and not os.path.exists(BASELINES_FILEPATH):
+        parser.error('no baselines in %s, record them on this machine with --update-baselines.' % BASELINES_FILEPATH)
+
+    results = run_benchmark()
+
+    baselines = {}
+    if not args.update_baselines:
+        baselines = load_baselines()['time_per_record_in_us']
+
+    print('%-22s %-20s %8s %14s %14s' % ('function', 'field type', 'size', 'time (us)', 'baseline (us)'))
+    for r in results:
+        baseline = baselines.get(get_result_key(r))
+        print('%-22s %-20s %8s %14.2f %14s' % (r['function'],
+                                               r['field_type'],
+                                               r['size'] or '-',
+                                               r['time_per_record_in_us'],
+                                               '%.2f' % baseline if baseline is not None else '-'))
+
+    if args.update_baselines:
+        save_baselines(results)
+        print('Baselines saved to %s.' % BASELINES_FILEPATH)
+        return
+
+    regressions = compare_with_baselines(results, baselines, args.tolerance, num_retries=args.num_retries)
+    for r, baseline in regressions:
+        print('Regression: %s, %.2f us per record vs. %.2f.' % (get_result_key(r), r['time_per_record_in_us'], baseline))
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
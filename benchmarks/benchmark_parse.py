@@ -0,0 +1,123 @@
+"""
+Compares the throughputs of the datasets parsing the records one at a time and then batching them, and parsing them
+by batches, for small and larger records.
+
+Usage:
+    python -m benchmarks.benchmark_parse
+"""
+import logging
+import os
+import time
+import tempfile
+import numpy as np
+
+import tfrecorder.factory as tf_factory
+import tfrecorder.helpers.engine as engine
+import tfrecorder.helpers.constants as cts
+import tfrecorder.helpers.utils as utils
+import unittests.helpers.toy as toy
+from unittests.helpers.toy_example_1 import ToyExample1
+
+# the shapes of the array of the records
+DATA_SHAPES = [(4, 4), (64, 32), (512, 128)]
+
+BATCH_SIZES = [64, 256]
+
+# the first one being the reference
+PARSE_MODES = [cts.DATASET_PARSE_MODE_SINGLE, cts.DATASET_PARSE_MODE_BATCHED]
+
+
+def get_batched_dataset(tfrecord_filepaths, parse_mode, batch_size):
+    """
+    Returns:
+        dataset: a tf.data.Dataset, of batches of batch_size records.
+    """
+    if parse_mode == cts.DATASET_PARSE_MODE_SINGLE:
+        return tf_factory.generate_dataset(tfrecord_filepaths, ToyExample1).batch(batch_size)
+
+    return tf_factory.generate_dataset(tfrecord_filepaths,
+                                       ToyExample1,
+                                       dataset_parse_mode=parse_mode,
+                                       dataset_parse_batch_size=batch_size)
+
+
+def run_benchmark(num_examples=2000, data_shapes=DATA_SHAPES, batch_sizes=BATCH_SIZES, parse_modes=PARSE_MODES,
+                  num_reads=3):
+    """
+    Writes records of each shape, and reads them with each parse mode.
+
+    Args:
+        num_examples: int, number of records of each shape.
+        data_shapes: list, of shapes of the array of the records.
+        batch_sizes: list, of int.
+        parse_modes: list, of str, the first one being the reference for the speedups.
+        num_reads: int, number of times the records are read, the fastest read being kept.
+
+    Returns:
+        results: list, of dict, one per shape, batch size and parse mode.
+    """
+    # only the warnings of the engine
+    utils.get_logger(name=engine.LOGGER_NAME, level=logging.WARNING)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+        for data_shape in data_shapes:
+
+            name = 'x'.join(str(d) for d in data_shape)
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus_%s' % name)
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample1,
+                                                 num_examples=num_examples if np.prod(data_shape) < 1e4 else num_examples // 10,
+                                                 data_shape=data_shape)
+
+            save_directory_path = os.path.join(tmp_directory_path, name)
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  examples,
+                                                                  examples_tfrecords_files_max_size_in_bytes=1e8,
+                                                                  examples_log_in_csv_file=False,
+                                                                  data_dirpath=corpus_directory_path)
+
+            tfrecord_filepaths = tf_factory.get_tfrecord_filepaths(save_directory_path)
+
+            for batch_size in batch_sizes:
+
+                reference_time = None
+                for parse_mode in parse_modes:
+
+                    dataset = get_batched_dataset(tfrecord_filepaths, parse_mode, batch_size)
+
+                    # the best of a few reads, as the first one also warms tensorflow up
+                    read_time = np.inf
+                    for _ in range(num_reads):
+                        start_time = time.perf_counter()
+                        for _ in dataset:
+                            pass
+                        read_time = min(read_time, time.perf_counter() - start_time)
+
+                    reference_time = reference_time or read_time
+
+                    results.append({'data_shape': name,
+                                    'batch_size': batch_size,
+                                    'parse_mode': parse_mode,
+                                    'records_per_s': len(examples) / read_time,
+                                    'speedup': reference_time / read_time})
+
+    return results
+
+
+def main():
+
+    results = run_benchmark()
+
+    print('%-10s %8s %-8s %14s %8s' % ('shape', 'batch', 'mode', 'records/s', 'speedup'))
+    for r in results:
+        print('%-10s %8d %-8s %14.0f %8.2f' % (r['data_shape'],
+                                               r['batch_size'],
+                                               r['parse_mode'],
+                                               r['records_per_s'],
+                                               r['speedup']))
+
+
+if __name__ == '__main__':
+    main()
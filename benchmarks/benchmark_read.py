@@ -0,0 +1,172 @@
+"""
+Measures the read pipeline of the datasets: the time to the first batch, and the steady state throughputs in
+records/s and MB/s, for each shard size, compression, parse mode and pipeline (the sequential one, or the tuned
+defaults of generate_dataset). The synthetic datasets are generated with the toy examples of the unit tests.
+
+Usage:
+    python -m benchmarks.benchmark_read
+"""
+import logging
+import os
+import time
+import tempfile
+import itertools
+import numpy as np
+
+import tfrecorder.factory as tf_factory
+import tfrecorder.helpers.engine as engine
+import tfrecorder.helpers.constants as cts
+import tfrecorder.helpers.utils as utils
+import unittests.helpers.toy as toy
+from unittests.helpers.toy_example_1 import ToyExample1
+
+# the max sizes of the tfrecords files
+SHARD_SIZES_IN_BYTES = [int(1e6), int(1.6e7)]
+
+COMPRESSION_TYPES = [None, cts.TFRECORD_FILE_COMPRESSION_GZIP]
+
+PARSE_MODES = [cts.DATASET_PARSE_MODE_SINGLE, cts.DATASET_PARSE_MODE_BATCHED]
+
+# the kwargs of generate_dataset of each pipeline
+PIPELINES = {'sequential': dict(dataset_fetching_num_threads=None,
+                                dataset_prefetch_buffer_size=None,
+                                dataset_read_buffer_size_in_bytes=None),
+             'tuned': dict()}
+
+
+def get_batched_dataset(tfrecord_filepaths, parse_mode, batch_size, **kwargs):
+    """
+    Returns:
+        dataset: a tf.data.Dataset, of batches of batch_size records.
+    """
+    if parse_mode == cts.DATASET_PARSE_MODE_SINGLE:
+        return tf_factory.generate_dataset(tfrecord_filepaths, ToyExample1, **kwargs).batch(batch_size)
+
+    return tf_factory.generate_dataset(tfrecord_filepaths,
+                                       ToyExample1,
+                                       dataset_parse_mode=parse_mode,
+                                       dataset_parse_batch_size=batch_size,
+                                       **kwargs)
+
+
+def read_dataset(tfrecord_filepaths, parse_mode, batch_size, **kwargs):
+    """
+    Reads all the batches of a dataset.
+
+    Returns:
+        time_to_first_batch: float, in seconds, from the creation of the dataset.
+        steady_state_time: float, in seconds, the time to read the other batches.
+        num_steady_state_records: int, the number of records of the other batches.
+    """
+    start_time = time.perf_counter()
+
+    batches = iter(get_batched_dataset(tfrecord_filepaths, parse_mode, batch_size, **kwargs))
+    next(batches)
+    time_to_first_batch = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    num_steady_state_records = 0
+    for batch in batches:
+        num_steady_state_records += int(batch[0].shape[0])
+
+    return time_to_first_batch, time.perf_counter() - start_time, num_steady_state_records
+
+
+def run_benchmark(num_examples=4000,
+                  data_shape=(64, 32),
+                  batch_size=256,
+                  shard_sizes_in_bytes=SHARD_SIZES_IN_BYTES,
+                  compression_types=COMPRESSION_TYPES,
+                  parse_modes=PARSE_MODES,
+                  pipelines=PIPELINES,
+                  num_reads=3):
+    """
+    Writes the same examples with each shard size and compression, and reads them with each parse mode and pipeline.
+
+    Args:
+        num_examples: int, number of records.
+        data_shape: tuple, shape of the array of each record.
+        batch_size: int
+        shard_sizes_in_bytes: list, of max sizes of the tfrecords files.
+        compression_types: list, of compression types.
+        parse_modes: list, of parse modes.
+        pipelines: dict, of name: kwargs of generate_dataset.
+        num_reads: int, number of times each dataset is read, the best time to first batch and steady state time being
+                   kept.
+
+    Returns:
+        results: list, of dict, one per shard size, compression, parse mode and pipeline.
+    """
+    # only the warnings of the engine
+    utils.get_logger(name=engine.LOGGER_NAME, level=logging.WARNING)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+        corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+        examples = toy.generate_toy_examples(corpus_directory_path,
+                                             ToyExample1,
+                                             num_examples=num_examples,
+                                             data_shape=data_shape)
+
+        # the throughputs in MB/s are given for the uncompressed records, so that they can be compared
+        record_size_in_bytes = None
+
+        for shard_size_in_bytes, compression_type in itertools.product(shard_sizes_in_bytes, compression_types):
+
+            save_directory_path = os.path.join(tmp_directory_path, '%d_%s' % (shard_size_in_bytes, compression_type))
+            # the examples are released once written, so each run instantiates them again
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  [ToyExample1.from_csv_row(e.to_csv_row(),
+                                                                                            data_dirpath=corpus_directory_path)
+                                                                   for e in examples],
+                                                                  examples_tfrecords_files_max_size_in_bytes=shard_size_in_bytes,
+                                                                  examples_tfrecords_files_compression_type=compression_type,
+                                                                  examples_log_in_csv_file=False,
+                                                                  data_dirpath=corpus_directory_path)
+
+            tfrecord_filepaths = tf_factory.get_tfrecord_filepaths(save_directory_path)
+            if record_size_in_bytes is None:
+                record_size_in_bytes = sum(os.path.getsize(fp) for fp in tfrecord_filepaths) / num_examples
+
+            for parse_mode, (pipeline, kwargs) in itertools.product(parse_modes, pipelines.items()):
+
+                time_to_first_batch, steady_state_time = np.inf, np.inf
+                for _ in range(num_reads):
+                    t, s, num_steady_state_records = read_dataset(tfrecord_filepaths, parse_mode, batch_size, **kwargs)
+                    time_to_first_batch = min(time_to_first_batch, t)
+                    steady_state_time = min(steady_state_time, s)
+
+                records_per_s = num_steady_state_records / steady_state_time
+
+                results.append({'shard_size_in_bytes': shard_size_in_bytes,
+                                'num_tfrecord_files': len(tfrecord_filepaths),
+                                'compression_type': compression_type,
+                                'parse_mode': parse_mode,
+                                'pipeline': pipeline,
+                                'time_to_first_batch_in_ms': time_to_first_batch * 1e3,
+                                'records_per_s': records_per_s,
+                                'throughput_in_mb_per_s': records_per_s * record_size_in_bytes / 1e6})
+
+    return results
+
+
+def main():
+
+    results = run_benchmark()
+
+    print('%-10s %6s %-6s %-8s %-11s %12s %12s %10s' % ('shard (MB)', 'files', 'codec', 'mode', 'pipeline',
+                                                         'first (ms)', 'records/s', 'MB/s'))
+    for r in results:
+        print('%-10g %6d %-6s %-8s %-11s %12.1f %12.0f %10.1f' % (r['shard_size_in_bytes'] / 1e6,
+                                                                 r['num_tfrecord_files'],
+                                                                 r['compression_type'] or 'none',
+                                                                 r['parse_mode'],
+                                                                 r['pipeline'],
+                                                                 r['time_to_first_batch_in_ms'],
+                                                                 r['records_per_s'],
+                                                                 r['throughput_in_mb_per_s']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares the per record overhead of going through the @tfrecordable attributes of an example by rebuilding an
+OrderedDict from the proto_list of its class, as before the schemas were compiled, and through its compiled schema.
+The time it takes to serialize the example with tensorflow is given for reference.
+
+Usage:
+    python -m benchmarks.benchmark_schema
+"""
+import time
+import numpy as np
+from collections import OrderedDict
+
+from benchmarks.benchmark_encoder import ScalarsExample
+
+
+def get_values_from_proto_list(example):
+    return [getattr(example, k) for k, _ in OrderedDict(type(example).proto_list).items()]
+
+
+def get_values_from_schema(example):
+    return [getattr(example, k) for k, _ in example.schema.fields]
+
+
+# name, function run for each record, the first one being the reference
+FUNCTIONS = [('proto_list', get_values_from_proto_list),
+             ('schema', get_values_from_schema),
+             ('serialize_to_string', lambda example: example.serialize_to_string())]
+
+
+def run_benchmark(num_examples=10000, num_runs=5, functions=FUNCTIONS):
+    """
+    Runs each function on the same examples.
+
+    Args:
+        num_examples: int
+        num_runs: int, number of times the examples are processed, the fastest run being kept.
+        functions: list, of (name, function) tuples.
+
+    Returns:
+        results: list, of dict, one per function.
+    """
+    examples = [ScalarsExample(i) for i in range(num_examples)]
+
+    results = []
+    for name, function in functions:
+
+        run_time = np.inf
+        for _ in range(num_runs):
+            start_time = time.perf_counter()
+            for example in examples:
+                function(example)
+            run_time = min(run_time, time.perf_counter() - start_time)
+
+        results.append({'function': name,
+                        'time_per_example_in_us': run_time / num_examples * 1e6})
+
+    return results
+
+
+def main():
+
+    results = run_benchmark()
+
+    print('%-20s %14s' % ('function', 'time (us)'))
+    for r in results:
+        print('%-20s %14.2f' % (r['function'], r['time_per_example_in_us']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Measures the end to end throughput of the factory entry points writing tfrecord files, on synthetic corpora generated
+with the toy examples of the unit tests: examples/s, MB/s, peak RSS and files produced. Each run is made in a fresh
+interpreter, so that the peak RSS is its own. The results are saved as JSON, and can be compared with those of a
+previous run to catch regressions.
+
+Usage:
+    python -m benchmarks.benchmark_write --output results.json
+    python -m benchmarks.benchmark_write --num-examples 1000 --data-shape 512 128 --example-classes ToyExample2
+    python -m benchmarks.benchmark_write --output new.json --baseline results.json --tolerance 0.2
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import tfrecorder.factory as tf_factory
+import tfrecorder.helpers.engine as engine
+import tfrecorder.helpers.constants as cts
+import tfrecorder.helpers.utils as utils
+import tfrecorder.helpers.writer as writer
+from tfrecorder.helpers.marshaller import Example
+import unittests.helpers.toy as toy
+from unittests.helpers.toy_example_1 import ToyExample1
+from unittests.helpers.toy_example_2 import ToyExample2
+
+# the field mixes: a name, a label, a likelihood and an array per example, or a name and two arrays split in chunks
+EXAMPLE_CLASSES = {'ToyExample1': ToyExample1,
+                   'ToyExample2': ToyExample2}
+
+ENTRY_POINTS = ['examples_file', 'train_eval_test']
+
+BACKENDS = [writer.BACKEND_TENSORFLOW, writer.BACKEND_PYTHON]
+
+ROOT_DIRECTORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generate_corpus(directory_path, example_class_name, num_examples, data_shape):
+    """
+    Generates the data and the csv file of the examples of a corpus.
+
+    Returns:
+        examples_filepath: str, the csv file of the examples.
+        kwargs: dict, arguments for their load and split methods.
+    """
+    examples = toy.generate_toy_examples(directory_path,
+                                         EXAMPLE_CLASSES[example_class_name],
+                                         num_examples=num_examples,
+                                         data_shape=data_shape)
+
+    examples_filepath = os.path.join(directory_path, cts.EXAMPLES_LIST_FILENAME)
+    Example.to_csv_file(examples_filepath, examples)
+
+    if example_class_name == 'ToyExample1':
+        kwargs = dict(data_dirpath=directory_path)
+    else:
+        kwargs = dict(src_data_dirpath=os.path.join(directory_path, 'src'),
+                      tgt_data_dirpath=os.path.join(directory_path, 'tgt'),
+                      chunk_size_in_bins=max(1, data_shape[0] // 8))
+
+    return examples_filepath, kwargs
+
+
+def run_case(case):
+    """
+    Writes the tfrecord files of a corpus with a factory entry point, in the current process.
+
+    Args:
+        case: dict, with the example class name, the entry point, the backend, the shard size, the csv file of the
+              examples and the kwargs of their load and split methods, and the directory where to save the files.
+
+    Returns:
+        result: dict
+    """
+    utils.get_logger(name=engine.LOGGER_NAME, level=logging.WARNING)
+
+    example_class = EXAMPLE_CLASSES[case['example_class']]
+    kwargs = dict(case['kwargs'],
+                  examples_tfrecords_files_writer_backend=case['backend'])
+
+    # tensorflow is only imported when first needed: it would take most of the time of small corpora
+    if case['backend'] == writer.BACKEND_TENSORFLOW:
+        import tensorflow
+
+    start_time = time.perf_counter()
+
+    if case['entry_point'] == 'examples_file':
+        num_examples = tf_factory.generate_and_save_tfrecords_files_for_examples_file(case['save_directory_path'],
+                                                                                      example_class,
+                                                                                      case['examples_filepath'],
+                                                                                      examples_tfrecord_file_max_size_in_bytes=case['shard_size_in_bytes'],
+                                                                                      **kwargs)
+    elif case['entry_point'] == 'train_eval_test':
+        tf_factory.generate_and_save_train_eval_test_tfrecords_files(case['save_directory_path'],
+                                                                     example_class,
+                                                                     case['examples_filepath'],
+                                                                     examples_train_eval_test_ratio=[0.8, 0.1, 0.1],
+                                                                     examples_tfrecord_file_max_size_in_bytes=case['shard_size_in_bytes'],
+                                                                     **kwargs)
+        num_examples = None
+    else:
+        raise ValueError('Entry point %s is not supported (use one of %s).' % (case['entry_point'], ENTRY_POINTS))
+
+    run_time = time.perf_counter() - start_time
+
+    if num_examples is None:
+        with open(case['examples_filepath']) as f:
+            num_examples = sum(1 for _ in f)
+
+    tfrecord_filepaths, num_files = [], 0
+    for directory_path, _, filenames in os.walk(case['save_directory_path']):
+        tfrecord_filepaths += tf_factory.get_tfrecord_filepaths(directory_path)
+        num_files += len(filenames)
+    size_in_bytes = sum(os.path.getsize(fp) for fp in tfrecord_filepaths)
+
+    return {'example_class': case['example_class'],
+            'entry_point': case['entry_point'],
+            'backend': case['backend'],
+            'num_examples': num_examples,
+            'time_in_s': run_time,
+            'examples_per_s': num_examples / run_time,
+            'throughput_in_mb_per_s': size_in_bytes / run_time / 1e6,
+            'size_in_bytes': size_in_bytes,
+            'num_tfrecord_files': len(tfrecord_filepaths),
+            'num_files': num_files,
+            # in kilobytes on linux
+            'peak_rss_in_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def run_benchmark(num_examples=200,
+                  data_shape=(128, 64),
+                  example_class_names=tuple(EXAMPLE_CLASSES),
+                  entry_points=ENTRY_POINTS,
+                  backends=BACKENDS,
+                  shard_size_in_bytes=int(1e7)):
+    """
+    Generates a corpus for each example class, and writes it with each entry point and backend, each time in a fresh
+    interpreter.
+
+    Args:
+        num_examples: int, number of examples of each corpus.
+        data_shape: tuple, shape of the arrays of each example.
+        example_class_names: list, of str, the field mixes of the corpora.
+        entry_points: list, of str.
+        backends: list, of str.
+        shard_size_in_bytes: int, max size of the tfrecord files.
+
+    Returns:
+        results: list, of dict, one per example class, entry point and backend.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+        for example_class_name in example_class_names:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus_%s' % example_class_name)
+            examples_filepath, kwargs = generate_corpus(corpus_directory_path,
+                                                        example_class_name,
+                                                        num_examples,
+                                                        data_shape)
+
+            for entry_point, backend in itertools.product(entry_points, backends):
+
+                case = {'example_class': example_class_name,
+                        'entry_point': entry_point,
+                        'backend': backend,
+                        'shard_size_in_bytes': shard_size_in_bytes,
+                        'examples_filepath': examples_filepath,
+                        'kwargs': kwargs,
+                        'save_directory_path': os.path.join(tmp_directory_path, '%s_%s_%s' % (example_class_name,
+                                                                                              entry_point,
+                                                                                              backend))}
+
+                completed_process = subprocess.run([sys.executable, '-m', 'benchmarks.benchmark_write',
+                                                    '--case', json.dumps(case)],
+                                                   cwd=ROOT_DIRECTORY_PATH,
+                                                   stdout=subprocess.PIPE,
+                                                   stderr=subprocess.DEVNULL,
+                                                   check=True)
+
+                result = json.loads(completed_process.stdout.decode('utf-8').strip().splitlines()[-1])
+                result['data_shape'] = list(data_shape)
+                results.append(result)
+
+    return results
+
+
+def get_result_key(result):
+    return result['example_class'], result['entry_point'], result['backend'], tuple(result['data_shape'])
+
+
+def compare_results(results, baseline_results, tolerance=0.2):
+    """
+    Compares the throughputs of the results with those of a previous run.
+
+    Args:
+        results: list, of dict.
+        baseline_results: list, of dict.
+        tolerance: float, relative slowdown of the examples/s beyond which a result is a regression.
+
+    Returns:
+        regressions: list, of (result, baseline result) tuples.
+    """
+    baseline_results = {get_result_key(r): r for r in baseline_results}
+
+    regressions = []
+    for r in results:
+        baseline_result = baseline_results.get(get_result_key(r))
+        if baseline_result is not None and r['examples_per_s'] < (1 - tolerance) * baseline_result['examples_per_s']:
+            regressions.append((r, baseline_result))
+
+    return regressions
+
+
+def get_environment():
+    import numpy as np
+    import tensorflow as tf
+    return {'python': platform.python_version(),
+            'numpy': np.__version__,
+            'tensorflow': tf.__version__,
+            'platform': platform.platform(),
+            'num_cpus': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='End to end write throughput of tfrecorder.')
+    parser.add_argument('--num-examples', type=int, default=200)
+    parser.add_argument('--data-shape', type=int, nargs=2, default=[128, 64])
+    parser.add_argument('--example-classes', nargs='+', default=list(EXAMPLE_CLASSES), choices=list(EXAMPLE_CLASSES))
+    parser.add_argument('--entry-points', nargs='+', default=ENTRY_POINTS, choices=ENTRY_POINTS)
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--shard-size-in-bytes', type=int, default=int(1e7))
+    parser.add_argument('--output', help='the JSON file where to save the results.')
+    parser.add_argument('--baseline', help='the JSON file of a previous run, to compare the results with.')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # a single run, in a fresh interpreter
+    if args.case is not None:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    results = run_benchmark(num_examples=args.num_examples,
+                            data_shape=args.data_shape,
+                            example_class_names=args.example_classes,
+                            entry_points=args.entry_points,
+                            backends=args.backends,
+                            shard_size_in_bytes=args.shard_size_in_bytes)
+
+    print('%-12s %-16s %-11s %12s %8s %10s %6s' % ('class', 'entry point', 'backend', 'examples/s', 'MB/s',
+                                                   'RSS (MB)', 'files'))
+    for r in results:
+        print('%-12s %-16s %-11s %12.1f %8.1f %10.1f %6d' % (r['example_class'],
+                                                             r['entry_point'],
+                                                             r['backend'],
+                                                             r['examples_per_s'],
+                                                             r['throughput_in_mb_per_s'],
+                                                             r['peak_rss_in_bytes'] / 1e6,
+                                                             r['num_files']))
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': get_environment(), 'results': results}, f, indent=2)
+
+    if args.baseline is not None:
+
+        with open(args.baseline) as f:
+            baseline_results = json.load(f)['results']
+
+        regressions = compare_results(results, baseline_results, tolerance=args.tolerance)
+        for r, baseline_result in regressions:
+            print('Regression: %s %s %s, %.1f examples/s vs. %.1f.' % (r['example_class'],
+                                                                      r['entry_point'],
+                                                                      r['backend'],
+                                                                      r['examples_per_s'],
+                                                                      baseline_result['examples_per_s']))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
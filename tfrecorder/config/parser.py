@@ -70,3 +70,19 @@ def save_config(config_filepath,
         config.write(configfile)
 
 
+def load_counts(config_filepath):
+    """
+    Loads the counts of examples saved in a config file.
+
+    Args:
+        config_filepath:
+
+    Returns:
+        counts: dict, the names of the directories and the number of examples in each.
+
+    """
+    config = ConfigParser()
+    config.read(config_filepath)
+
+    suffix = '_count'
+    return {k[:-len(suffix)]: int(v) for k, v in config['examples'].items() if k.endswith(suffix)}
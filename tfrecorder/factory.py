@@ -1,12 +1,12 @@
 import os
-import glob
 import random
-import tensorflow as tf
+import hashlib
 
 import tfrecorder.helpers.engine as engine
 import tfrecorder.helpers.constants as cts
 import tfrecorder.config.parser as config_parser
 import tfrecorder.helpers.utils as utils
+import tfrecorder.helpers.manifest as manifest
 
 # wrappers to deal with various use cases
 
@@ -27,16 +27,20 @@ def generate_and_save_tfrecords_files_for_examples_file(save_directory_path,
         examples_tfrecord_file_max_size_in_bytes: int, maximum size in bytes of a tfrecord file.
         examples_log_in_csv_file: bool, whether to log the metadata of the examples in a csv file.
 
+    Returns:
+        num_examples: int, the number of examples.
+
     """
-    examples = example_class.from_csv_file(examples_filepath,
+    # the examples are instantiated as they are processed
+    examples = example_class.iter_csv_file(examples_filepath,
                                            **kwargs)
 
-    engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
-                                                          examples,
-                                                          examples_tfrecord_file_max_size_in_bytes=examples_tfrecord_file_max_size_in_bytes,
-                                                          examples_log_in_csv_file=examples_log_in_csv_file,
-                                                          **kwargs
-                                                          )
+    return engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                 examples,
+                                                                 examples_tfrecords_files_max_size_in_bytes=examples_tfrecord_file_max_size_in_bytes,
+                                                                 examples_log_in_csv_file=examples_log_in_csv_file,
+                                                                 **kwargs
+                                                                 )
 
 
 def generate_and_save_train_eval_test_tfrecords_files(save_directory_path,
@@ -45,6 +49,7 @@ def generate_and_save_train_eval_test_tfrecords_files(save_directory_path,
                                                       examples_train_eval_test_ratio=0.8,
                                                       examples_tfrecord_file_max_size_in_bytes=1e6,
                                                       examples_log_in_csv_file=True,
+                                                      examples_append=False,
                                                       **kwargs
                                                       ):
     """
@@ -57,9 +62,12 @@ def generate_and_save_train_eval_test_tfrecords_files(save_directory_path,
         examples_train_eval_test_ratio: float, or list, ratios to split the Example objects list.
         examples_tfrecord_file_max_size_in_bytes: int, maximum size in bytes of a tfrecord file.
         examples_log_in_csv_file: bool, whether to log the metadata of the examples in a csv file.
+        examples_append: bool, whether to append the examples to the tfrecord files already saved in the various
+                         directories. The counts of the config file then include the examples previously saved.
 
     """
 
+    # the examples are shuffled and split, so they must all be instantiated
     examples = examples_class.from_csv_file(examples_filepath,
                                             **kwargs)
 
@@ -68,11 +76,18 @@ def generate_and_save_train_eval_test_tfrecords_files(save_directory_path,
                                                                             examples_train_eval_test_ratio=examples_train_eval_test_ratio,
                                                                             examples_tfrecord_file_max_size_in_bytes=examples_tfrecord_file_max_size_in_bytes,
                                                                             examples_log_in_csv_file=examples_log_in_csv_file,
+                                                                            examples_append=examples_append,
                                                                             **kwargs
                                                                             )
 
     # save a config file
     config_filepath = os.path.join(save_directory_path, cts.EXAMPLES_TFRECORD_FILES_CONFIG_FILENAME)
+
+    # when appending, the counts include the examples previously saved
+    if examples_append and os.path.exists(config_filepath):
+        previous_counts = config_parser.load_counts(config_filepath)
+        counts = {k: previous_counts.get(k, 0) + v for k, v in counts.items()}
+
     config_parser.save_config(config_filepath,
                               examples_class,
                               examples_filepath,
@@ -95,7 +110,7 @@ def generate_and_save_tfrecords_files_for_examples_dict(save_directory_path,
 
     Args:
         save_directory_path: str, path of the directory where to save the various directories
-        examples_dict: dict, of the form {dirname: list of Example objects}
+        examples_dict: dict, of the form {dirname: iterable of Example objects}
         examples_tfrecord_file_max_size_in_bytes: int, maximum size in bytes of a tfrecord file.
         examples_log_in_csv_file: bool, whether to log the metadata of the examples in a csv file.
         **kwargs: dict, arguments for the Example subclass methods such as load, etc.
@@ -114,14 +129,12 @@ def generate_and_save_tfrecords_files_for_examples_dict(save_directory_path,
 
         subdir_path = os.path.join(save_directory_path, subdir_name)
 
-        engine.generate_and_save_tfrecords_files_for_examples(subdir_path,
-                                                              examples,
-                                                              examples_tfrecord_file_max_size_in_bytes=examples_tfrecord_file_max_size_in_bytes,
-                                                              examples_log_in_csv_file=examples_log_in_csv_file,
-                                                              **kwargs
-                                                              )
-
-        counts_dict[subdir_name] = len(examples)
+        counts_dict[subdir_name] = engine.generate_and_save_tfrecords_files_for_examples(subdir_path,
+                                                                                         examples,
+                                                                                         examples_tfrecords_files_max_size_in_bytes=examples_tfrecord_file_max_size_in_bytes,
+                                                                                         examples_log_in_csv_file=examples_log_in_csv_file,
+                                                                                         **kwargs
+                                                                                         )
 
     return counts_dict
 
@@ -172,6 +185,8 @@ def generate_and_save_train_eval_test_tfrecords_files_for_examples(save_director
                                                                    examples_shuffle=True,
                                                                    examples_tfrecord_file_max_size_in_bytes=1e6,
                                                                    examples_log_in_csv_file=True,
+                                                                   examples_shuffle_seed=None,
+                                                                   examples_resume=False,
                                                                    **kwargs
                                                                    ):
     """
@@ -185,10 +200,17 @@ def generate_and_save_train_eval_test_tfrecords_files_for_examples(save_director
         examples_shuffle: bool, whether to shuffle examples before split.
         examples_tfrecord_file_max_size_in_bytes: int, maximum size in bytes of a tfrecord file.
         examples_log_in_csv_file: bool, whether to log the metadata of the examples in a csv file.
+        examples_shuffle_seed: int, seed of the shuffle, or None for a random one.
+        examples_resume: bool, whether to resume an interrupted generation. The examples are then shuffled with the
+                         same seed than the interrupted generation.
 
     """
     if examples_shuffle:
-        random.shuffle(examples)
+        # the shuffle must be the same when resuming, so we keep track of its seed
+        examples_shuffle_seed = get_shuffle_seed(save_directory_path,
+                                                 examples_shuffle_seed=examples_shuffle_seed,
+                                                 examples_resume=examples_resume)
+        random.Random(examples_shuffle_seed).shuffle(examples)
 
     train_examples, eval_examples, test_examples = split_examples_list(examples, examples_train_eval_test_ratio)
 
@@ -202,6 +224,7 @@ def generate_and_save_train_eval_test_tfrecords_files_for_examples(save_director
                                                                examples_dict,
                                                                examples_tfrecord_file_max_size_in_bytes=examples_tfrecord_file_max_size_in_bytes,
                                                                examples_log_in_csv_file=examples_log_in_csv_file,
+                                                               examples_resume=examples_resume,
                                                                **kwargs)
 
 
@@ -232,7 +255,8 @@ def generate_and_save_tfrecords_files_for_examples_files_dict(save_directory_pat
     if not os.path.exists(save_directory_path):
         os.mkdir(save_directory_path)
 
-    examples_dict = {subdir_name: example_class.from_csv_file(examples_filepath,
+    # the examples are instantiated as they are processed
+    examples_dict = {subdir_name: example_class.iter_csv_file(examples_filepath,
                                                               **kwargs) for subdir_name, examples_filepath in examples_filepaths_dict.items()}
 
     return generate_and_save_tfrecords_files_for_examples_dict(save_directory_path,
@@ -248,40 +272,232 @@ def generate_and_save_tfrecords_files_for_examples_files_dict(save_directory_pat
 def generate_dataset(tfrecords_filepaths,
                      example_class,
                      dataset_num_shuffled_tfrecord_files=None,
-                     dataset_fetching_num_threads=None
+                     dataset_num_shuffled_records=None,
+                     dataset_shuffle_seed=None,
+                     dataset_interleave_cycle_length=1,
+                     dataset_interleave_block_length=1,
+                     dataset_interleave_num_parallel_calls=None,
+                     dataset_deterministic=True,
+                     dataset_fetching_num_threads=cts.DATASET_AUTOTUNE,
+                     dataset_prefetch_buffer_size=cts.DATASET_AUTOTUNE,
+                     dataset_read_buffer_size_in_bytes=cts.DATASET_READ_BUFFER_SIZE_IN_BYTES,
+                     dataset_compression_type=None,
+                     dataset_parse_mode=cts.DATASET_PARSE_MODE_SINGLE,
+                     dataset_parse_batch_size=256,
+                     dataset_cache=None,
+                     dataset_cache_max_size_in_bytes=None,
+                     dataset_cache_dirpath=None
                      ):
     """
     Generate a dataset with a list of tfrecords filepaths. The dataset instantiate the protobuf for the given Example
     subclass.
     By default, it does not batch nor shuffle the results so that order is preserved and consistency between original data and
-    stored data can be checked.
+    stored data can be checked. The records are parsed by parallel calls and prefetched, tensorflow tuning how many,
+    while the files are read through large buffers.
 
     Args:
         tfrecords_filepaths: list,
         example_class: class, of Example subclass
-        dataset_num_shuffled_tfrecord_files: int, size of the tfrecords filepaths buffer to shuffle before deserializing.
-        dataset_fetching_num_threads: int
+        dataset_num_shuffled_tfrecord_files: int, size of the tfrecords filepaths buffer to shuffle before reading
+                                             them, e.g. len(tfrecords_filepaths) to shuffle all of them. The files are
+                                             shuffled again at each iteration.
+        dataset_num_shuffled_records: int, size of the records buffer to shuffle before deserializing.
+        dataset_shuffle_seed: int, seed of the shuffles, or None.
+        dataset_interleave_cycle_length: int, number of tfrecords files read concurrently, their records being
+                                         interleaved. 1 reads them one after another, tf.data.AUTOTUNE lets tensorflow
+                                         decide.
+        dataset_interleave_block_length: int, number of consecutive records read from a file before moving to the
+                                         next one of the cycle.
+        dataset_interleave_num_parallel_calls: int, number of threads reading the files of the cycle, or
+                                               tf.data.AUTOTUNE, or None to read them from the calling thread.
+        dataset_deterministic: bool, whether the records are yielded in a deterministic order. False lets a parallel
+                               interleave or map yield the records that are ready first, rather than wait for a slow
+                               file (e.g. on a network file system).
+        dataset_fetching_num_threads: int, number of records (or batches of records) parsed in parallel, -1
+                                      (tf.data.AUTOTUNE) to let tensorflow tune it, or None to parse them sequentially.
+        dataset_prefetch_buffer_size: int, number of records (or batches of records) parsed in advance, -1
+                                      (tf.data.AUTOTUNE) to let tensorflow tune it, or None not to prefetch them.
+        dataset_read_buffer_size_in_bytes: int, size of the read buffer of each tfrecords file, or None for the
+                                           default of tensorflow (256 KB).
+        dataset_compression_type: str, 'GZIP' or 'ZLIB', or None to detect it from the extension of the tfrecords
+                                  files.
+        dataset_parse_mode: str, 'single' to parse the records one at a time, or 'batched' to parse them by batches
+                            of dataset_parse_batch_size with vectorized ops. Batching helps small records (about 1.9x
+                            for 4x4 arrays) but can hurt large arrays (about 0.6x for 512x128 arrays by batches of
+                            64), see benchmarks/benchmark_parse.py. In 'batched' mode, the dataset yields batches of the tuples it yields in 'single' mode, as
+                            dataset.ragged_batch would: the scalars are batched as tensors, and the arrays as
+                            RaggedTensors with one row per record.
+        dataset_parse_batch_size: int, number of records parsed at once in 'batched' mode, i.e. the size of the
+                                  batches.
+        dataset_cache: str, 'memory' or 'disk' to cache the parsed records during the first iteration, so that the
+                       next ones neither read nor parse the tfrecords files, or None not to cache them. The records
+                       are then shuffled after the cache (the batches in 'batched' mode), while the tfrecords files are
+                       only shuffled for the first iteration.
+        dataset_cache_max_size_in_bytes: int, the records are not cached in memory if the tfrecords files are larger,
+                                         or None for no limit. Compressed files are smaller than the records they hold.
+        dataset_cache_dirpath: str, directory of the 'disk' cache, by default a 'cache' directory next to the first
+                               tfrecords file. The cache is named after the schema of the example class and the
+                               tfrecords files, so that it is rebuilt, and the stale one removed, when they change.
 
 
     Returns:
 
     """
-    # create one dataset object out of the list of tfrecords files
-    dataset = tf.data.TFRecordDataset(tfrecords_filepaths)
+    import tensorflow as tf
+
+    if dataset_parse_mode not in [cts.DATASET_PARSE_MODE_SINGLE, cts.DATASET_PARSE_MODE_BATCHED]:
+        raise ValueError('Parse mode %s is not supported (use %s or %s).' % (dataset_parse_mode,
+                                                                           cts.DATASET_PARSE_MODE_SINGLE,
+                                                                           cts.DATASET_PARSE_MODE_BATCHED))
+
+    if dataset_cache not in [None, cts.DATASET_CACHE_MEMORY, cts.DATASET_CACHE_DISK]:
+        raise ValueError('Cache %s is not supported (use %s or %s).' % (dataset_cache,
+                                                                      cts.DATASET_CACHE_MEMORY,
+                                                                      cts.DATASET_CACHE_DISK))
+
+    if dataset_cache == cts.DATASET_CACHE_MEMORY and dataset_cache_max_size_in_bytes is not None:
+
+        size_in_bytes = sum(os.path.getsize(fp) for fp in tfrecords_filepaths)
+        if size_in_bytes > dataset_cache_max_size_in_bytes:
+            utils.get_logger(name=engine.LOGGER_NAME).warning('The records are not cached in memory: the tfrecords '
+                                                              'files hold %d bytes, more than %d.' %
+                                                              (size_in_bytes, dataset_cache_max_size_in_bytes))
+            dataset_cache = None
+
+    if dataset_compression_type is None:
+        dataset_compression_type = get_tfrecord_files_compression_type(tfrecords_filepaths)
+
+    # the files are shuffled before they are read, so that their order changes at each iteration
+    dataset = tf.data.Dataset.from_tensor_slices(tf.constant(tfrecords_filepaths, dtype=tf.string))
 
     if dataset_num_shuffled_tfrecord_files:
-        dataset = dataset.shuffle(buffer_size=dataset_num_shuffled_tfrecord_files)
+        dataset = dataset.shuffle(buffer_size=dataset_num_shuffled_tfrecord_files,
+                                  seed=dataset_shuffle_seed,
+                                  reshuffle_each_iteration=True)
+
+    # and the records of a cycle of files are interleaved into one dataset
+    dataset = dataset.interleave(lambda tfrecord_filepath : tf.data.TFRecordDataset(tfrecord_filepath,
+                                                                                     compression_type=dataset_compression_type,
+                                                                                     buffer_size=dataset_read_buffer_size_in_bytes),
+                                 cycle_length=dataset_interleave_cycle_length,
+                                 block_length=dataset_interleave_block_length,
+                                 num_parallel_calls=dataset_interleave_num_parallel_calls,
+                                 deterministic=get_deterministic(dataset_interleave_num_parallel_calls,
+                                                                 dataset_deterministic))
+
+    # if the manifests of the tfrecords files tell how many records there are, the dataset knows its cardinality
+    num_records = get_num_records(tfrecords_filepaths)
+    if num_records is not None:
+        dataset = dataset.apply(tf.data.experimental.assert_cardinality(num_records))
+
+    # the cached records would be shuffled the same at each iteration
+    if dataset_num_shuffled_records and dataset_cache is None:
+        dataset = dataset.shuffle(buffer_size=dataset_num_shuffled_records, seed=dataset_shuffle_seed)
 
     # parse the records into tensors describing sources
-    dataset = dataset.map(lambda serialized_examples : example_class.parse_from_string(serialized_examples),
-                          num_parallel_calls=dataset_fetching_num_threads)
+    if dataset_parse_mode == cts.DATASET_PARSE_MODE_BATCHED:
+
+        # the records are kept batched: unbatching them again would cost more than parsing them one at a time
+        dataset = dataset.batch(dataset_parse_batch_size)
+        dataset = dataset.map(lambda serialized_examples : example_class.parse_batch_from_string(serialized_examples),
+                              num_parallel_calls=dataset_fetching_num_threads,
+                              deterministic=get_deterministic(dataset_fetching_num_threads, dataset_deterministic))
+
+    else:
 
+        dataset = dataset.map(lambda serialized_examples : example_class.parse_from_string(serialized_examples),
+                              num_parallel_calls=dataset_fetching_num_threads,
+                              deterministic=get_deterministic(dataset_fetching_num_threads, dataset_deterministic))
+
+    if dataset_cache is not None:
+
+        dataset = dataset.cache(get_dataset_cache_filepath(tfrecords_filepaths,
+                                                           example_class,
+                                                           dataset_parse_mode,
+                                                           dataset_parse_batch_size,
+                                                           dataset_cache_dirpath=dataset_cache_dirpath)
+                                if dataset_cache == cts.DATASET_CACHE_DISK else '')
+
+        if dataset_num_shuffled_records:
+            num_shuffled = dataset_num_shuffled_records
+            if dataset_parse_mode == cts.DATASET_PARSE_MODE_BATCHED:
+                num_shuffled = max(1, dataset_num_shuffled_records // dataset_parse_batch_size)
+            dataset = dataset.shuffle(buffer_size=num_shuffled, seed=dataset_shuffle_seed)
+
+    if dataset_prefetch_buffer_size:
+        dataset = dataset.prefetch(buffer_size=dataset_prefetch_buffer_size)
 
     return dataset
 
 
 # utils
 
+def get_deterministic(num_parallel_calls, deterministic):
+    """
+    Returns the deterministic argument of a tf.data transformation, which only applies to parallel ones.
+    """
+    return deterministic if num_parallel_calls is not None else None
+
+
+def get_dataset_cache_filepath(tfrecords_filepaths,
+                               example_class,
+                               dataset_parse_mode,
+                               dataset_parse_batch_size,
+                               dataset_cache_dirpath=None):
+    """
+    Gets the filepath of the disk cache of the records of tfrecords files parsed for an Example subclass, and removes
+    the caches of previous versions of the files.
+
+    The cache is named after what the records it holds depend on: the schema of the example class, the parse mode and
+    the set of paths of the tfrecords files, then the state of these files, i.e. their order, sizes and modification
+    times, and their rows in the manifests of their directories. Only the caches of the same schema, parse mode and set
+    of files, but of another state of the files, are stale: those of other subsets of the files are kept.
+
+    Args:
+        tfrecords_filepaths: list, of str
+        example_class: class, of Example subclass
+        dataset_parse_mode: str, 'single' or 'batched'.
+        dataset_parse_batch_size: int, size of the batches in 'batched' mode.
+        dataset_cache_dirpath: str, directory of the cache, or None for a 'cache' directory next to the first
+                               tfrecords file.
+
+    Returns:
+        filepath: str, the prefix of the files of the cache, as dataset.cache expects it.
+    """
+    if dataset_cache_dirpath is None:
+        dataset_cache_dirpath = os.path.join(os.path.dirname(os.path.abspath(tfrecords_filepaths[0])),
+                                             cts.DATASET_CACHE_DIRECTORY_NAME)
+
+    if not os.path.exists(dataset_cache_dirpath):
+        os.makedirs(dataset_cache_dirpath)
+
+    parse_key = (dataset_parse_mode, dataset_parse_batch_size if dataset_parse_mode == cts.DATASET_PARSE_MODE_BATCHED else None)
+    filepaths_key = sorted(os.path.abspath(fp) for fp in tfrecords_filepaths)
+    files_key = hashlib.sha256(repr((example_class.schema.fields, parse_key, filepaths_key)).encode('utf-8')).hexdigest()[:16]
+
+    manifests = {}
+    for dirpath in set(os.path.dirname(fp) for fp in tfrecords_filepaths):
+        tfrecord_files = manifest.load_manifest(dirpath) or []
+        manifests.update({os.path.join(dirpath, tfrecord_file['filename']): tfrecord_file for tfrecord_file in tfrecord_files})
+
+    shards = []
+    for tfrecord_filepath in tfrecords_filepaths:
+        stat = os.stat(tfrecord_filepath)
+        shards.append((os.path.abspath(tfrecord_filepath),
+                       stat.st_size,
+                       stat.st_mtime_ns,
+                       sorted(manifests.get(tfrecord_filepath, {}).items())))
+    shards_key = hashlib.sha256(repr(shards).encode('utf-8')).hexdigest()[:16]
+
+    cache_name = '%s_%s' % (files_key, shards_key)
+
+    for filename in os.listdir(dataset_cache_dirpath):
+        if filename.startswith(files_key + '_') and not filename.startswith(cache_name):
+            os.remove(os.path.join(dataset_cache_dirpath, filename))
+
+    return os.path.join(dataset_cache_dirpath, cache_name)
+
+
 def get_tfrecord_filepaths(dirpath):
     """
     Convenience function to get a reference to the list of records files in this dir path.
@@ -294,14 +510,97 @@ def get_tfrecord_filepaths(dirpath):
     if not os.path.exists(dirpath) or not os.path.isdir(dirpath):
         raise ValueError('There is no directory at %s.' % dirpath)
 
-    # make sure we sort the tfrecords in the same order than they were created. This can be shuffled afterward.
-    tfrecord_filepaths = sorted(glob.glob(os.path.join(dirpath, '*.tfr')),
-                                key= lambda fp: int(os.path.splitext(os.path.basename(fp))[0]))
+    # the manifest lists the tfrecords in the same order than they were created. This can be shuffled afterward.
+    tfrecord_files = manifest.load_manifest(dirpath)
+    if tfrecord_files is not None:
+        return [os.path.join(dirpath, tfrecord_file['filename']) for tfrecord_file in tfrecord_files]
+
+    # directories generated without manifest
+    tfrecord_filepaths = utils.list_tfrecord_filepaths(dirpath)
 
 
     return tfrecord_filepaths
 
 
+def get_num_records(tfrecord_filepaths):
+    """
+    Convenience function to get the number of records of tfrecord files from the manifests of their directories, e.g.
+    to compute the number of steps per epoch, without reading them.
+    Args:
+        tfrecord_filepaths: list, of str
+
+    Returns:
+        num_records: int, or None if a tfrecord file is not in a manifest.
+    """
+    num_records_dict = {}
+    for dirpath in set(os.path.dirname(fp) for fp in tfrecord_filepaths):
+
+        tfrecord_files = manifest.load_manifest(dirpath)
+        if tfrecord_files is None:
+            return None
+
+        num_records_dict.update({os.path.join(dirpath, tfrecord_file['filename']): tfrecord_file['num_records']
+                                 for tfrecord_file in tfrecord_files})
+
+    num_records = 0
+    for tfrecord_filepath in tfrecord_filepaths:
+
+        if num_records_dict.get(tfrecord_filepath) is None:
+            return None
+
+        num_records += num_records_dict[tfrecord_filepath]
+
+    return num_records
+
+
+def get_tfrecord_files_compression_type(tfrecord_filepaths):
+    """
+    Convenience function to get the compression type of tfrecord files from their extension.
+    Args:
+        tfrecord_filepaths: list, of str
+
+    Returns:
+        compression_type: str, 'GZIP' or 'ZLIB', or None if the files are not compressed.
+    """
+    compression_types = set(utils.get_tfrecord_file_compression_type(fp) for fp in tfrecord_filepaths)
+
+    if len(compression_types) > 1:
+        raise ValueError('The tfrecord files are compressed differently (%s).' %
+                         ', '.join(str(ct) for ct in compression_types))
+
+    return compression_types.pop() if compression_types else None
+
+
+def get_shuffle_seed(save_directory_path, examples_shuffle_seed=None, examples_resume=False):
+    """
+    Gets the seed to shuffle the examples with, and saves it in this directory so that it can be reused when resuming.
+
+    Args:
+        save_directory_path: str, path of the directory where to save the various directories
+        examples_shuffle_seed: int, seed of the shuffle, or None for a random one.
+        examples_resume: bool, whether to reuse the seed saved by an interrupted generation, if any.
+
+    Returns:
+        seed: int
+    """
+    if not os.path.exists(save_directory_path):
+        os.mkdir(save_directory_path)
+
+    seed_filepath = os.path.join(save_directory_path, cts.EXAMPLES_SHUFFLE_SEED_FILENAME)
+
+    if examples_resume and os.path.exists(seed_filepath):
+        with open(seed_filepath, 'r') as f:
+            return int(f.read())
+
+    if examples_shuffle_seed is None:
+        examples_shuffle_seed = random.randrange(2**32)
+
+    with open(seed_filepath, 'w') as f:
+        f.write(str(examples_shuffle_seed))
+
+    return examples_shuffle_seed
+
+
 def get_examples_list_filepaths(dirpath):
     """
     Convenience function to get a reference to the examples.csv files in this dir path.
@@ -0,0 +1,208 @@
+import os
+import json
+import glob
+import struct
+import hashlib
+import numpy as np
+
+import tfrecorder.helpers.constants as cts
+
+
+class SerializationCache:
+    """
+    On-disk cache of the serialized records of examples, so that rebuilding tfrecord files only loads and serializes
+    the examples that have changed since the last build, and copies the records of the others as raw bytes.
+
+    An example is identified by its class, its csv row, the kwargs passed to its `load` and `split` methods, the
+    backend serializing it (the backends do not write the features in the same order), and the fingerprint (size and
+    modification time) of its source files, as returned by `Example.get_source_filepaths`. The records are cached
+    before they are framed, so that they do not depend on the implementation of the crc32c checksums.
+
+    The cache is bounded in size: when it grows over max_size_in_bytes, the least recently used entries are evicted.
+    Entries are written atomically, so that the cache can be shared by workers in different processes.
+    """
+
+    ENTRY_EXTENSION = '.rec'
+
+    def __init__(self, cache_directory_path, max_size_in_bytes=None):
+        """
+        Args:
+            cache_directory_path: str, the directory of the cache. It is created if needed.
+            max_size_in_bytes: int, maximum size in bytes of the cache, or None for no limit.
+        """
+        self.cache_directory_path = cache_directory_path
+        self.max_size_in_bytes = max_size_in_bytes
+
+        if not os.path.exists(cache_directory_path):
+            os.makedirs(cache_directory_path, exist_ok=True)
+
+
+    @staticmethod
+    def get_key(example, writer_backend, **kwargs):
+        """
+        Computes the key of an example.
+
+        Args:
+            example: an Example object.
+            writer_backend: str, the backend serializing the example, 'tensorflow' or 'python'.
+            **kwargs: dict, arguments for the Example subclass methods such as load, etc.
+
+        Returns:
+            key: str, an hexadecimal digest.
+        """
+        fingerprints = []
+        for filepath in example.get_source_filepaths(**kwargs):
+            stat = os.stat(filepath)
+            fingerprints.append([os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns])
+
+        content = json.dumps([example.__class__.__module__,
+                              example.__class__.__qualname__,
+                              [str(v) for v in example.to_csv_row()],
+                              writer_backend,
+                              [[k, get_stable_value(v)] for k, v in sorted(kwargs.items())],
+                              fingerprints])
+
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+    def _get_entry_filepath(self, key):
+        # spread the entries over subdirectories, so that no directory gets huge
+        return os.path.join(self.cache_directory_path, key[:2], key + self.ENTRY_EXTENSION)
+
+
+    def contains(self, key):
+        return os.path.exists(self._get_entry_filepath(key))
+
+
+    def get(self, key):
+        """
+        Gets the serialized records of an example.
+
+        Args:
+            key: str, as returned by get_key.
+
+        Returns:
+            serialized_examples: list, of bytes, or None if the example is not cached.
+        """
+        entry_filepath = self._get_entry_filepath(key)
+
+        try:
+            with open(entry_filepath, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+
+        # this entry has just been used
+        os.utime(entry_filepath)
+
+        serialized_examples = []
+        offset = 0
+        while offset < len(content):
+            size, = struct.unpack_from('<Q', content, offset)
+            offset += 8
+            serialized_examples.append(content[offset:offset+size])
+            offset += size
+
+        return serialized_examples
+
+
+    def put(self, key, serialized_examples):
+        """
+        Stores the serialized records of an example.
+
+        Args:
+            key: str, as returned by get_key.
+            serialized_examples: list, of bytes.
+        """
+        entry_filepath = self._get_entry_filepath(key)
+        os.makedirs(os.path.dirname(entry_filepath), exist_ok=True)
+
+        # the pid makes the temporary file unique among the workers
+        tmp_entry_filepath = '%s.%d%s' % (entry_filepath, os.getpid(), cts.TMP_FILE_EXTENSION)
+
+        with open(tmp_entry_filepath, 'wb') as f:
+            for serialized_example in serialized_examples:
+                f.write(struct.pack('<Q', len(serialized_example)))
+                f.write(serialized_example)
+
+        os.replace(tmp_entry_filepath, entry_filepath)
+
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in its maximum size.
+
+        Returns:
+            num_evicted_entries: int
+        """
+        if self.max_size_in_bytes is None:
+            return 0
+
+        entries = []
+        size_in_bytes = 0
+        for entry_filepath in glob.glob(os.path.join(self.cache_directory_path, '*', '*' + self.ENTRY_EXTENSION)):
+            try:
+                stat = os.stat(entry_filepath)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_filepath))
+            size_in_bytes += stat.st_size
+
+        num_evicted_entries = 0
+        for _, entry_size, entry_filepath in sorted(entries):
+
+            if size_in_bytes <= self.max_size_in_bytes:
+                break
+
+            try:
+                os.remove(entry_filepath)
+            except FileNotFoundError:
+                pass
+
+            size_in_bytes -= entry_size
+            num_evicted_entries += 1
+
+        return num_evicted_entries
+
+
+def get_stable_value(value):
+    """
+    Converts a value to json, so that equal values are converted the same from one run to the next. Unlike their repr,
+    this does not depend on the order of the sets, nor on the memory addresses of the objects.
+
+    Args:
+        value: e.g. a kwarg of the Example subclass methods.
+
+    Returns:
+        stable_value: a json serializable value.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+
+    if isinstance(value, np.generic):
+        return value.item()
+
+    if isinstance(value, np.ndarray):
+        return [str(value.dtype), list(value.shape), hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()]
+
+    if isinstance(value, (bytes, bytearray)):
+        return hashlib.sha256(value).hexdigest()
+
+    if isinstance(value, (list, tuple)):
+        return [get_stable_value(v) for v in value]
+
+    if isinstance(value, (set, frozenset)):
+        return sorted((get_stable_value(v) for v in value), key=json.dumps)
+
+    if isinstance(value, dict):
+        return sorted(([get_stable_value(k), get_stable_value(v)] for k, v in value.items()), key=json.dumps)
+
+    # functions and classes, by their name
+    if hasattr(value, '__qualname__'):
+        return [getattr(value, '__module__', None), value.__qualname__]
+
+    # other objects, by their class and their attributes
+    if hasattr(value, '__dict__'):
+        return [value.__class__.__module__, value.__class__.__qualname__, get_stable_value(vars(value))]
+
+    return repr(value)
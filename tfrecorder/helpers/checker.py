@@ -1,4 +1,3 @@
-import tensorflow as tf
 import numpy as np
 import os
 import tempfile
@@ -12,6 +11,7 @@ LOGGER_NAME = 'TFRecorderChecker'
 
 def assert_example_serialize_deserialize_is_ok(example,
                                                tfrecords_files_max_size_in_bytes=1e6,
+                                               tfrecords_files_compression_type=None,
                                                **kwargs):
     """
     Check that this example can be serialized and deserialized correctly.
@@ -19,6 +19,7 @@ def assert_example_serialize_deserialize_is_ok(example,
     Args:
         example: an Example, or a list of Example, object(s).
         tfrecords_files_max_size_in_bytes: int
+        tfrecords_files_compression_type: str, 'GZIP' or 'ZLIB', or None.
         kwargs: dict, must include the kwargs required by `to_csv_file`, `load` and `split` methods.
 
     """
@@ -52,8 +53,9 @@ def assert_example_serialize_deserialize_is_ok(example,
         tf_factory.generate_and_save_tfrecords_files_for_examples_file(tfr_directory_path,
                                                                        example_class,
                                                                        examples_list_filepath,
-                                                                       tfrecords_files_max_size_in_bytes=tfrecords_files_max_size_in_bytes,
-                                                                       log_in_csv_file=True,
+                                                                       examples_tfrecord_file_max_size_in_bytes=tfrecords_files_max_size_in_bytes,
+                                                                       examples_log_in_csv_file=True,
+                                                                       examples_tfrecords_files_compression_type=tfrecords_files_compression_type,
                                                                        **kwargs
                                                                        )
 
@@ -101,7 +103,7 @@ def assert_examples_content_matches_dataset_content(examples,
     num_examples = len(examples)
 
     # check that the @tfrecordable attributes have been stored, are in the correct order and have correct values.
-    ks = examples[0].get_tfrecordable_attribute_names()
+    ks = examples[0].schema.names
 
     logger.info('Checking consistency of %d attributes %s for first example (out of %d)...' % (len(ks),
                                                                                                ' - '.join(ks),
@@ -180,6 +182,8 @@ def generate_test_dataset(tfrecords_filepaths,
     Returns:
 
     """
+    import tensorflow as tf
+
     # create one dataset object out of the list of tfrecords files
     dataset = tf_factory.generate_dataset(tfrecords_filepaths,
                                   example_class,
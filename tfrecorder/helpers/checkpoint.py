@@ -0,0 +1,157 @@
+import os
+import csv
+import json
+
+import tfrecorder.helpers.constants as cts
+import tfrecorder.helpers.utils as utils
+import tfrecorder.helpers.manifest as manifest
+
+
+class Checkpoint:
+    """
+    Keeps track of the progress of the generation of the tfrecord files of a directory, so that an interrupted
+    generation can be resumed.
+
+    The checkpoint is saved each time a tfrecord file is closed. It lists the closed tfrecord files with the indices
+    of the first and last examples they contain, and where to resume: the index of the next example to process, the
+    number of its chunks already stored in the closed tfrecord files, and the size of the examples csv file before its
+    metadata was logged.
+
+    Examples are indexed over the whole directory: when examples are appended to it, the first one is indexed after
+    the examples of the previous generations.
+    """
+
+    def __init__(self,
+                 save_directory_path,
+                 num_examples=0,
+                 num_written_chunks=0,
+                 examples_list_file_size_in_bytes=0,
+                 tfrecord_files=None,
+                 complete=False,
+                 first_example_index=0,
+                 first_tfrecord_file_index=0):
+        """
+        Args:
+            save_directory_path: str, the directory of the tfrecord files.
+            num_examples: int, index of the next example to process, i.e. number of examples already processed.
+            num_written_chunks: int, number of chunks of the next example already stored in the closed tfrecord files.
+            examples_list_file_size_in_bytes: int, size of the examples csv file before the next example was logged.
+            tfrecord_files: list, of dict describing each closed tfrecord file.
+            complete: bool, whether the generation is complete.
+            first_example_index: int, index of the first example of the current generation.
+            first_tfrecord_file_index: int, index of the first tfrecord file written by the current generation.
+        """
+        self.save_directory_path = save_directory_path
+        self.num_examples = num_examples
+        self.num_written_chunks = num_written_chunks
+        self.examples_list_file_size_in_bytes = examples_list_file_size_in_bytes
+        self.tfrecord_files = tfrecord_files if tfrecord_files is not None else []
+        self.complete = complete
+        self.first_example_index = first_example_index
+        self.first_tfrecord_file_index = first_tfrecord_file_index
+
+
+    @staticmethod
+    def get_filepath(save_directory_path):
+        return os.path.join(save_directory_path, cts.EXAMPLES_CHECKPOINT_FILENAME)
+
+
+    @classmethod
+    def load(cls, save_directory_path):
+        """
+        Loads the checkpoint saved in this directory.
+
+        Args:
+            save_directory_path: str, the directory of the tfrecord files.
+
+        Returns:
+            checkpoint: a Checkpoint object, or None if there is none.
+        """
+        checkpoint_filepath = cls.get_filepath(save_directory_path)
+
+        if not os.path.exists(checkpoint_filepath):
+            return None
+
+        with open(checkpoint_filepath, 'r') as f:
+            state = json.load(f)
+
+        return cls(save_directory_path, **state)
+
+
+    @classmethod
+    def from_tfrecord_files(cls, save_directory_path):
+        """
+        Builds the checkpoint of a complete generation from the files of this directory, for directories generated
+        without checkpoint. The number of examples is the number of rows of the examples csv file, if any, and the
+        content of the tfrecord files is unknown, only their sizes and checksums.
+
+        Args:
+            save_directory_path: str, the directory of the tfrecord files.
+
+        Returns:
+            checkpoint: a Checkpoint object.
+        """
+        tfrecord_filepaths = utils.list_tfrecord_filepaths(save_directory_path)
+
+        tfrecord_files = [{'filename': os.path.basename(fp),
+                           'num_records': None,
+                           'first_example_index': None,
+                           'last_example_index': None,
+                           'size_in_bytes': os.path.getsize(fp),
+                           'checksum': manifest.get_checksum(fp)} for fp in tfrecord_filepaths]
+
+        num_examples = 0
+        examples_list_file_size_in_bytes = 0
+
+        examples_list_filepath = os.path.join(save_directory_path, cts.EXAMPLES_LIST_FILENAME)
+        if os.path.exists(examples_list_filepath):
+            with open(examples_list_filepath, 'r', newline='') as f:
+                num_examples = sum(1 for _ in csv.reader(f))
+            examples_list_file_size_in_bytes = os.path.getsize(examples_list_filepath)
+
+        return cls(save_directory_path,
+                   num_examples=num_examples,
+                   examples_list_file_size_in_bytes=examples_list_file_size_in_bytes,
+                   tfrecord_files=tfrecord_files,
+                   complete=True,
+                   first_example_index=num_examples,
+                   first_tfrecord_file_index=len(tfrecord_files))
+
+
+    def add_tfrecord_file(self,
+                          filename,
+                          num_records,
+                          first_example_index,
+                          last_example_index,
+                          size_in_bytes=None,
+                          checksum=None):
+        """
+        Records a closed tfrecord file.
+        """
+        self.tfrecord_files.append({'filename': filename,
+                                    'num_records': num_records,
+                                    'first_example_index': first_example_index,
+                                    'last_example_index': last_example_index,
+                                    'size_in_bytes': size_in_bytes,
+                                    'checksum': checksum})
+
+
+    def save(self):
+        """
+        Saves this checkpoint. The file is replaced atomically, so that a checkpoint is never half written.
+        """
+        state = {'num_examples': self.num_examples,
+                 'num_written_chunks': self.num_written_chunks,
+                 'examples_list_file_size_in_bytes': self.examples_list_file_size_in_bytes,
+                 'tfrecord_files': self.tfrecord_files,
+                 'complete': self.complete,
+                 'first_example_index': self.first_example_index,
+                 'first_tfrecord_file_index': self.first_tfrecord_file_index}
+
+        checkpoint_filepath = self.get_filepath(self.save_directory_path)
+        tmp_checkpoint_filepath = checkpoint_filepath + cts.TMP_FILE_EXTENSION
+
+        with open(tmp_checkpoint_filepath, 'w') as f:
+            json.dump(state, f, indent=2)
+
+        os.replace(tmp_checkpoint_filepath, checkpoint_filepath)
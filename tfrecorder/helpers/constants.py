@@ -4,6 +4,31 @@ EXAMPLES_CONFIG_FILENAME = 'config.txt'
 EXAMPLES_TFRECORD_FILES_CONFIG_FILENAME = 'tfrecord_files_config.txt'
 EXAMPLES_LIST_FILENAME = 'examples.csv'
 TFRECORDS_FILES_LIST_FILENAME = 'tfrecords.csv'
+EXAMPLES_CHECKPOINT_FILENAME = 'checkpoint.json'
+EXAMPLES_SHUFFLE_SEED_FILENAME = 'shuffle_seed.txt'
+EXAMPLES_METRICS_FILENAME = 'metrics.json'
+EXAMPLES_PROFILE_REPORT_FILENAME = 'profile.txt'
+EXAMPLES_PROFILE_STATS_FILENAME = 'profile.prof'
+RECORDS_INDEX_FILENAME = 'records.idx'
+
+TFRECORD_FILE_EXTENSION = '.tfr'
+TMP_FILE_EXTENSION = '.tmp'
+RECORDS_INDEX_FILE_EXTENSION = '.idx'
+
+TFRECORD_FILE_COMPRESSION_GZIP = 'GZIP'
+TFRECORD_FILE_COMPRESSION_ZLIB = 'ZLIB'
+TFRECORD_FILE_COMPRESSION_EXTENSIONS = {TFRECORD_FILE_COMPRESSION_GZIP: '.gz',
+                                        TFRECORD_FILE_COMPRESSION_ZLIB: '.zlib'}
+
+DATASET_AUTOTUNE = -1 # the value of tf.data.AUTOTUNE, without importing tensorflow
+DATASET_READ_BUFFER_SIZE_IN_BYTES = 1 << 22
+
+DATASET_PARSE_MODE_SINGLE = 'single'
+DATASET_PARSE_MODE_BATCHED = 'batched'
+
+DATASET_CACHE_MEMORY = 'memory'
+DATASET_CACHE_DISK = 'disk'
+DATASET_CACHE_DIRECTORY_NAME = 'cache'
 
 TRAIN_DIRECTORY_NAME = 'train'
 EVAL_DIRECTORY_NAME = 'eval'
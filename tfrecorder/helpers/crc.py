@@ -0,0 +1,176 @@
+# the CRC32C checksums that frame the records of tfrecord files. The C implementations of the optional crc32c or
+# google-crc32c packages are used if one of them is installed, the numpy implementation below otherwise.
+import numpy as np
+
+try:
+    import crc32c as _crc32c
+except ImportError:
+    _crc32c = None
+
+try:
+    import google_crc32c as _google_crc32c
+except ImportError:
+    _google_crc32c = None
+
+# the reversed Castagnoli polynomial
+CRC32C_POLYNOMIAL = 0x82f63b78
+
+# tfrecord files store the checksums masked, as computing the checksum of data that embeds checksums is error prone
+CRC32C_MASK_DELTA = 0xa282ead8
+
+# the numpy implementation processes the data by blocks of this size, and shorter data one byte at a time
+CRC32C_BLOCK_SIZE_IN_BYTES = 1024
+CRC32C_NUMPY_MIN_SIZE_IN_BYTES = 512
+
+# number of blocks processed at once by numpy, which bounds its memory use to 4 bytes per byte of these blocks
+CRC32C_NUM_BLOCKS_PER_BATCH = 256
+
+
+def _get_table():
+
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ CRC32C_POLYNOMIAL if crc & 1 else crc >> 1
+        table.append(crc)
+
+    return table
+
+_TABLE = _get_table()
+
+# the tables of the numpy implementation, built when first needed
+_block_tables = None
+
+
+def _get_block_tables():
+    """
+    The crc is linear: without its initial and final xor, the crc of a block is the xor of the contributions of its
+    bytes, which only depend on their value and on their distance to the end of the block. Likewise, the crc of a
+    block following some data is the crc of that data shifted through the block, xor the crc of the block.
+
+    Returns:
+        position_table: array, of shape (CRC32C_BLOCK_SIZE_IN_BYTES, 256), the contribution of each byte value at each
+                        position of a block.
+        shift_table: array, of shape (4, 256), the contribution of each byte of a crc shifted through a whole block.
+    """
+    global _block_tables
+
+    if _block_tables is None:
+
+        table = np.array(_TABLE, dtype=np.uint32)
+
+        def shift_one_byte(crcs):
+            return table[crcs & 0xff] ^ (crcs >> 8)
+
+        position_table = np.empty((CRC32C_BLOCK_SIZE_IN_BYTES, 256), dtype=np.uint32)
+        position_table[-1] = table
+        for i in range(CRC32C_BLOCK_SIZE_IN_BYTES - 2, -1, -1):
+            position_table[i] = shift_one_byte(position_table[i + 1])
+
+        shift_table = (np.arange(256, dtype=np.uint32)[None, :] << (8 * np.arange(4, dtype=np.uint32)[:, None]))
+        for _ in range(CRC32C_BLOCK_SIZE_IN_BYTES):
+            shift_table = shift_one_byte(shift_table)
+
+        _block_tables = position_table, shift_table
+
+    return _block_tables
+
+
+def crc32c_python(data):
+    """
+    Computes the CRC32C checksum of data, one byte at a time.
+
+    Args:
+        data: bytes-like object.
+
+    Returns:
+        crc: int
+    """
+    table = _TABLE
+    crc = 0xffffffff
+    for b in memoryview(data).cast('B'):
+        crc = table[(crc ^ b) & 0xff] ^ (crc >> 8)
+
+    return crc ^ 0xffffffff
+
+
+def crc32c_numpy(data):
+    """
+    Computes the CRC32C checksum of data, a block of bytes at a time. Each block is processed by numpy, and the crcs
+    of the blocks are combined with a few table lookups each.
+
+    Args:
+        data: bytes-like object.
+
+    Returns:
+        crc: int
+    """
+    data = np.frombuffer(data, dtype=np.uint8)
+    size = len(data)
+
+    if size < 4:
+        return crc32c_python(data.tobytes())
+
+    position_table, shift_table = _get_block_tables()
+
+    # leading zeros leave the crc unchanged, so the data is padded to whole blocks. The initial value of the crc
+    # amounts to inverting its first 4 bytes.
+    padding_size = -size % CRC32C_BLOCK_SIZE_IN_BYTES
+    blocks = np.zeros(padding_size + size, dtype=np.uint8)
+    blocks[padding_size:] = data
+    blocks[padding_size:padding_size + 4] ^= 0xff
+    blocks = blocks.reshape(-1, CRC32C_BLOCK_SIZE_IN_BYTES)
+
+    shift_0, shift_1, shift_2, shift_3 = (s.tolist() for s in shift_table)
+    positions = np.arange(CRC32C_BLOCK_SIZE_IN_BYTES)
+
+    crc = 0
+    for i in range(0, len(blocks), CRC32C_NUM_BLOCKS_PER_BATCH):
+
+        block_crcs = np.bitwise_xor.reduce(position_table[positions, blocks[i:i + CRC32C_NUM_BLOCKS_PER_BATCH]], axis=1)
+
+        for block_crc in block_crcs.tolist():
+            crc = _shift(crc, shift_0, shift_1, shift_2, shift_3) ^ block_crc
+
+    return crc ^ 0xffffffff
+
+
+def _shift(crc, shift_0, shift_1, shift_2, shift_3):
+    return shift_0[crc & 0xff] ^ shift_1[(crc >> 8) & 0xff] ^ shift_2[(crc >> 16) & 0xff] ^ shift_3[crc >> 24]
+
+
+def crc32c(data):
+    """
+    Computes the CRC32C checksum of data, with the fastest implementation available.
+
+    Args:
+        data: bytes-like object.
+
+    Returns:
+        crc: int
+    """
+    if _crc32c is not None:
+        return _crc32c.crc32c(data)
+
+    if _google_crc32c is not None:
+        return _google_crc32c.value(bytes(data))
+
+    if len(data) >= CRC32C_NUMPY_MIN_SIZE_IN_BYTES:
+        return crc32c_numpy(data)
+
+    return crc32c_python(data)
+
+
+def get_masked_crc32c(data):
+    """
+    Computes the masked CRC32C checksum of data, as stored in tfrecord files.
+
+    Args:
+        data: bytes-like object.
+
+    Returns:
+        masked_crc: int
+    """
+    crc = crc32c(data)
+    return ((((crc >> 15) | (crc << 17)) & 0xffffffff) + CRC32C_MASK_DELTA) & 0xffffffff
@@ -95,10 +95,11 @@ class Property(metaclass=MetaProperty, dtype=None):
             owner: Example subclass instance
             name: str, the name of this tfrecordable property.
         """
-        if hasattr(owner, PROTO_LIST):
+        if PROTO_LIST in owner.__dict__:
             getattr(owner, PROTO_LIST).append((name, self.__class__.dtype))
         else:
-            setattr(owner, PROTO_LIST, [(name, self.__class__.dtype)])
+            # a subclass starts with a copy of the attributes of its parent, so as not to add its own to them
+            setattr(owner, PROTO_LIST, list(getattr(owner, PROTO_LIST, [])) + [(name, self.__class__.dtype)])
 
 
 
@@ -0,0 +1,232 @@
+import struct
+import numpy as np
+
+# the tags of the fields of the protobuf messages of a tf.train.Example (field number << 3 | wire type), all length
+# delimited, see tensorflow/core/example/feature.proto
+EXAMPLE_FEATURES_TAG = 0x0a
+FEATURES_FEATURE_TAG = 0x0a
+MAP_ENTRY_KEY_TAG = 0x0a
+MAP_ENTRY_VALUE_TAG = 0x12
+FEATURE_BYTES_LIST_TAG = 0x0a
+FEATURE_FLOAT_LIST_TAG = 0x12
+FEATURE_INT64_LIST_TAG = 0x1a
+LIST_VALUE_TAG = 0x0a
+
+# a varint is at most 10 bytes long
+MAX_VARINT_SIZE_IN_BYTES = 10
+
+FLOAT32_STRUCT = struct.Struct('<f')
+
+# the compiled encoders, per Example subclass
+_EXAMPLE_ENCODERS = {}
+
+
+def encode_varint(value):
+    """
+    Encodes an int as a protobuf varint. Negative ints are encoded on 64 bits, as int64 fields are.
+
+    Args:
+        value: int
+
+    Returns:
+        varint: bytes
+    """
+    if value < 0:
+        value += 1 << 64
+
+    varint = bytearray()
+    while value > 0x7f:
+        varint.append((value & 0x7f) | 0x80)
+        value >>= 7
+    varint.append(value)
+
+    return bytes(varint)
+
+
+def encode_length_delimited(tag, data):
+    return bytes([tag]) + encode_varint(len(data)) + data
+
+
+def get_varint_size(value):
+    """
+    Returns the number of bytes of the varint encoding a non-negative int.
+    """
+    size = 1
+    while value > 0x7f:
+        value >>= 7
+        size += 1
+    return size
+
+
+class ExampleEncoder:
+    """
+    Serializes the examples of an Example subclass as tf.train.Example messages without tensorflow.
+
+    The schema of the class is compiled once into one function per @tfrecordable attribute: everything that only
+    depends on the schema (the tags, the key of the feature, the sizes of the scalar features) is encoded beforehand,
+    so that encoding an example only encodes its values. The pieces of the message are then joined in a single copy,
+    the arrays being copied straight from their memory.
+
+    The features are written in the order the @tfrecordable attributes are declared, where tensorflow writes them in
+    the order of its map: the bytes may differ from those of Example.serialize_to_string, but they have the same size
+    and are parsed the same (e.g. by Example.parse_from_string).
+
+    Args:
+        example_class: the Example subclass.
+    """
+
+    def __init__(self, example_class):
+
+        self.example_class = example_class
+        self.field_encoders = [(k, self._compile_field(k, t, example_class.Field))
+                               for k, t in example_class.schema.fields]
+
+
+    @staticmethod
+    def _compile_field(name, dtype, Field):
+        """
+        Compiles the encoding of a @tfrecordable attribute, as an entry of the features map.
+
+        Args:
+            name: str, the name of the attribute, which is the key of the feature.
+            dtype: int, one of Example.Field.
+            Field: the Example.Field class.
+
+        Returns:
+            encode_field: function, taking the list of the pieces of the message and the value of the attribute,
+                          appending the pieces of the entry to the list, and returning their size in bytes.
+        """
+        key = encode_length_delimited(MAP_ENTRY_KEY_TAG, name.encode('utf-8'))
+
+        if dtype in [Field.TYPE_BOOL,
+                     Field.TYPE_INT32,
+                     Field.TYPE_INT64]:
+
+            # the whole entry is known but the varint, whose size gives the sizes of the messages holding it
+            prefixes = [None]
+            for n in range(1, MAX_VARINT_SIZE_IN_BYTES + 1):
+                prefixes.append(bytes([FEATURES_FEATURE_TAG]) + encode_varint(len(key) + n + 6) + key +
+                                bytes([MAP_ENTRY_VALUE_TAG, n + 4, FEATURE_INT64_LIST_TAG, n + 2, LIST_VALUE_TAG, n]))
+
+            # and the entries of the small ints (e.g. bools, labels) are fully known
+            small_int_entries = [prefixes[1] + bytes([v]) for v in range(0x80)]
+
+            def encode_field(pieces, value):
+                value = int(value)
+                if 0 <= value < 0x80:
+                    entry = small_int_entries[value]
+                else:
+                    varint = encode_varint(value)
+                    entry = prefixes[len(varint)] + varint
+                pieces.append(entry)
+                return len(entry)
+
+            return encode_field
+
+        if dtype in [Field.TYPE_FLOAT,
+                     Field.TYPE_DOUBLE]:
+
+            prefix = bytes([FEATURES_FEATURE_TAG]) + encode_varint(len(key) + 10) + key + \
+                     bytes([MAP_ENTRY_VALUE_TAG, 8, FEATURE_FLOAT_LIST_TAG, 6, LIST_VALUE_TAG, 4])
+
+            def encode_field(pieces, value):
+                try:
+                    value = FLOAT32_STRUCT.pack(value)
+                except OverflowError:
+                    # beyond the range of float32: cast as tensorflow does, to inf
+                    value = FLOAT32_STRUCT.pack(np.float32(value))
+                pieces.append(prefix)
+                pieces.append(value)
+                return len(prefix) + 4
+
+            return encode_field
+
+        if dtype in [Field.TYPE_STRING,
+                     Field.TYPE_ARRAY_FLOAT32,
+                     Field.TYPE_ARRAY_INT32]:
+
+            def encode_field(pieces, value):
+
+                if type(value) is np.ndarray:
+                    if value.dtype != np.float32 and value.dtype != np.int32:
+                        raise TypeError('Only int32 and float32 numpy arrays are supported. Found %s for field %s.' %
+                                        (value.dtype, name))
+                    # the bytes of the array, without copying them
+                    value = memoryview(np.ascontiguousarray(value)).cast('B')
+                    size = value.nbytes
+
+                elif type(value) is str:
+                    value = value.encode('utf-8')
+                    size = len(value)
+
+                else:
+                    raise TypeError('Type %s is not supported for bytes message. Found for field %s.' %
+                                    (type(value), name))
+
+                list_size = 1 + get_varint_size(size) + size
+                feature_size = 1 + get_varint_size(list_size) + list_size
+                entry_size = len(key) + 1 + get_varint_size(feature_size) + feature_size
+
+                header = bytes([FEATURES_FEATURE_TAG]) + encode_varint(entry_size) + key + \
+                         bytes([MAP_ENTRY_VALUE_TAG]) + encode_varint(feature_size) + \
+                         bytes([FEATURE_BYTES_LIST_TAG]) + encode_varint(list_size) + \
+                         bytes([LIST_VALUE_TAG]) + encode_varint(size)
+
+                pieces.append(header)
+                pieces.append(value)
+                return len(header) + size
+
+            return encode_field
+
+        raise TypeError('Type %s is not supported. Found for field %s.' % (dtype, name))
+
+
+    def encode(self, example):
+        """
+        Serializes an example.
+
+        Args:
+            example: an instance of the Example subclass.
+
+        Returns:
+            serialized: bytes
+        """
+        # the header of the Example message comes first, but its size is only known once the features are encoded
+        pieces = [None]
+        size = 0
+        for k, encode_field in self.field_encoders:
+            size += encode_field(pieces, getattr(example, k))
+
+        pieces[0] = bytes([EXAMPLE_FEATURES_TAG]) + encode_varint(size)
+
+        return b''.join(pieces)
+
+
+def get_example_encoder(example_class):
+    """
+    Returns the encoder of an Example subclass, compiled the first time it is needed.
+
+    Args:
+        example_class: the Example subclass.
+
+    Returns:
+        example_encoder: an ExampleEncoder object.
+    """
+    example_encoder = _EXAMPLE_ENCODERS.get(example_class)
+    if example_encoder is None:
+        example_encoder = _EXAMPLE_ENCODERS[example_class] = ExampleEncoder(example_class)
+    return example_encoder
+
+
+def encode_example(example):
+    """
+    Serializes an example as a tf.train.Example message without tensorflow, with the compiled encoder of its class
+    (see ExampleEncoder).
+
+    Args:
+        example: an Example object.
+
+    Returns:
+        serialized: bytes
+    """
+    return get_example_encoder(type(example)).encode(example)
@@ -1,10 +1,21 @@
-import tensorflow as tf
 import os
-import time
-import csv
+import math
+import functools
+import contextlib
+import itertools
+import collections.abc
+import numpy as np
 
 import tfrecorder.helpers.constants as cts
 import tfrecorder.helpers.utils as utils
+import tfrecorder.helpers.parallel as parallel
+import tfrecorder.helpers.writer as writer
+import tfrecorder.helpers.metrics as metrics
+import tfrecorder.helpers.encoder as encoder
+from tfrecorder.helpers.checkpoint import Checkpoint
+from tfrecorder.helpers.cache import SerializationCache
+from tfrecorder.helpers.planner import ShardPlanner
+from tfrecorder.helpers.profiler import Profiler
 from tfrecorder.helpers.marshaller import IgnoreExampleException
 
 LOGGER_NAME = 'TFRecorder'
@@ -12,21 +23,98 @@ LOGGER_NAME = 'TFRecorder'
 def generate_and_save_tfrecords_files_for_examples(save_directory_path,
                                                    examples,
                                                    examples_tfrecords_files_max_size_in_bytes=1e6,
+                                                   examples_tfrecords_files_max_num_records=None,
+                                                   examples_tfrecords_files_num_files=None,
+                                                   examples_tfrecords_files_balanced=False,
+                                                   examples_tfrecords_files_num_sampled_examples=16,
                                                    examples_log_in_csv_file=True,
+                                                   examples_num_workers=0,
+                                                   examples_executor=parallel.EXECUTOR_THREAD,
+                                                   examples_prefetch_num_examples=0,
+                                                   examples_prefetch_max_size_in_bytes=None,
+                                                   examples_tfrecords_files_flush_every_num_records=None,
+                                                   examples_tfrecords_files_flush_every_num_bytes=None,
+                                                   examples_tfrecords_files_compression_type=None,
+                                                   examples_tfrecords_files_compression_level=None,
+                                                   examples_index_records=False,
+                                                   examples_tfrecords_files_writer_backend=writer.BACKEND_TENSORFLOW,
+                                                   examples_resume=False,
+                                                   examples_append=False,
+                                                   examples_cache_directory_path=None,
+                                                   examples_cache_max_size_in_bytes=None,
+                                                   examples_metrics_callback=None,
+                                                   examples_profile=False,
+                                                   examples_profile_start_num_examples=10,
+                                                   examples_profile_num_examples=100,
+                                                   examples_profile_snapshot_every_num_examples=100,
+                                                   examples_profile_num_top_call_sites=10,
                                                    **kwargs):
     """
     This is the core of the TFRecorder logic.
     This function instantiates, pre-processes and stacks the examples data into tfrecords.
-    Once a given tfrecord file has reached the maximum size, it is saved, and a new tfrecord files is started.
+    Once a given tfrecord file is full, it is saved, and a new tfrecord files is started.
 
     Args:
         save_directory_path: str, where to save the tfrecord files and other related files.
-        examples: list, of Example objects
-        examples_tfrecords_files_max_size_in_bytes: int, maximum size in bytes of a tfrecord file.
+        examples: iterable, of Example objects. It is streamed, so that the examples are only instantiated as they
+                  are processed (see Example.iter_csv_file). If it has no length, the progress is logged without eta.
+        examples_tfrecords_files_max_size_in_bytes: int, maximum size in bytes of a tfrecord file, as stored on disk
+                                                    (before compression), or None.
+        examples_tfrecords_files_max_num_records: int, maximum number of records of a tfrecord file, or None.
+        examples_tfrecords_files_num_files: int, number of tfrecord files to balance the records over, or None. The
+                                            total size of the records is estimated with a dry run on a sample of the
+                                            examples.
+        examples_tfrecords_files_balanced: bool, whether to balance the records over as few tfrecord files as the
+                                           maximum size allows, so that the last one is not much smaller than the
+                                           others. The total size of the records is estimated the same way.
+        examples_tfrecords_files_num_sampled_examples: int, number of examples processed by the dry run.
         examples_log_in_csv_file: bool, whether to log the metadata of the examples in a csv file.
+        examples_num_workers: int, number of workers loading, splitting and serializing the examples in parallel. If
+                              0, examples are processed sequentially. Whatever the number of workers, the examples are
+                              written in the order they are given.
+        examples_executor: str, 'thread' or 'process'. With 'process', the examples and the kwargs must be picklable.
+        examples_prefetch_num_examples: int, number of examples loaded ahead by background threads, so that reading
+                                        the data overlaps with its serialization. If 0, examples are loaded when
+                                        processed. Not supported with the 'process' executor.
+        examples_prefetch_max_size_in_bytes: int, maximum size in bytes of the data of the examples loaded ahead, or
+                                             None for no limit.
+        examples_tfrecords_files_flush_every_num_records: int, number of records after which the tfrecord and csv
+                                                          files are flushed, or None.
+        examples_tfrecords_files_flush_every_num_bytes: int, number of bytes after which the tfrecord and csv files
+                                                        are flushed, or None. If both are None, files are only flushed
+                                                        when closed.
+        examples_tfrecords_files_compression_type: str, 'GZIP' or 'ZLIB' to compress the tfrecord files, or None.
+        examples_tfrecords_files_compression_level: int, from 0 (fastest) to 9 (smallest), or None for the default
+                                                    level of the codec.
+        examples_index_records: bool, whether to index the records by the key of their example (see Example.get_key),
+                                so that they can be read one by one afterward (see RecordIndex). Off by default, as
+                                the key is computed for every example. Compressed tfrecord files are not indexed.
+        examples_tfrecords_files_writer_backend: str, 'tensorflow', or 'python' to serialize the examples and write the
+                                                 tfrecord files without tensorflow. The records are parsed the same,
+                                                 but their features are serialized in another order.
+        examples_resume: bool, whether to resume an interrupted generation from the checkpoint saved in
+                         save_directory_path. The examples must be given in the same order than when interrupted, and
+                         their loading and splitting must be deterministic.
+        examples_append: bool, whether to append the examples to the tfrecord files already saved in
+                         save_directory_path, rather than starting from scratch. The last tfrecord file is topped up
+                         before new ones are started, and the examples csv file is extended.
+        examples_cache_directory_path: str, directory of a cache of the serialized records of the examples, or None.
+                                       The examples found in the cache are neither loaded nor serialized again, their
+                                       records are copied as they are. See Example.get_source_filepaths.
+        examples_cache_max_size_in_bytes: int, maximum size in bytes of the cache, or None for no limit. The least
+                                          recently used entries are evicted at the end of the generation.
+        examples_metrics_callback: callable, called with a Metrics object each time the progress is logged, and at
+                                   the end of the generation. The metrics are also saved in a json file.
+        examples_profile: bool, whether to profile the generation, and save a report naming the top call sites by
+                          time and by memory allocated, with the peak resident set size. See Profiler.
+        examples_profile_start_num_examples: int, number of examples processed before the cProfile window starts.
+        examples_profile_num_examples: int, number of examples in the cProfile window.
+        examples_profile_snapshot_every_num_examples: int, number of examples between two tracemalloc snapshots, or
+                                                      None not to trace the memory allocations.
+        examples_profile_num_top_call_sites: int, number of call sites listed in each section of the report.
 
     Returns:
-        -
+        num_examples: int, the number of examples of this generation.
 
     """
 
@@ -37,109 +125,539 @@ def generate_and_save_tfrecords_files_for_examples(save_directory_path,
                               logs_directory_path=save_directory_path) # if already set, logs_dir is not taken into account.
 
     # stack all classes samples data into tfrecords files
-    num_examples = len(examples)
+    # the examples may be streamed, in which case we dont know how many there are
+    num_examples = len(examples) if hasattr(examples, '__len__') else None
     tag = os.path.basename(save_directory_path)
-    logger.info('Saving %s tfrecords files for %d examples...' % (tag, num_examples))
+    logger.info('Saving %s tfrecords files for %s examples...' % (tag, num_examples if num_examples is not None
+                                                                   else 'an unknown number of'))
+
+    if examples_tfrecords_files_writer_backend != writer.BACKEND_TENSORFLOW:
+        logger.info('   The tfrecords files will be written by the %s backend.' % examples_tfrecords_files_writer_backend)
+
+    if examples_tfrecords_files_compression_type is not None:
+        logger.info('   The tfrecords files will be compressed with %s.' % examples_tfrecords_files_compression_type)
 
     if examples_log_in_csv_file:
-        examples_list_filepath = os.path.join(save_directory_path, cts.EXAMPLES_LIST_FILENAME)
         logger.info('   Metadata of the examples will be saved in a csv file.')
     else:
-        examples_list_filepath = None
         logger.info('   No metadata of the examples will be saved in a csv file.')
 
-    start_time = time.time()
+    checkpoint = None
+    if examples_resume or examples_append:
+        checkpoint = Checkpoint.load(save_directory_path)
+
+    # when appending, the last tfrecord file is topped up
+    reopen_last_tfrecord_file = False
+
+    if examples_resume and checkpoint is not None:
+
+        if checkpoint.complete:
+            logger.info('   The checkpoint says that the %d examples are already saved, nothing to resume.' %
+                        (checkpoint.num_examples - checkpoint.first_example_index))
+            return checkpoint.num_examples - checkpoint.first_example_index
+
+        logger.info('   Resuming from example %d (%d tfrecords files already saved).' %
+                    (checkpoint.num_examples - checkpoint.first_example_index, len(checkpoint.tfrecord_files)))
+
+    elif examples_append:
+
+        if checkpoint is None:
+            checkpoint = Checkpoint.from_tfrecord_files(save_directory_path)
+
+        elif not checkpoint.complete:
+            raise ValueError('The generation of the tfrecords files in %s is not complete, resume it before appending '
+                             'examples.' % save_directory_path)
+
+        # the last tfrecord file is topped up, and the reader expects all the files to be compressed the same way
+        if checkpoint.tfrecord_files and \
+           utils.get_tfrecord_file_compression_type(checkpoint.tfrecord_files[-1]['filename']) != examples_tfrecords_files_compression_type:
+            raise ValueError('The tfrecords files in %s are not compressed with %s, examples can not be appended to '
+                             'them.' % (save_directory_path, examples_tfrecords_files_compression_type))
+
+        logger.info('   Appending examples after the %d examples and %d tfrecords files already saved.' %
+                    (checkpoint.num_examples, len(checkpoint.tfrecord_files)))
+
+        # this is a new generation, that can be resumed as such
+        checkpoint.first_example_index = checkpoint.num_examples
+        checkpoint.first_tfrecord_file_index = len(checkpoint.tfrecord_files)
+        checkpoint.complete = False
+        checkpoint.save()
+
+        reopen_last_tfrecord_file = True
+
+    elif examples_resume:
+        logger.info('   No checkpoint found, starting from the first example.')
+
+    # examples are indexed over the whole directory, including the examples previously appended to it
+    first_example_index = checkpoint.num_examples if checkpoint else 0
+    first_example_num_written_chunks = checkpoint.num_written_chunks if checkpoint else 0
+    num_previous_examples = checkpoint.first_example_index if checkpoint else 0
+
+    serialization_cache = None
+    if examples_cache_directory_path is not None:
+        logger.info('   Examples will be cached in %s.' % examples_cache_directory_path)
+        serialization_cache = SerializationCache(examples_cache_directory_path,
+                                                 max_size_in_bytes=examples_cache_max_size_in_bytes)
+
+    # balancing the tfrecord files requires to know how much data there is. The estimate only depends on the examples,
+    # so that the plan is the same when resuming.
+    total_size_in_bytes = None
+    if examples_tfrecords_files_num_files is not None or examples_tfrecords_files_balanced:
+
+        if num_examples is None:
+            raise ValueError('Balancing the tfrecords files requires a list of examples, not a stream.')
+
+        total_size_in_bytes = estimate_tfrecords_files_size_in_bytes(examples,
+                                                                     num_sampled_examples=examples_tfrecords_files_num_sampled_examples,
+                                                                     serialization_cache=serialization_cache,
+                                                                     examples_tfrecords_files_writer_backend=examples_tfrecords_files_writer_backend,
+                                                                     **kwargs)
+        logger.info('   The tfrecords files are estimated to %.2e bytes.' % total_size_in_bytes)
+
+    shard_planner = ShardPlanner(max_size_in_bytes=examples_tfrecords_files_max_size_in_bytes,
+                                 max_num_records=examples_tfrecords_files_max_num_records,
+                                 num_files=examples_tfrecords_files_num_files,
+                                 total_size_in_bytes=total_size_in_bytes)
+
+    # skip the examples already stored, without loading them
+    examples = itertools.islice(examples, first_example_index - num_previous_examples, None)
+
+    # the time spent in each stage, and the throughput, of this run
+    generation_metrics = metrics.Metrics(num_examples=num_examples + num_previous_examples - first_example_index
+                                                      if num_examples is not None else None,
+                                         total_size_in_bytes=total_size_in_bytes,
+                                         callback=examples_metrics_callback)
+    metrics_filepath = os.path.join(save_directory_path, cts.EXAMPLES_METRICS_FILENAME)
+
+    if examples_num_workers > 0:
+        logger.info('   Examples will be processed by %d %s workers.' % (examples_num_workers, examples_executor))
+
+    if examples_prefetch_num_examples > 0 and examples_num_workers > 0 and examples_executor == parallel.EXECUTOR_PROCESS:
+        raise ValueError('Prefetching examples is not supported with the %s executor.' % examples_executor)
+
+    tfrecords_writer = writer.TFRecordsWriter(save_directory_path,
+                                              shard_planner=shard_planner,
+                                              log_in_csv_file=examples_log_in_csv_file,
+                                              flush_every_num_records=examples_tfrecords_files_flush_every_num_records,
+                                              flush_every_num_bytes=examples_tfrecords_files_flush_every_num_bytes,
+                                              checkpoint=checkpoint,
+                                              reopen_last_tfrecord_file=reopen_last_tfrecord_file,
+                                              compression_type=examples_tfrecords_files_compression_type,
+                                              compression_level=examples_tfrecords_files_compression_level,
+                                              index_records=examples_index_records,
+                                              backend=examples_tfrecords_files_writer_backend)
+
+    if tfrecords_writer.index_records:
+        logger.info('   The records will be indexed by the key of their example.')
+    elif examples_index_records:
+        logger.info('   The records can not be indexed, as the tfrecords files are compressed or were not indexed.')
+
+    # the workers load, split and serialize the examples, but we write their results in the order of the examples.
+    # The key of each example is only computed if its records are indexed.
+    process = functools.partial(process_example,
+                                examples_log_in_csv_file=examples_log_in_csv_file,
+                                examples_index_records=tfrecords_writer.index_records,
+                                examples_tfrecords_files_writer_backend=examples_tfrecords_files_writer_backend,
+                                serialization_cache=serialization_cache,
+                                **kwargs)
+
+    if examples_prefetch_num_examples > 0:
+
+        logger.info('   Up to %d examples will be loaded ahead%s.' % (examples_prefetch_num_examples,
+                    ' (%.2e bytes max)' % examples_prefetch_max_size_in_bytes if examples_prefetch_max_size_in_bytes else ''))
+
+        # the examples are now loaded by the prefetching threads, and the workers only split and serialize them
+        prefetcher = parallel.Prefetcher(functools.partial(load_example,
+                                                           serialization_cache=serialization_cache,
+                                                           examples_tfrecords_files_writer_backend=examples_tfrecords_files_writer_backend,
+                                                           **kwargs),
+                                         examples,
+                                         num_prefetched=examples_prefetch_num_examples,
+                                         max_size_in_bytes=examples_prefetch_max_size_in_bytes,
+                                         get_size_in_bytes=lambda loaded_example: get_example_data_size_in_bytes(loaded_example[0]),
+                                         discard=lambda loaded_example: loaded_example[0].release())
+        examples = iter(prefetcher)
+
+        # the loaded examples are charged against the budget until they are processed
+        process = functools.partial(process_prefetched_example,
+                                    prefetcher=prefetcher,
+                                    examples_log_in_csv_file=examples_log_in_csv_file,
+                                    examples_index_records=tfrecords_writer.index_records,
+                                    examples_tfrecords_files_writer_backend=examples_tfrecords_files_writer_backend,
+                                    serialization_cache=serialization_cache,
+                                    **kwargs)
+
+    processed_examples = parallel.imap_ordered(process,
+                                               examples,
+                                               num_workers=examples_num_workers,
+                                               executor=examples_executor)
+
+    profiler = None
+    if examples_profile:
+        logger.info('   The generation will be profiled.')
+        profiler = Profiler(save_directory_path,
+                            start_num_examples=examples_profile_start_num_examples,
+                            num_examples=examples_profile_num_examples,
+                            snapshot_every_num_examples=examples_profile_snapshot_every_num_examples,
+                            num_top_call_sites=examples_profile_num_top_call_sites)
+        profiler.start()
+
+    i, j = first_example_index - 1, 0
+    # on error, the workers and the prefetcher are stopped, releasing their examples, before the files are closed
+    with tfrecords_writer, profiling(profiler, logger), contextlib.closing(processed_examples):
+        for i, processed_example in enumerate(processed_examples, start=first_example_index):
+
+            # when processed sequentially, this example has just been processed
+            if profiler is not None:
+                profiler.end_example()
+
+            # when resuming, some chunks of the first example may already be stored
+            num_written_chunks = first_example_num_written_chunks if i == first_example_index else 0
+
+            # get the outcome of the loading, splitting and serialization of this example
+            try:
+                with generation_metrics.time(metrics.STAGE_WAIT):
+                    csv_row, key, serialized_chunked_examples, split_exception, timings = processed_example.result()
+            except IgnoreExampleException as e:
+                # it is not stored, but the checkpoint must count it
+                tfrecords_writer.start_example(i, num_written_chunks=num_written_chunks)
+                logger.warning(e)
+                generation_metrics.add_example()
+                continue # ignore this example
+
+            tfrecords_writer.start_example(i, num_written_chunks=num_written_chunks, key=key)
+
+            generation_metrics.add_timings(timings)
+
+            # optionally, log the metadata of this example (before it is optionally chunked)
+            if examples_log_in_csv_file:
+                with generation_metrics.time(metrics.STAGE_WRITE):
+                    tfrecords_writer.write_csv_row(csv_row)
+
+            # in case this example's data could not be chunked.
+            if split_exception is not None:
+                logger.warning(split_exception)
+                generation_metrics.add_example()
+                continue # ignore this example
+
+            num_chunked_examples = len(serialized_chunked_examples)
+
+            num_bytes = 0
+            with generation_metrics.time(metrics.STAGE_WRITE):
+                for serialized_chunked_example in serialized_chunked_examples[num_written_chunks:]:
+                    tfrecords_writer.write(serialized_chunked_example)
+                    num_bytes += ShardPlanner.get_record_size_in_bytes(serialized_chunked_example)
+
+            generation_metrics.add_example(num_records=num_chunked_examples - num_written_chunks, num_bytes=num_bytes)
+
+            del serialized_chunked_examples
+
+            if num_chunked_examples > 1:
+                j += num_chunked_examples
+
+            hop = get_progress_hop(i+1 - num_previous_examples, num_examples)
+            if i > first_example_index and (i+1 - num_previous_examples) % hop == 0:
+
+                num_chunked_examples = ' (%d chunks)' % j if j > 0 else ''
+
+                if num_examples is not None:
+                    logger.info("   Processed %d / %d examples%s and saved %d tfrecords files (eta: %s)..." %
+                                (i+1 - num_previous_examples,
+                                 num_examples,
+                                 num_chunked_examples,
+                                 tfrecords_writer.num_saved_tfrecord_files,
+                                 generation_metrics.get_eta()))
+                else:
+                    logger.info("   Processed %d examples%s and saved %d tfrecords files (%.1f examples/s)..." %
+                                (i+1 - num_previous_examples,
+                                 num_chunked_examples,
+                                 tfrecords_writer.num_saved_tfrecord_files,
+                                 generation_metrics.num_processed_examples / generation_metrics.get_elapsed_time()))
+
+                # saved along the way, so that an interrupted generation still leaves its metrics
+                generation_metrics.save(metrics_filepath)
+                generation_metrics.update()
+
+            # force clean up now
+            #gc.collect()
 
-    current_tfrecord_file_count = 0
-    current_tfrecord_file_content_size_in_bytes = 0
+    num_chunked_examples = ' (%d chunks)' % j if j > 0 else ''
+    logger.info("   Processed %d%s examples%s and saved %d tfrecords files." %
+                (i+1 - num_previous_examples,
+                 ' / %d' % num_examples if num_examples is not None else '',
+                 num_chunked_examples,
+                 tfrecords_writer.num_saved_tfrecord_files))
 
-    # as we dont want to keep data in memory, we write it to tfrecord right after it has been loaded.
-    current_tfrecord_filepath = os.path.join(save_directory_path, '%s.tfr' % current_tfrecord_file_count)
-    current_tfrecord_file_writer = tf.io.TFRecordWriter(current_tfrecord_filepath)
+    generation_metrics.stop()
+    generation_metrics.save(metrics_filepath)
+    logger.info('   %s.' % generation_metrics.get_summary())
 
-    i, j = -1, 0
-    for i, example in enumerate(examples):
+    # the entries used by this generation are the most recent ones, so they are kept first
+    if serialization_cache is not None:
+        num_evicted_entries = serialization_cache.evict()
+        if num_evicted_entries > 0:
+            logger.info('   Evicted %d examples from the cache.' % num_evicted_entries)
 
-        # instantiate the data of this example
-        try:
+    return i+1 - num_previous_examples
+
+
+@contextlib.contextmanager
+def profiling(profiler, logger):
+    """
+    Saves the report of the profiler, if any, once the generation is over, whether it succeeded or not.
+    """
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            report_filepath = profiler.stop()
+            logger.info('   Peak resident set size of %.2e bytes, profile saved in %s.' %
+                        (profiler.peak_sampled_rss_in_bytes or 0, report_filepath))
+
+
+def get_progress_hop(num_processed_examples, num_examples=None):
+    """
+    Returns every how many examples the progress is logged: ten times over the whole generation, or, if the number of
+    examples is unknown, ten times per order of magnitude of the number of examples processed so far.
+    """
+    if num_examples is not None:
+        return max(10, num_examples // 10)
+
+    return max(10, 10 ** int(math.log10(max(1, num_processed_examples))))
+
+
+def process_example(example,
+                    examples_log_in_csv_file=True,
+                    examples_index_records=False,
+                    examples_tfrecords_files_writer_backend=writer.BACKEND_TENSORFLOW,
+                    is_loaded=False,
+                    serialization_cache=None,
+                    timings=None,
+                    release=True,
+                    **kwargs):
+    """
+    Loads, optionally splits, and serializes a single example. This is the unit of work run by the workers, so it
+    only returns bytes and rows, and leaves the writing to the caller.
+
+    Args:
+        example: an Example object.
+        examples_log_in_csv_file: bool, whether to return the metadata of the example to log in a csv file.
+        examples_index_records: bool, whether to return the key the records of the example are indexed by.
+        examples_tfrecords_files_writer_backend: str, 'tensorflow', or 'python' to serialize the example without
+                                                 tensorflow.
+        is_loaded: bool, whether the data of the example has already been loaded.
+        serialization_cache: a SerializationCache object, from which the serialized records of the example are taken
+                             if it is cached, and to which they are added otherwise. Or None.
+        timings: dict, of stage: seconds already spent on this example (e.g. loading it ahead), or None.
+        release: bool, whether to release the data of the example and of its chunks once serialized. The dry run
+                 estimating the size of the tfrecord files keeps it, as the examples are written afterward.
+        **kwargs: dict, arguments for the Example subclass methods such as load, etc.
+
+    Returns:
+        csv_row: list, the metadata of the example, or None if not logged.
+        key: str, the key the records of the example are indexed by, or None if not indexed.
+        serialized_chunked_examples: list, of bytes, one per chunk, or None if the example could not be split.
+        split_exception: IgnoreExampleException raised when splitting the example, or None.
+        timings: dict, of stage: seconds spent on this example.
+
+    Raises:
+        IgnoreExampleException: if the example could not be loaded.
+
+    """
+    timings = dict(timings) if timings is not None else {}
+
+    # if this example has not changed since it was cached, its records can be copied as they are
+    if serialization_cache is not None:
+
+        with metrics.timed(timings, metrics.STAGE_CACHE):
+            cache_key = serialization_cache.get_key(example, examples_tfrecords_files_writer_backend, **kwargs)
+            serialized_chunked_examples = serialization_cache.get(cache_key)
+
+        if serialized_chunked_examples is not None:
+            csv_row = example.to_csv_row() if examples_log_in_csv_file else None
+            key = example.get_key() if examples_index_records else None
+            if release:
+                example.release()
+            return csv_row, key, serialized_chunked_examples, None, timings
+
+    # instantiate the data of this example
+    if not is_loaded:
+        with metrics.timed(timings, metrics.STAGE_LOAD):
             example.load(**kwargs)
-        except IgnoreExampleException as e:
-            logger.warning(e)
-            continue # ignore this example
 
-        # optionally, log the metadata of this example (before it is optionally chunked)
-        if examples_log_in_csv_file:
-            with open(examples_list_filepath, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(example.to_csv_row())
+    # the metadata of this example is logged before it is optionally chunked
+    csv_row = example.to_csv_row() if examples_log_in_csv_file else None
+    key = example.get_key() if examples_index_records else None
 
-        # in case this example's data needs to be chunked. If not, simply returns a list containing this single example.
-        try:
+    # in case this example's data needs to be chunked. If not, simply returns a list containing this single example.
+    try:
+        with metrics.timed(timings, metrics.STAGE_SPLIT):
             chunked_examples = example.split(**kwargs)
-        except IgnoreExampleException as e:
-            logger.warning(e)
-            continue # ignore this example
-
-        # if we have split the original example, no need to keep it around
-        num_chunked_examples = len(chunked_examples)
-        if num_chunked_examples > 1:
-            example.release()
+    except IgnoreExampleException as e:
+        return csv_row, key, None, e, timings
 
-        for chunked_example in chunked_examples:
+    # if we have split the original example, no need to keep it around
+    if len(chunked_examples) > 1 and release:
+        example.release()
 
-            # now we can check the full size of the example that will be stored
-            chunked_example_size = chunked_example.get_byte_size()
+    serialized_chunked_examples = []
+    for chunked_example in chunked_examples:
 
-            # we will stack the data until they reach a memory limit
-            if current_tfrecord_file_content_size_in_bytes + chunked_example_size <= examples_tfrecords_files_max_size_in_bytes:
+        if examples_tfrecords_files_writer_backend == writer.BACKEND_PYTHON:
 
-                # we haven't reach the max yet, keep adding to the current file
-                #with tf.io.TFRecordWriter(current_tfrecord_filepath) as writer:
-                current_tfrecord_file_writer.write(chunked_example.serialize_to_string())
-                current_tfrecord_file_writer.flush()
-                current_tfrecord_file_content_size_in_bytes += chunked_example_size
+            # the message is written directly, there is nothing to build
+            with metrics.timed(timings, metrics.STAGE_SERIALIZE):
+                serialized_chunked_examples.append(encoder.encode_example(chunked_example))
 
-            else:
+        else:
 
-                # previous file has reach its max size, create another one.
-                current_tfrecord_file_writer.close()
-                current_tfrecord_file_count += 1
+            # same as serialize_to_string, in two steps so that both can be timed
+            with metrics.timed(timings, metrics.STAGE_BUILD):
+                proto = chunked_example._to_tf_example_proto()
 
-                current_tfrecord_filepath = os.path.join(save_directory_path, '%s.tfr' % current_tfrecord_file_count)
-                current_tfrecord_file_writer = tf.io.TFRecordWriter(current_tfrecord_filepath)
+            with metrics.timed(timings, metrics.STAGE_SERIALIZE):
+                serialized_chunked_examples.append(proto.SerializeToString())
 
-                #with tf.io.TFRecordWriter(current_tfrecord_filepath) as writer:
-                current_tfrecord_file_writer.write(chunked_example.serialize_to_string())
-                current_tfrecord_file_writer.flush()
-                current_tfrecord_file_content_size_in_bytes = chunked_example_size
+            del proto
 
+        if release:
             chunked_example.release()
 
-        del chunked_examples
+    if serialization_cache is not None:
+        with metrics.timed(timings, metrics.STAGE_CACHE):
+            serialization_cache.put(cache_key, serialized_chunked_examples)
 
-        if num_chunked_examples > 1:
-            j += num_chunked_examples
+    return csv_row, key, serialized_chunked_examples, None, timings
 
-        hop = max(10, num_examples // 10)
-        if i > 0  and (i+1) % hop == 0:
 
-            num_chunked_examples = ' (%d chunks)' % j if j > 0 else ''
-            logger.info("   Processed %d / %d examples%s and saved %d tfrecords files (eta: %s)..." %
-                        (i+1,
-                         num_examples,
-                         num_chunked_examples,
-                         current_tfrecord_file_count,
-                         utils.eta_based_on_elapsed_time(i, num_examples, start_time)))
+def process_prefetched_example(prefetched_example,
+                               prefetcher=None,
+                               examples_log_in_csv_file=True,
+                               **kwargs):
+    """
+    Same as process_example, for an example loaded by the prefetcher.
 
-        # force clean up now
-        #gc.collect()
+    Args:
+        prefetched_example: a concurrent.futures.Future object, whose result is the loaded Example object and the time
+                            spent loading it, as returned by load_example.
+        prefetcher: the Prefetcher object that loaded the example, told when its data is released, or None.
+        examples_log_in_csv_file: bool, whether to return the metadata of the example to log in a csv file.
+        **kwargs: dict, arguments for the Example subclass methods such as split, etc.
 
-    current_tfrecord_file_writer.close()
-    current_tfrecord_file_count += 1
+    Raises:
+        IgnoreExampleException: if the example could not be loaded.
 
-    num_chunked_examples = ' (%d chunks)' % j if j > 0 else ''
-    logger.info("   Processed %d / %d examples%s and saved %d tfrecords files." %
-                (i+1,
-                 num_examples,
-                 num_chunked_examples,
-                 current_tfrecord_file_count))
\ No newline at end of file
+    """
+    try:
+        example, timings = prefetched_example.result()
+
+        return process_example(example,
+                               examples_log_in_csv_file=examples_log_in_csv_file,
+                               is_loaded=True,
+                               timings=timings,
+                               **kwargs)
+    finally:
+        if prefetcher is not None:
+            prefetcher.release(prefetched_example)
+
+
+def load_example(example,
+                 serialization_cache=None,
+                 examples_tfrecords_files_writer_backend=writer.BACKEND_TENSORFLOW,
+                 **kwargs):
+    """
+    Loads the data of this example and returns it with the time spent loading it, so that it can be used by the
+    prefetcher. An example found in the serialization cache is not loaded, as its data will not be needed.
+    """
+    timings = {}
+
+    if serialization_cache is None or \
+       not serialization_cache.contains(serialization_cache.get_key(example, examples_tfrecords_files_writer_backend, **kwargs)):
+        with metrics.timed(timings, metrics.STAGE_LOAD):
+            example.load(**kwargs)
+
+    return example, timings
+
+
+def estimate_tfrecords_files_size_in_bytes(examples,
+                                           num_sampled_examples=16,
+                                           serialization_cache=None,
+                                           examples_tfrecords_files_writer_backend=writer.BACKEND_TENSORFLOW,
+                                           **kwargs):
+    """
+    Estimates the size in bytes of the tfrecord files of these examples (before compression) with a dry run: a sample
+    of examples evenly spread over the collection are processed, and the size of their records is extrapolated to all the
+    examples. The estimate is exact if all the examples are sampled.
+
+    The data of the sampled examples is not released, as they are written afterward: examples holding their data
+    rather than loading it would otherwise be written empty.
+
+    Args:
+        examples: list, or any sized collection that can be iterated several times, of Example objects.
+        num_sampled_examples: int, number of examples to process.
+        serialization_cache: a SerializationCache object, so that the sampled examples are not processed twice, or
+                             None.
+        examples_tfrecords_files_writer_backend: str, 'tensorflow', or 'python' to serialize the examples without
+                                                 tensorflow.
+        **kwargs: dict, arguments for the Example subclass methods such as load, etc.
+
+    Returns:
+        size: int, the size in bytes.
+    """
+    num_examples = len(examples)
+    if num_examples == 0:
+        return 0
+
+    num_sampled_examples = max(1, min(num_sampled_examples, num_examples))
+    sampled_indices = sorted(set(int(i) for i in np.linspace(0, num_examples - 1, num_sampled_examples)))
+
+    if isinstance(examples, collections.abc.Sequence):
+        sampled_examples = (examples[i] for i in sampled_indices)
+    else:
+        # e.g. a set or a dict view, which can not be indexed but can be iterated again afterward
+        sampled_indices_set = set(sampled_indices)
+        sampled_examples = (example for i, example in enumerate(itertools.islice(examples, sampled_indices[-1] + 1))
+                            if i in sampled_indices_set)
+
+    size = 0
+    for example in sampled_examples:
+
+        try:
+            _, _, serialized_chunked_examples, split_exception, _ = process_example(example,
+                                                                                    examples_log_in_csv_file=False,
+                                                                                    examples_tfrecords_files_writer_backend=examples_tfrecords_files_writer_backend,
+                                                                                    serialization_cache=serialization_cache,
+                                                                                    release=False,
+                                                                                    **kwargs)
+        except IgnoreExampleException:
+            continue # ignored examples are not stored
+
+        if split_exception is None:
+            size += sum(ShardPlanner.get_record_size_in_bytes(s) for s in serialized_chunked_examples)
+
+    return int(size * num_examples / len(sampled_indices))
+
+
+def get_example_data_size_in_bytes(example):
+    """
+    Estimates the memory used by the @tfrecordable attributes of a loaded example.
+
+    Args:
+        example: an Example object.
+
+    Returns:
+        size: int, the size in bytes.
+    """
+    size = 0
+    for k in example.schema.names:
+
+        v = getattr(example, k)
+
+        if type(v) is np.ndarray:
+            size += v.nbytes
+        elif type(v) in [str, bytes]:
+            size += len(v)
+        elif v is not None:
+            size += 8
+
+    return size
@@ -0,0 +1,124 @@
+import struct
+import zlib
+
+import tfrecorder.helpers.constants as cts
+import tfrecorder.helpers.crc as crc
+
+# each record is preceded by its length (8 bytes) and the masked crc32c of its length (4 bytes), and followed by the
+# masked crc32c of its data (4 bytes)
+TFRECORD_HEADER_SIZE_IN_BYTES = 12
+TFRECORD_FOOTER_SIZE_IN_BYTES = 4
+
+# the window bits zlib is given for each codec: a gzip header and trailer, or a zlib one
+ZLIB_WBITS = {cts.TFRECORD_FILE_COMPRESSION_GZIP: 16 + zlib.MAX_WBITS,
+              cts.TFRECORD_FILE_COMPRESSION_ZLIB: zlib.MAX_WBITS}
+
+
+def frame_record(serialized_example):
+    """
+    Frames a serialized example as a record of a tfrecord file.
+
+    Args:
+        serialized_example: bytes-like object.
+
+    Returns:
+        header: bytes, to write before the serialized example.
+        footer: bytes, to write after it.
+    """
+    length = struct.pack('<Q', len(serialized_example))
+    header = length + struct.pack('<I', crc.get_masked_crc32c(length))
+    footer = struct.pack('<I', crc.get_masked_crc32c(serialized_example))
+
+    return header, footer
+
+
+def decompress(data, compression_type):
+    """
+    Decompresses the content of a compressed tfrecord file.
+
+    Args:
+        data: bytes-like object.
+        compression_type: str, 'GZIP' or 'ZLIB'.
+
+    Returns:
+        data: bytes
+    """
+    if compression_type not in ZLIB_WBITS:
+        raise ValueError('Unsupported compression type %s.' % compression_type)
+
+    return zlib.decompress(data, wbits=ZLIB_WBITS[compression_type])
+
+
+class TFRecordFileWriter:
+    """
+    Pure python counterpart of tf.io.TFRecordWriter, so that tfrecord files can be written without tensorflow. Given
+    the same serialized examples, the framing of the records is the same, byte for byte. Compressed files are
+    compressed by the zlib module: their content is the same, but their compressed bytes may differ from those of
+    tensorflow.
+    """
+
+    def __init__(self, filepath, compression_type=None, compression_level=None):
+        """
+        Args:
+            filepath: str
+            compression_type: str, 'GZIP' or 'ZLIB', or None for no compression.
+            compression_level: int, from 0 (fastest) to 9 (smallest), or None for the default level of the codec.
+        """
+        if compression_type is not None and compression_type not in ZLIB_WBITS:
+            raise ValueError('Unsupported compression type %s.' % compression_type)
+
+        self._file = open(filepath, 'wb')
+        self._compressor = None
+
+        if compression_type is not None:
+            self._compressor = zlib.compressobj(compression_level if compression_level is not None else -1,
+                                                zlib.DEFLATED,
+                                                ZLIB_WBITS[compression_type])
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+    def _write(self, data):
+
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+
+        self._file.write(data)
+
+
+    def write(self, serialized_example):
+        """
+        Writes a serialized example as a record.
+
+        Args:
+            serialized_example: bytes
+        """
+        header, footer = frame_record(serialized_example)
+
+        self._write(header)
+        self._write(serialized_example)
+        self._write(footer)
+
+
+    def flush(self):
+
+        if self._compressor is not None:
+            self._file.write(self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+        self._file.flush()
+
+
+    def close(self):
+
+        if self._file.closed:
+            return
+
+        if self._compressor is not None:
+            self._file.write(self._compressor.flush(zlib.Z_FINISH))
+
+        self._file.close()
@@ -0,0 +1,270 @@
+import os
+import mmap
+import hashlib
+import numpy as np
+
+import tfrecorder.helpers.constants as cts
+import tfrecorder.helpers.framing as framing
+
+# one entry per record: the hash of the key of its example, its chunk number, and where it is stored
+INDEX_ENTRY_DTYPE = np.dtype([('key_hash', '<u8'),
+                              ('chunk', '<u4'),
+                              ('tfrecord_file_index', '<u4'),
+                              ('offset', '<u8'),
+                              ('length', '<u8')])
+
+
+def get_key_hash(key):
+    """
+    Hashes the key of an example into 64 bits, so that the entries of the index have a fixed size.
+
+    Args:
+        key: str, as returned by Example.get_key.
+
+    Returns:
+        key_hash: int
+    """
+    return int.from_bytes(hashlib.blake2b(str(key).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def get_index_filepath(directory_path):
+    return os.path.join(directory_path, cts.RECORDS_INDEX_FILENAME)
+
+
+def get_tfrecord_file_index_filepath(directory_path, tfrecord_file_index):
+    return os.path.join(directory_path, '%d%s' % (tfrecord_file_index, cts.RECORDS_INDEX_FILE_EXTENSION))
+
+
+def save_entries(filepath, entries):
+    """
+    Saves index entries, sorted by key, so that they can be searched by bisection. The file is replaced atomically.
+
+    Args:
+        filepath: str
+        entries: list, of (key_hash, chunk, tfrecord_file_index, offset, length) tuples, or an array of
+                 INDEX_ENTRY_DTYPE.
+    """
+    entries = np.sort(np.array(entries, dtype=INDEX_ENTRY_DTYPE),
+                      order=['key_hash', 'chunk', 'tfrecord_file_index', 'offset'])
+
+    tmp_filepath = filepath + cts.TMP_FILE_EXTENSION
+    with open(tmp_filepath, 'wb') as f:
+        np.save(f, entries)
+
+    os.replace(tmp_filepath, filepath)
+
+
+def load_entries(filepath, mmap_mode=None):
+    """
+    Loads index entries.
+
+    Args:
+        filepath: str
+        mmap_mode: str, 'r' to map the entries rather than read them, or None.
+
+    Returns:
+        entries: array, of INDEX_ENTRY_DTYPE.
+    """
+    return np.load(filepath, mmap_mode=mmap_mode)
+
+
+def merge_index(directory_path, first_tfrecord_file_index, num_tfrecord_files):
+    """
+    Merges the index of the tfrecord files written by a generation, each saved once its tfrecord file was closed, into
+    the index of the directory, which keeps the entries of the tfrecord files written before.
+
+    Args:
+        directory_path: str, the directory of the tfrecord files.
+        first_tfrecord_file_index: int, index of the first tfrecord file written by the generation.
+        num_tfrecord_files: int, number of tfrecord files in the directory.
+
+    Returns:
+        is_merged: bool, False if some records are not indexed, in which case the directory is left without index.
+    """
+    index_filepath = get_index_filepath(directory_path)
+    tfrecord_file_index_filepaths = [get_tfrecord_file_index_filepath(directory_path, i)
+                                     for i in range(first_tfrecord_file_index, num_tfrecord_files)]
+
+    # the tfrecord files may have been written before the records were indexed
+    is_merged = all(os.path.exists(filepath) for filepath in tfrecord_file_index_filepaths) and \
+                (first_tfrecord_file_index == 0 or os.path.exists(index_filepath))
+
+    if is_merged:
+
+        entries = [load_entries(filepath) for filepath in tfrecord_file_index_filepaths]
+
+        # the entries of the tfrecord files rewritten by this generation are replaced
+        if first_tfrecord_file_index > 0:
+            previous_entries = load_entries(index_filepath)
+            entries.append(previous_entries[previous_entries['tfrecord_file_index'] < first_tfrecord_file_index])
+
+        save_entries(index_filepath, np.concatenate(entries) if entries else [])
+
+    elif os.path.exists(index_filepath):
+        os.remove(index_filepath)
+
+    for filepath in tfrecord_file_index_filepaths:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+    return is_merged
+
+
+class RecordIndex:
+    """
+    Random access to the records of a directory of uncompressed tfrecord files, by the key of their example (see
+    Example.get_key) and their chunk number.
+
+    The index is mapped rather than read, and searched by bisection on the hashes of the keys, so that opening it is
+    instantaneous whatever the number of records. Each record is then read with a single seek in its tfrecord file,
+    which is mapped as well. Keys are hashed on 64 bits: two keys sharing a hash are practically impossible, but they
+    would not be told apart.
+
+    Usage:
+        with RecordIndex(directory_path) as record_index:
+            serialized_example = record_index.get_record('example_x', chunk=0)
+            parsed_example = ExampleClass.parse_from_string(serialized_example)
+    """
+
+    def __init__(self, directory_path):
+        """
+        Args:
+            directory_path: str, a directory of tfrecord files generated with their records indexed.
+        """
+        index_filepath = get_index_filepath(directory_path)
+        if not os.path.exists(index_filepath):
+            raise ValueError('There is no index of the records in %s.' % directory_path)
+
+        self.directory_path = directory_path
+        self._entries = load_entries(index_filepath, mmap_mode='r')
+        self._key_hashes = self._entries['key_hash']
+
+        self._files = {}
+        self._mmaps = {}
+
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+    def get_tfrecord_filepath(self, tfrecord_file_index):
+        return os.path.join(self.directory_path, '%d%s' % (tfrecord_file_index, cts.TFRECORD_FILE_EXTENSION))
+
+
+    def _find_entries(self, key):
+
+        key_hash = np.uint64(get_key_hash(key))
+        start = np.searchsorted(self._key_hashes, key_hash, side='left')
+        end = np.searchsorted(self._key_hashes, key_hash, side='right')
+
+        return self._entries[start:end]
+
+
+    def get_num_chunks(self, key):
+        """
+        Returns the number of records of the example of this key, 0 if it is not indexed.
+        """
+        return len(set(self._find_entries(key)['chunk'].tolist()))
+
+
+    def find(self, key, chunk=0):
+        """
+        Finds where a record is stored.
+
+        Args:
+            key: str, the key of the example.
+            chunk: int, the chunk number of the record.
+
+        Returns:
+            tfrecord_filepath: str
+            offset: int, offset in bytes of the record in the tfrecord file, framing included.
+            length: int, size in bytes of the serialized example.
+
+        Raises:
+            KeyError: if there is no such record.
+        """
+        entries = self._find_entries(key)
+        entries = entries[entries['chunk'] == chunk]
+
+        if len(entries) == 0:
+            raise KeyError('There is no record for chunk %d of example %s in %s.' % (chunk, key, self.directory_path))
+
+        # if several examples share a key, the first one written wins
+        entry = entries[0]
+
+        return self.get_tfrecord_filepath(int(entry['tfrecord_file_index'])), int(entry['offset']), int(entry['length'])
+
+
+    def _get_mmap(self, tfrecord_filepath):
+
+        if tfrecord_filepath not in self._mmaps:
+            f = open(tfrecord_filepath, 'rb')
+            self._files[tfrecord_filepath] = f
+            self._mmaps[tfrecord_filepath] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self._mmaps[tfrecord_filepath]
+
+
+    def get_record(self, key, chunk=0):
+        """
+        Reads a record.
+
+        Args:
+            key: str, the key of the example.
+            chunk: int, the chunk number of the record.
+
+        Returns:
+            serialized_example: bytes, as returned by Example.serialize_to_string.
+
+        Raises:
+            KeyError: if there is no such record.
+        """
+        tfrecord_filepath, offset, length = self.find(key, chunk=chunk)
+
+        start = offset + framing.TFRECORD_HEADER_SIZE_IN_BYTES
+        return self._get_mmap(tfrecord_filepath)[start:start + length]
+
+
+    def get_records(self, keys, chunk=0):
+        """
+        Reads a batch of records. They are read in the order they are stored, so that each tfrecord file is read
+        forward.
+
+        Args:
+            keys: list, of str, the keys of the examples.
+            chunk: int or list of int, the chunk number of the records.
+
+        Returns:
+            serialized_examples: list, of bytes, in the order of the keys.
+
+        Raises:
+            KeyError: if there is no such record.
+        """
+        chunks = chunk if isinstance(chunk, (list, tuple)) else [chunk] * len(keys)
+        locations = [self.find(key, chunk=c) for key, c in zip(keys, chunks)]
+
+        serialized_examples = [None] * len(keys)
+        for i in sorted(range(len(keys)), key=lambda i: locations[i][:2]):
+
+            tfrecord_filepath, offset, length = locations[i]
+            start = offset + framing.TFRECORD_HEADER_SIZE_IN_BYTES
+            serialized_examples[i] = self._get_mmap(tfrecord_filepath)[start:start + length]
+
+        return serialized_examples
+
+
+    def close(self):
+
+        for m in self._mmaps.values():
+            m.close()
+        for f in self._files.values():
+            f.close()
+
+        self._mmaps = {}
+        self._files = {}
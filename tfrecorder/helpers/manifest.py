@@ -0,0 +1,155 @@
+import os
+import csv
+import zlib
+import struct
+import hashlib
+
+import tfrecorder.helpers.constants as cts
+import tfrecorder.helpers.reader as reader
+
+# the columns of the manifest, one row per tfrecord file
+MANIFEST_FIELDNAMES = ['filename', 'num_records', 'size_in_bytes', 'first_example_index', 'last_example_index',
+                       'checksum']
+MANIFEST_INT_FIELDNAMES = ['num_records', 'size_in_bytes', 'first_example_index', 'last_example_index']
+
+
+def get_manifest_filepath(directory_path):
+    return os.path.join(directory_path, cts.TFRECORDS_FILES_LIST_FILENAME)
+
+
+def get_records_hash():
+    """
+    Returns:
+        records_hash: a hashlib.sha256 object, to be updated with each record of a tfrecord file as it is written
+                      (see update_records_hash), so that its checksum is known without reading the file back.
+    """
+    return hashlib.sha256()
+
+
+def update_records_hash(records_hash, serialized_example):
+    """
+    Adds a record to the checksum of a tfrecord file: its length, then its data. The checksum does not depend on how
+    the records are framed nor compressed, so that it is the same whatever the backend and the codec.
+
+    Args:
+        records_hash: a hashlib.sha256 object, as returned by get_records_hash.
+        serialized_example: bytes-like object.
+    """
+    records_hash.update(struct.pack('<Q', len(serialized_example)))
+    records_hash.update(serialized_example)
+
+
+def get_checksum(filepath, check_crc=False):
+    """
+    Computes the checksum of a tfrecord file by reading its records back.
+
+    Args:
+        filepath: str
+        check_crc: bool, whether to check the CRC32C checksums of the records as well, so that a corrupted framing is
+                   caught too.
+
+    Returns:
+        checksum: str, the sha256 hexadecimal digest of the records of the file.
+    """
+    records_hash = get_records_hash()
+
+    for serialized_example in reader.iter_records(filepath, check_crc=check_crc):
+        update_records_hash(records_hash, serialized_example)
+
+    return records_hash.hexdigest()
+
+
+def save_manifest(directory_path, tfrecord_files):
+    """
+    Saves the manifest of the tfrecord files of a directory, so that readers can list them and count their records
+    without globbing nor scanning them. The file is replaced atomically.
+
+    Args:
+        directory_path: str, the directory of the tfrecord files.
+        tfrecord_files: list, of dict with the MANIFEST_FIELDNAMES keys, in the order of the tfrecord files. Unknown
+                        values are None.
+    """
+    manifest_filepath = get_manifest_filepath(directory_path)
+    tmp_manifest_filepath = manifest_filepath + cts.TMP_FILE_EXTENSION
+
+    with open(tmp_manifest_filepath, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDNAMES, extrasaction='ignore')
+        writer.writeheader()
+        for tfrecord_file in tfrecord_files:
+            writer.writerow({k: '' if tfrecord_file.get(k) is None else tfrecord_file[k] for k in MANIFEST_FIELDNAMES})
+
+    os.replace(tmp_manifest_filepath, manifest_filepath)
+
+
+def remove_manifest(directory_path):
+    """
+    Removes the manifest of a directory, if any, as it no longer describes its tfrecord files.
+    """
+    manifest_filepath = get_manifest_filepath(directory_path)
+
+    if os.path.exists(manifest_filepath):
+        os.remove(manifest_filepath)
+
+
+def load_manifest(directory_path):
+    """
+    Loads the manifest of the tfrecord files of a directory.
+
+    Args:
+        directory_path: str, the directory of the tfrecord files.
+
+    Returns:
+        tfrecord_files: list, of dict with the MANIFEST_FIELDNAMES keys, or None if there is no manifest.
+    """
+    manifest_filepath = get_manifest_filepath(directory_path)
+
+    if not os.path.exists(manifest_filepath):
+        return None
+
+    with open(manifest_filepath, 'r', newline='') as f:
+        tfrecord_files = list(csv.DictReader(f))
+
+    for tfrecord_file in tfrecord_files:
+        for k in MANIFEST_INT_FIELDNAMES:
+            tfrecord_file[k] = int(tfrecord_file[k]) if tfrecord_file[k] != '' else None
+        tfrecord_file['checksum'] = tfrecord_file['checksum'] or None
+
+    return tfrecord_files
+
+
+def verify_manifest(directory_path):
+    """
+    Checks that the tfrecord files of a directory are those described by its manifest.
+
+    Args:
+        directory_path: str, the directory of the tfrecord files.
+
+    Returns:
+        filenames: list, of the tfrecord files that are missing, or whose size or checksum differ.
+    """
+    tfrecord_files = load_manifest(directory_path)
+
+    if tfrecord_files is None:
+        raise ValueError('There is no manifest in %s.' % directory_path)
+
+    filenames = []
+    for tfrecord_file in tfrecord_files:
+
+        tfrecord_filepath = os.path.join(directory_path, tfrecord_file['filename'])
+
+        if not os.path.exists(tfrecord_filepath) or \
+           (tfrecord_file['size_in_bytes'] is not None and os.path.getsize(tfrecord_filepath) != tfrecord_file['size_in_bytes']) or \
+           (tfrecord_file['checksum'] is not None and not is_checksum_ok(tfrecord_filepath, tfrecord_file['checksum'])):
+            filenames.append(tfrecord_file['filename'])
+
+    return filenames
+
+
+def is_checksum_ok(tfrecord_filepath, checksum):
+    """
+    Returns whether the records of a tfrecord file match its checksum, and are framed correctly.
+    """
+    try:
+        return get_checksum(tfrecord_filepath, check_crc=True) == checksum
+    except (ValueError, OSError, zlib.error):
+        return False
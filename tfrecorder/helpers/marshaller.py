@@ -1,9 +1,12 @@
-import tensorflow as tf
 import numpy as np
 import abc
 import csv
 from collections import OrderedDict
 
+import tfrecorder.helpers.schema as schema
+
+# tensorflow takes seconds to import, so it is only imported by the functions that need it, when first called
+
 
 
 
@@ -38,10 +41,20 @@ class Example:
     #TYPE_UINT32 = 13
     #TYPE_UINT64 = 4
 
+    # the compiled @tfrecordable attributes of each subclass, see __init_subclass__
+    schema = None
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Compiles the schema of a subclass once it is defined, i.e. once its @tfrecordable attributes have all been
+        added to its proto_list.
+        """
+        super().__init_subclass__(**kwargs)
+        cls.schema = schema.Schema(getattr(cls, 'proto_list', []), cls.Field)
+
     def __init__(self):
 
         self.proto_list = []
-        self.proto = None
 
 
     def load(self, **kwargs):
@@ -65,7 +78,7 @@ class Example:
 
         Override for custom implementation.
         """
-        for k in self.get_tfrecordable_attribute_names():
+        for k in self.schema.names:
 
             # here k is the getter func name of each attribute marked as @tfrecordable
             setattr(self, k, None)
@@ -85,6 +98,20 @@ class Example:
         return [self]
 
 
+    def get_source_filepaths(self, **kwargs):
+        """
+        To be implemented by concrete subclass.
+        Optionally returns the paths of the files the data of this example is loaded from, so that the serialization
+        cache can tell when they have changed. By default, returns an empty list: cached records are then only
+        invalidated when the csv row of this example or the kwargs change.
+
+        Returns:
+            filepaths: list, of str.
+
+        """
+        return []
+
+
     @abc.abstractmethod
     def to_csv_row(self):
         """
@@ -96,6 +123,18 @@ class Example:
         """
         raise NotImplementedError('To be implemented by concrete subclass.')
 
+    def get_key(self):
+        """
+        Optionally overridden by concrete subclass.
+        Returns the key under which the records of this example are indexed, so that they can be looked up afterward
+        (see RecordIndex). It should be unique among the examples of a directory. By default, the first column of the
+        csv row.
+
+        Returns:
+            key: str
+        """
+        return str(self.to_csv_row()[0])
+
     @classmethod
     @abc.abstractmethod
     def from_csv_row(cls, row, **kwargs):
@@ -111,36 +150,32 @@ class Example:
 
     def _to_tf_example_proto(self):
         """
-        Lazily creates a protobuf message, and load values of the Example instance's attributes that have been marked as
+        Creates a protobuf message, and load values of the Example instance's attributes that have been marked as
         @tfrecordable.
+        The message is not kept on this instance: it holds a copy of the data (e.g. of the arrays), and examples are
+        usually retained in a list for the whole generation.
 
         Returns:
 
         """
-        if self.proto:
-            return self.proto
+        import tensorflow as tf
 
         feature = []
 
-        for k, t in self.get_tfrecordable_ordered_dict().items():
+        for k, kind in zip(self.schema.names, self.schema.feature_kinds):
 
             # here k is the getter func name of each attribute marked as @tfrecordable
             v = getattr(self, k)
 
-            if t in [Example.Field.TYPE_BOOL,
-                     Example.Field.TYPE_INT32,
-                     Example.Field.TYPE_INT64]:
+            if kind == schema.FEATURE_KIND_INT64:
 
                 feature.append((k, get_int64_feature(v)))
 
-            elif t in [Example.Field.TYPE_FLOAT,
-                       Example.Field.TYPE_DOUBLE]:
+            elif kind == schema.FEATURE_KIND_FLOAT:
 
                 feature.append((k, get_float_feature(v)))
 
-            elif t in [Example.Field.TYPE_STRING,
-                       Example.Field.TYPE_ARRAY_FLOAT32,
-                       Example.Field.TYPE_ARRAY_INT32]:
+            else:
 
                 if type(v) is np.ndarray:
                     # make sure that ndarray are converted to int32/float32 and then bytes if they haven't been before
@@ -157,9 +192,6 @@ class Example:
 
                 feature.append((k, get_bytes_feature(v)))
 
-            else:
-                raise TypeError('Type %s is not supported.' % t)
-
         # transform into ordered dic
         feature = OrderedDict(feature)
         proto = tf.train.Example(features=tf.train.Features(feature=feature))
@@ -167,26 +199,41 @@ class Example:
         if not proto.IsInitialized():
             raise ValueError('Some attributes of the proto have not been set. Please check: %s.' % proto.UnknownFields())
 
-        self.proto = proto
-
         return proto
 
     @classmethod
     def get_tfrecordable_attribute_names(cls):
-        return [k for k in cls.get_tfrecordable_ordered_dict().keys()]
+        """
+        Returns a new list of the names of the @tfrecordable attributes: prefer cls.schema.names, which is not rebuilt.
+        """
+        return list(cls.schema.names)
 
     @classmethod
     def get_tfrecordable_ordered_dict(cls):
-        return OrderedDict(getattr(cls, 'proto_list'))
+        """
+        Returns a new OrderedDict of the dtypes of the @tfrecordable attributes: prefer cls.schema.fields, which is not
+        rebuilt.
+        """
+        return OrderedDict(cls.schema.fields)
 
     def get_byte_size(self):
+        """
+        Builds the protobuf message just to get its size: if the example is to be serialized anyways, prefer
+        len(serialize_to_string()) which builds it only once.
+        """
         proto = self._to_tf_example_proto()
         return proto.ByteSize()
 
 
     def serialize_to_string(self):
-        proto = self._to_tf_example_proto()
-        return proto.SerializeToString()
+        """
+        Serializes this example in a single pass. The size of the record is the len() of the returned bytes, and the
+        protobuf message is freed as soon as it has been serialized.
+
+        Returns:
+            serialized: bytes
+        """
+        return self._to_tf_example_proto().SerializeToString()
 
 
     @classmethod
@@ -201,67 +248,34 @@ class Example:
         Returns:
 
         """
-        feature_description = {}
-
-        for k, t in cls.get_tfrecordable_ordered_dict().items():
-
-            if t in [Example.Field.TYPE_BOOL,
-                     Example.Field.TYPE_INT32,
-                     Example.Field.TYPE_INT64]:
-                v = tf.io.FixedLenFeature([], tf.int64, default_value=0)
-
-            elif t in [Example.Field.TYPE_FLOAT,
-                       Example.Field.TYPE_DOUBLE]:
-
-                v = tf.io.FixedLenFeature([], tf.float32, default_value=0.0)
-
-            elif t in [Example.Field.TYPE_STRING,
-                       Example.Field.TYPE_ARRAY_FLOAT32,
-                       Example.Field.TYPE_ARRAY_INT32]:
-                v = tf.io.FixedLenFeature([], tf.string, default_value='')
-
-            else:
-                raise TypeError('Type %s is not supported.' % t)
-
-            feature_description[k] = v
+        import tensorflow as tf
 
         # here we deserialize the next example of the dataset
-        parsed_features = tf.io.parse_single_example(serialized_examples, feature_description)
-
-        # we cast
-        result = [] # we iterated the ordered dict to make sure we know the order returned to the tf.Dataset later
-        for k, t in cls.get_tfrecordable_ordered_dict().items():
-
-            if t == Example.Field.TYPE_BOOL:
-                v = tf.cast(parsed_features[k], tf.bool)
-
-            elif t == Example.Field.TYPE_INT32:
-                v = tf.cast(parsed_features[k], tf.int32)
+        parsed_features = tf.io.parse_single_example(serialized_examples, cls.schema.get_feature_description())
 
-            elif t == Example.Field.TYPE_INT64:
-                v = parsed_features[k] # we have stored as int64 already
+        # we cast, in the order of the attributes so that we know the order returned to the tf.Dataset later
+        return tuple(decode(parsed_features[k]) for k, decode in zip(cls.schema.names, cls.schema.get_decoders()))
 
-            elif t == Example.Field.TYPE_FLOAT:
-                v = tf.cast(parsed_features[k], tf.float32)
 
-            elif t == Example.Field.TYPE_DOUBLE:
-                v = tf.cast(parsed_features[k], tf.float32) # we have stored as float32 anyways
-
-            elif t == Example.Field.TYPE_STRING:
-                v = parsed_features[k] # we have stored as b'string already
-
-            elif t == Example.Field.TYPE_ARRAY_INT32:
-                v = tf.io.decode_raw(parsed_features[k], tf.int32)
+    @classmethod
+    def parse_batch_from_string(cls, serialized_examples):
+        """
+        Batched counterpart of parse_from_string: parses a batch of records with a single tf.io.parse_example, and
+        decodes each array attribute of the whole batch with a single tf.io.decode_raw.
+        This method is intended to be called from a batched TFRecords dataset.
 
-            elif t == Example.Field.TYPE_ARRAY_FLOAT32:
-                v = tf.io.decode_raw(parsed_features[k], tf.float32)
+        Args:
+            serialized_examples: tf.Tensor, of shape [batch_size] and dtype tf.string.
 
-            else:
-                raise TypeError('Type %s is not supported.' % t)
+        Returns:
+            tensors: tuple, of the batched values of the @tfrecordable attributes, the arrays being RaggedTensors with
+                     one row per record.
+        """
+        import tensorflow as tf
 
-            result.append(v)
+        parsed_features = tf.io.parse_example(serialized_examples, cls.schema.get_feature_description())
 
-        return tuple(result)
+        return tuple(decode(parsed_features[k]) for k, decode in zip(cls.schema.names, cls.schema.get_batch_decoders()))
 
 
 
@@ -287,15 +301,25 @@ class Example:
         Returns:
             examples: list, of Example objects.
         """
+        # instantiate the entire file
+        return list(cls.iter_csv_file(filepath, **kwargs))
 
-        examples = []
-        with open(filepath, "r") as f:
-            reader = csv.reader(f)
-            # instantiate the entire file
-            for row in reader:
-                examples.append(cls.from_csv_row(row, **kwargs))
 
-        return examples
+    @classmethod
+    def iter_csv_file(cls, filepath, **kwargs):
+        """
+        Lazy counterpart of from_csv_file: instantiates the examples one row at a time, as they are consumed, so that
+        large csv files can be streamed to the engine.
+
+        Args:
+            filepath: str, the csv file.
+
+        Yields:
+            example: an Example object.
+        """
+        with open(filepath, "r", newline='') as f:
+            for row in csv.reader(f):
+                yield cls.from_csv_row(row, **kwargs)
 
 
 
@@ -307,17 +331,20 @@ class IgnoreExampleException(Exception):
 # utils
 def get_bytes_feature(value):
     """Returns a bytes_list from a string / byte."""
+    import tensorflow as tf
     if isinstance(value, type(tf.constant(0))):
         value = value.numpy() # BytesList won't unpack a string from an EagerTensor.
     return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
 
 def get_float_feature(value):
     """Returns a float_list from a float / double."""
+    import tensorflow as tf
     return tf.train.Feature(float_list=tf.train.FloatList(value=[value]))
 
 def get_int64_feature(value):
     """Returns an int64_list from a bool / enum / int / uint."""
-    return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
+    import tensorflow as tf
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=[int(value)])) # recent protobuf reject bools
 
 
 # from google.protobuf.proto_builder import MakeSimpleProtoClass
@@ -0,0 +1,193 @@
+import time
+import json
+import contextlib
+from collections import OrderedDict
+
+import tfrecorder.helpers.utils as utils
+
+# stages run by the workers, for each example
+STAGE_CACHE = 'cache'
+STAGE_LOAD = 'load'
+STAGE_SPLIT = 'split'
+STAGE_BUILD = 'build'
+STAGE_SERIALIZE = 'serialize'
+
+# stages run by the engine, while writing
+STAGE_WAIT = 'wait'
+STAGE_WRITE = 'write'
+
+STAGES = [STAGE_CACHE, STAGE_LOAD, STAGE_SPLIT, STAGE_BUILD, STAGE_SERIALIZE, STAGE_WAIT, STAGE_WRITE]
+
+
+@contextlib.contextmanager
+def timed(timings, stage):
+    """
+    Adds the time spent in the with block to timings[stage].
+
+    Args:
+        timings: dict, of stage: seconds.
+        stage: str
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.) + time.perf_counter() - start_time
+
+
+class Metrics:
+    """
+    Keeps track of the time spent in each stage of the generation of the tfrecord files, and of its throughput, so that
+    one can tell whether a generation is bound by reading the sources (load), by the CPU (split, build, serialize), or
+    by the output filesystem (write).
+
+    The stages run by the workers are timed by each worker and summed: with several workers, their total can exceed the
+    elapsed time. The wait stage is the time the engine spent waiting for the workers, i.e. the time the writing was
+    starved.
+
+    The eta is weighted by the bytes written rather than by the number of examples, which is more accurate when
+    examples differ in size. The total size of the records is known beforehand when the tfrecord files are balanced
+    (examples_tfrecords_files_num_files or examples_tfrecords_files_balanced), as it is then estimated by a dry run.
+    Otherwise, it is extrapolated from the mean size of the records written so far per example.
+    """
+
+    def __init__(self, num_examples=None, total_size_in_bytes=None, callback=None):
+        """
+        Args:
+            num_examples: int, number of examples to process, or None if unknown.
+            total_size_in_bytes: int, estimated size in bytes of the records to write, or None if unknown.
+            callback: callable, called with this object each time the progress is logged, and at the end.
+        """
+        self.num_examples = num_examples
+        self.total_size_in_bytes = total_size_in_bytes
+        self.callback = callback
+
+        self.stage_times = OrderedDict((stage, 0.) for stage in STAGES)
+        self.num_processed_examples = 0
+        self.num_records = 0
+        self.num_bytes = 0
+
+        self.start_time = time.time()
+        self.end_time = None
+
+
+    def add_timings(self, timings):
+        """
+        Adds the times spent in each stage by a worker on an example.
+
+        Args:
+            timings: dict, of stage: seconds.
+        """
+        for stage, seconds in timings.items():
+            self.stage_times[stage] = self.stage_times.get(stage, 0.) + seconds
+
+
+    def time(self, stage):
+        """
+        Times a stage run by the engine.
+
+        Usage:
+            with metrics.time(STAGE_WRITE):
+                ...
+        """
+        return timed(self.stage_times, stage)
+
+
+    def add_example(self, num_records=0, num_bytes=0):
+        """
+        Counts a processed example, with the number and size of the records written for it.
+        """
+        self.num_processed_examples += 1
+        self.num_records += num_records
+        self.num_bytes += num_bytes
+
+
+    def get_elapsed_time(self):
+        return (self.end_time or time.time()) - self.start_time
+
+
+    def get_estimated_total_size_in_bytes(self):
+        """
+        Returns:
+            total_size_in_bytes: float, the total size of the records if known, else extrapolated from the mean size
+                                 of the records written so far per example, or None if it can not be estimated.
+        """
+        if self.total_size_in_bytes:
+            return max(self.total_size_in_bytes, self.num_bytes)
+
+        if self.num_examples is not None and self.num_processed_examples > 0:
+            mean_size_in_bytes = self.num_bytes / self.num_processed_examples
+            return self.num_bytes + mean_size_in_bytes * max(self.num_examples - self.num_processed_examples, 0)
+
+        return None
+
+
+    def get_eta(self):
+        """
+        Weighted by the bytes written, out of the estimated total size of the records.
+
+        Returns:
+            eta: str, the formatted remaining time, or None if it can not be estimated.
+        """
+        total_size_in_bytes = self.get_estimated_total_size_in_bytes()
+        if total_size_in_bytes is None or self.num_bytes <= 0:
+            return None
+
+        return utils.eta_based_on_elapsed_time(self.num_bytes, total_size_in_bytes, self.start_time)
+
+
+    def update(self):
+        """
+        Notifies the callback, if any.
+        """
+        if self.callback is not None:
+            self.callback(self)
+
+
+    def stop(self):
+        """
+        Marks the end of the generation, and notifies the callback, if any.
+        """
+        self.end_time = time.time()
+        self.update()
+
+
+    def to_dict(self):
+
+        elapsed_time = self.get_elapsed_time()
+
+        return OrderedDict([('num_examples', self.num_examples),
+                            ('num_processed_examples', self.num_processed_examples),
+                            ('num_records', self.num_records),
+                            ('num_bytes', self.num_bytes),
+                            ('total_size_in_bytes', self.total_size_in_bytes),
+                            ('estimated_total_size_in_bytes', self.get_estimated_total_size_in_bytes()),
+                            ('elapsed_time_in_s', elapsed_time),
+                            ('examples_per_s', self.num_processed_examples / elapsed_time if elapsed_time else None),
+                            ('records_per_s', self.num_records / elapsed_time if elapsed_time else None),
+                            ('bytes_per_s', self.num_bytes / elapsed_time if elapsed_time else None),
+                            ('eta', self.get_eta()),
+                            ('stage_times_in_s', self.stage_times)])
+
+
+    def get_summary(self):
+        """
+        Returns:
+            summary: str, the throughput and the time spent in each stage, for the logs.
+        """
+        elapsed_time = self.get_elapsed_time() or 1.
+
+        stage_times = ', '.join('%s %.1fs' % (stage, seconds) for stage, seconds in self.stage_times.items() if seconds > 0)
+
+        return '%.1f examples/s, %.1f records/s, %.2e bytes/s (%s)' % (self.num_processed_examples / elapsed_time,
+                                                                        self.num_records / elapsed_time,
+                                                                        self.num_bytes / elapsed_time,
+                                                                        stage_times)
+
+
+    def save(self, filepath):
+        """
+        Saves these metrics as json.
+        """
+        with open(filepath, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,278 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from collections import deque
+
+EXECUTOR_THREAD = 'thread'
+EXECUTOR_PROCESS = 'process'
+
+
+def get_executor(executor=EXECUTOR_THREAD, num_workers=1):
+    """
+    Instantiates the pool of workers used to process the examples.
+
+    Args:
+        executor: str, either 'thread' or 'process'.
+        num_workers: int, number of workers of the pool.
+
+    Returns:
+        executor: a concurrent.futures.Executor object.
+    """
+    if executor == EXECUTOR_THREAD:
+        return ThreadPoolExecutor(max_workers=num_workers)
+
+    elif executor == EXECUTOR_PROCESS:
+        return ProcessPoolExecutor(max_workers=num_workers)
+
+    else:
+        raise ValueError('Executor %s is not supported (use %s or %s).' % (executor, EXECUTOR_THREAD, EXECUTOR_PROCESS))
+
+
+def imap_ordered(func, items, num_workers=0, executor=EXECUTOR_THREAD, num_pending_per_worker=2):
+    """
+    Applies func to each item and yields the results in the same order than the items, whatever the order in which
+    the workers complete them.
+
+    Only a bounded number of items are submitted ahead of the one being consumed, so that neither the items nor
+    their results pile up in memory. Once done, even if the consumer stopped early, the items iterator is closed (if
+    it is a generator, e.g. of a Prefetcher) after the workers, so that it can release what it holds.
+
+    Args:
+        func: callable, applied to each item. Must be picklable (i.e. a module level function or a partial of it)
+              when using the process executor.
+        items: iterable, of items to process.
+        num_workers: int, number of workers. If 0, items are processed sequentially in the calling thread.
+        executor: str, either 'thread' or 'process'.
+        num_pending_per_worker: int, number of items submitted in advance for each worker.
+
+    Yields:
+        future: a concurrent.futures.Future object, already completed or about to be, whose result() returns the
+                result of func (or raises the exception raised by func).
+    """
+    try:
+        if num_workers <= 0:
+
+            for item in items:
+                yield get_completed_future(func, item)
+
+            return
+
+        max_num_pending = num_workers * num_pending_per_worker
+
+        with get_executor(executor, num_workers) as pool:
+
+            pending = deque()
+            try:
+                for item in items:
+
+                    pending.append(pool.submit(func, item))
+
+                    if len(pending) >= max_num_pending:
+                        yield pending.popleft()
+
+                while pending:
+                    yield pending.popleft()
+
+            finally:
+                # if the consumer stopped early (e.g. on error), don't wait for work that nobody will read
+                for future in pending:
+                    future.cancel()
+
+    finally:
+        # the workers are done with the items
+        if hasattr(items, 'close'):
+            items.close()
+
+
+class Prefetcher:
+    """
+    Applies func to the items in background threads, reading ahead of the consumer, and yields the results in the
+    same order than the items.
+
+    Up to num_prefetched items are in the read-ahead window at any time. If max_size_in_bytes is given, the results
+    are charged against it from the moment their item is submitted until the consumer releases them (see release),
+    including while they are processed by the consumer's own workers: no new item is submitted once the budget is
+    reached, until enough results are released (at least one item is always in flight so that the consumer can
+    progress). The size of a result is measured as soon as it is computed, and the results not yet computed are
+    charged the average size of the others. Only one item is read ahead until the size of a first result is known.
+
+    If the consumer stops iterating early, every result it has not released, whether still in the read-ahead window
+    or already yielded, is discarded and released once computed: the consumer must be done with the yielded results
+    before closing the iteration.
+
+    Args:
+        func: callable, applied to each item, typically to load it.
+        items: iterable, of items to process.
+        num_prefetched: int, maximum number of items processed ahead of the consumer.
+        max_size_in_bytes: int, budget in bytes of the results not yet released by the consumer, or None.
+        get_size_in_bytes: callable, returning the size in bytes of a result. Required with max_size_in_bytes.
+        discard: callable, called on the results that were computed but never consumed (e.g. if the consumer
+                 stopped early), to release them.
+    """
+
+    def __init__(self,
+                 func,
+                 items,
+                 num_prefetched=1,
+                 max_size_in_bytes=None,
+                 get_size_in_bytes=None,
+                 discard=None):
+
+        if max_size_in_bytes is not None and get_size_in_bytes is None:
+            raise ValueError('A get_size_in_bytes function is required to prefetch with a memory budget.')
+
+        self.func = func
+        self.items = items
+        self.num_prefetched = num_prefetched
+        self.max_size_in_bytes = max_size_in_bytes
+        self.get_size_in_bytes = get_size_in_bytes
+        self.discard = discard
+
+        # the items submitted and not yet released by the consumer, by their future. Each one is a dict holding the
+        # size of its result, once computed, charged against the budget.
+        self._charged = {}
+
+        # the running statistics of the size of the results, to estimate those still being computed
+        self._stats = {'sum': 0, 'count': 0}
+
+        self._condition = threading.Condition()
+
+
+    def release(self, future):
+        """
+        Tells that the consumer is done with the result of this future, so that it is no longer charged against the
+        budget.
+        """
+        with self._condition:
+            self._charged.pop(future, None)
+            self._condition.notify_all()
+
+
+    def get_charged_size_in_bytes(self):
+        """
+        Returns:
+            size: float, the estimated size in bytes of the results not yet released by the consumer.
+        """
+        with self._condition:
+            return self._get_charged_size_in_bytes()
+
+
+    def _get_charged_size_in_bytes(self):
+
+        average_size_in_bytes = self._stats['sum'] / self._stats['count'] if self._stats['count'] else 0
+
+        return sum(average_size_in_bytes if c['size'] is None else c['size'] for c in self._charged.values())
+
+
+    def _call(self, item, charge):
+
+        # the size is measured before the result is handed to the consumer, which may release it right away
+        size_in_bytes = 0
+        try:
+            result = self.func(item)
+            if self.get_size_in_bytes is not None:
+                size_in_bytes = self.get_size_in_bytes(result)
+            return result
+
+        finally:
+            with self._condition:
+                charge['size'] = size_in_bytes
+                self._stats['sum'] += size_in_bytes
+                self._stats['count'] += 1
+                self._condition.notify_all()
+
+
+    def _is_under_budget(self):
+
+        if self.max_size_in_bytes is None or not self._charged:
+            return True
+
+        # until a first result tells us how large they are, we only read one item ahead
+        if not self._stats['count']:
+            return False
+
+        return self._get_charged_size_in_bytes() < self.max_size_in_bytes
+
+
+    def _submit(self, pool, item):
+
+        with self._condition:
+            charge = {'size': None}
+            future = pool.submit(self._call, item, charge)
+            self._charged[future] = charge
+
+        return future
+
+
+    def __iter__(self):
+        """
+        Yields:
+            future: a concurrent.futures.Future object, whose result() returns the result of func (or raises the
+                    exception raised by func). The consumer must pass it to release once done with its result.
+        """
+
+        items = iter(self.items)
+        pending = deque()
+
+        pool = ThreadPoolExecutor(max_workers=self.num_prefetched)
+        completed = False
+        try:
+            exhausted = False
+            while True:
+
+                # top up the read-ahead window
+                while not exhausted and len(pending) < self.num_prefetched:
+
+                    with self._condition:
+
+                        # nothing to hand to the consumer: wait for it to release enough results
+                        if not pending:
+                            self._condition.wait_for(self._is_under_budget)
+
+                        elif not self._is_under_budget():
+                            break
+
+                    try:
+                        pending.append(self._submit(pool, next(items)))
+                    except StopIteration:
+                        exhausted = True
+
+                if not pending:
+                    completed = True
+                    break
+
+                yield pending.popleft()
+
+        finally:
+            # once all the items are yielded, the consumer may still be using the last ones, which it releases itself.
+            # Otherwise, it stopped early: the items still in the window will never be read, and those already yielded
+            # but not released never will be.
+            if not completed:
+                for future in pending:
+                    future.cancel()
+
+            pool.shutdown(wait=not completed)
+
+            if not completed:
+                with self._condition:
+                    leftovers = list(self._charged)
+
+                # release what has been computed for nothing
+                for future in leftovers:
+                    if self.discard is not None and not future.cancelled() and future.exception() is None:
+                        self.discard(future.result())
+                    self.release(future)
+
+
+def get_completed_future(func, item):
+    """
+    Calls func on item and wraps its outcome in a completed Future, so that sequential and parallel processing can be
+    consumed the same way.
+    """
+    future = Future()
+
+    try:
+        future.set_result(func(item))
+    except Exception as e:
+        future.set_exception(e)
+
+    return future
@@ -0,0 +1,84 @@
+import math
+
+# each record of a tfrecord file is framed by its length (8 bytes) and two crc32c checksums (4 bytes each)
+TFRECORD_FRAMING_SIZE_IN_BYTES = 16
+
+
+class ShardPlanner:
+    """
+    Decides in which tfrecord file each record goes, i.e. when the writer must close the current tfrecord file and
+    start a new one.
+
+    The tfrecord files can be bounded by their size on disk (records and framing included, before compression), by
+    their number of records, or both. Given an estimate of the total size of the records, the planner can also
+    balance them over a fixed number of tfrecord files, or over the smallest number of tfrecord files under the
+    maximum size, so that the last tfrecord file is not much smaller than the others.
+
+    A record is never split: a record larger than the maximum size is stored alone in its own tfrecord file.
+    """
+
+    def __init__(self,
+                 max_size_in_bytes=None,
+                 max_num_records=None,
+                 num_files=None,
+                 total_size_in_bytes=None):
+        """
+        Args:
+            max_size_in_bytes: int, maximum size in bytes of a tfrecord file, or None.
+            max_num_records: int, maximum number of records of a tfrecord file, or None.
+            num_files: int, number of tfrecord files to balance the records over, or None. Requires
+                       total_size_in_bytes.
+            total_size_in_bytes: int, estimated size in bytes of all the records, framing included, or None. If given
+                                 without num_files, the records are balanced over as few tfrecord files as
+                                 max_size_in_bytes allows.
+        """
+        if num_files is not None and total_size_in_bytes is None:
+            raise ValueError('The total size of the records is required to balance them over %d files.' % num_files)
+
+        if num_files is None and total_size_in_bytes is not None and max_size_in_bytes:
+            num_files = max(1, math.ceil(total_size_in_bytes / max_size_in_bytes))
+
+        self.max_size_in_bytes = max_size_in_bytes
+        self.max_num_records = max_num_records
+        self.num_files = num_files
+
+        # the size each tfrecord file should reach when balancing
+        self.target_size_in_bytes = total_size_in_bytes / num_files if num_files else None
+
+
+    @staticmethod
+    def get_record_size_in_bytes(serialized_example):
+        """
+        Returns the size in bytes a serialized example takes in a tfrecord file.
+        """
+        return len(serialized_example) + TFRECORD_FRAMING_SIZE_IN_BYTES
+
+
+    def is_full(self, tfrecord_file_index, size_in_bytes, num_records, record_size_in_bytes=0):
+        """
+        Tells whether a record must be stored in a new tfrecord file rather than in the current one.
+
+        Args:
+            tfrecord_file_index: int, index of the current tfrecord file.
+            size_in_bytes: int, size in bytes of the records already in the current tfrecord file, framing included.
+            num_records: int, number of records already in the current tfrecord file.
+            record_size_in_bytes: int, size in bytes of the record to store, framing included.
+
+        Returns:
+            is_full: bool
+        """
+        if num_records == 0:
+            return False
+
+        if self.max_num_records and num_records >= self.max_num_records:
+            return True
+
+        if self.max_size_in_bytes and size_in_bytes + record_size_in_bytes > self.max_size_in_bytes:
+            return True
+
+        # the last tfrecord file takes whatever remains, as the total size is only an estimate
+        if self.target_size_in_bytes is not None and tfrecord_file_index < self.num_files - 1:
+            # the record goes where it brings the size of the tfrecord file closest to the target
+            return size_in_bytes + record_size_in_bytes / 2 > self.target_size_in_bytes
+
+        return False
@@ -0,0 +1,216 @@
+import os
+import io
+import sys
+import time
+import pstats
+import cProfile
+import tracemalloc
+
+import tfrecorder.helpers.constants as cts
+
+
+def get_rss_in_bytes():
+    """
+    Returns the current resident set size of this process, or None if it can not be read (it is read from /proc, so
+    only on linux).
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_peak_rss_in_bytes():
+    """
+    Returns the peak resident set size of this process since it started, or None if it can not be read (the resource
+    module is only available on posix systems).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # linux reports it in kilobytes, mac os in bytes
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+class Profiler:
+    """
+    Profiles the generation of the tfrecord files of a directory, to find where the time goes and where the memory
+    leaks, typically in the load and release methods of an Example subclass:
+
+        - cProfile statistics over a window of examples, skipping the first ones so as to leave warm up aside. Only the
+          thread of the engine is profiled: profile with no workers to see the processing of the examples.
+        - tracemalloc snapshots every few examples, compared to the first one, so that allocations that keep growing
+          stand out. This slows the generation down a lot.
+        - the resident set size, sampled after each example, and its peak.
+
+    A report naming the top call sites is saved in the directory of the tfrecord files once the generation is over.
+    """
+
+    def __init__(self,
+                 save_directory_path,
+                 start_num_examples=10,
+                 num_examples=100,
+                 snapshot_every_num_examples=100,
+                 num_top_call_sites=10):
+        """
+        Args:
+            save_directory_path: str, where to save the report.
+            start_num_examples: int, number of examples processed before the cProfile window starts.
+            num_examples: int, number of examples in the cProfile window.
+            snapshot_every_num_examples: int, number of examples between two tracemalloc snapshots, or None not to
+                                         trace the memory allocations.
+            num_top_call_sites: int, number of call sites listed in each section of the report.
+        """
+        self.save_directory_path = save_directory_path
+        self.start_num_examples = start_num_examples
+        self.num_examples = num_examples
+        self.snapshot_every_num_examples = snapshot_every_num_examples
+        self.num_top_call_sites = num_top_call_sites
+
+        self._profile = cProfile.Profile()
+        self._is_profiling = False
+        self._num_profiled_examples = 0
+
+        self._was_tracing = tracemalloc.is_tracing()
+        self._first_snapshot = None
+        self._snapshot_reports = []
+
+        self.num_processed_examples = 0
+        self.peak_sampled_rss_in_bytes = None
+        self._start_time = None
+
+
+    def start(self):
+        """
+        Starts profiling, before the first example is processed.
+        """
+        self._start_time = time.time()
+
+        if self.snapshot_every_num_examples:
+            if not self._was_tracing:
+                tracemalloc.start()
+            self._first_snapshot = self._get_snapshot()
+
+        self._sample_rss()
+        self._update_profile()
+
+
+    def end_example(self):
+        """
+        To be called each time an example has been processed.
+        """
+        self.num_processed_examples += 1
+
+        if self._is_profiling:
+            self._num_profiled_examples += 1
+
+        self._sample_rss()
+        self._update_profile()
+
+        if self.snapshot_every_num_examples and self.num_processed_examples % self.snapshot_every_num_examples == 0:
+            self._take_snapshot()
+
+
+    def stop(self):
+        """
+        Stops profiling, and saves the report.
+
+        Returns:
+            report_filepath: str
+        """
+        if self._is_profiling:
+            self._profile.disable()
+            self._is_profiling = False
+
+        if self.snapshot_every_num_examples:
+            if self.num_processed_examples % self.snapshot_every_num_examples != 0:
+                self._take_snapshot()
+            if not self._was_tracing:
+                tracemalloc.stop()
+
+        return self.save_report()
+
+
+    def _sample_rss(self):
+
+        rss = get_rss_in_bytes()
+        if rss is not None:
+            self.peak_sampled_rss_in_bytes = max(rss, self.peak_sampled_rss_in_bytes or 0)
+
+
+    def _update_profile(self):
+
+        # the window covers the processing of the next examples, as they are processed when the engine asks for them
+        if not self._is_profiling and self._num_profiled_examples == 0 and \
+           self.num_processed_examples >= self.start_num_examples:
+            self._profile.enable()
+            self._is_profiling = True
+
+        elif self._is_profiling and self._num_profiled_examples >= self.num_examples:
+            self._profile.disable()
+            self._is_profiling = False
+
+
+    @staticmethod
+    def _get_snapshot():
+
+        # the allocations of tracemalloc itself are not of interest
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def _take_snapshot(self):
+
+        differences = self._get_snapshot().compare_to(self._first_snapshot, 'lineno')
+        self._snapshot_reports.append((self.num_processed_examples,
+                                       sum(d.size_diff for d in differences),
+                                       differences[:self.num_top_call_sites]))
+
+
+    def save_report(self):
+        """
+        Saves the report, and the raw cProfile statistics if any.
+
+        Returns:
+            report_filepath: str
+        """
+        report = io.StringIO()
+
+        report.write('Profile of the generation of %s, %d examples in %s.\n\n' %
+                     (self.save_directory_path,
+                      self.num_processed_examples,
+                      time.strftime('%H:%M:%S', time.gmtime(time.time() - self._start_time))))
+
+        report.write('Peak resident set size sampled after each example: %s bytes.\n' %
+                     ('%.3e' % self.peak_sampled_rss_in_bytes if self.peak_sampled_rss_in_bytes else 'unknown'))
+        peak_rss_in_bytes = get_peak_rss_in_bytes()
+        report.write('Peak resident set size of the process since it started: %s bytes.\n\n' %
+                     ('%.3e' % peak_rss_in_bytes if peak_rss_in_bytes is not None else 'unknown'))
+
+        if self._num_profiled_examples > 0:
+
+            # the raw statistics can be loaded with pstats, or visualized with snakeviz
+            self._profile.dump_stats(os.path.join(self.save_directory_path, cts.EXAMPLES_PROFILE_STATS_FILENAME))
+
+            report.write('Top %d functions by cumulative time over %d examples (from example %d):\n' %
+                         (self.num_top_call_sites, self._num_profiled_examples, self.start_num_examples))
+            stats = pstats.Stats(self._profile, stream=report)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.num_top_call_sites)
+
+        for num_processed_examples, size_in_bytes, differences in self._snapshot_reports:
+
+            report.write('Memory allocated since the first example, after %d examples: %+.3e bytes. '
+                         'Top %d allocating call sites:\n' % (num_processed_examples,
+                                                              size_in_bytes,
+                                                              self.num_top_call_sites))
+            for difference in differences:
+                report.write('   %s\n' % difference)
+            report.write('\n')
+
+        report_filepath = os.path.join(self.save_directory_path, cts.EXAMPLES_PROFILE_REPORT_FILENAME)
+        with open(report_filepath, 'w') as f:
+            f.write(report.getvalue())
+
+        return report_filepath
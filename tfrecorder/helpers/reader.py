@@ -0,0 +1,287 @@
+import os
+import mmap
+import struct
+import numpy as np
+
+import tfrecorder.helpers.utils as utils
+import tfrecorder.helpers.crc as crc
+import tfrecorder.helpers.framing as framing
+
+# the fields of the protobuf messages of a tf.train.Example, see tensorflow/core/example/feature.proto
+EXAMPLE_FEATURES_FIELD_NUMBER = 1
+FEATURES_FEATURE_FIELD_NUMBER = 1
+MAP_ENTRY_KEY_FIELD_NUMBER = 1
+MAP_ENTRY_VALUE_FIELD_NUMBER = 2
+FEATURE_BYTES_LIST_FIELD_NUMBER = 1
+FEATURE_FLOAT_LIST_FIELD_NUMBER = 2
+FEATURE_INT64_LIST_FIELD_NUMBER = 3
+
+WIRE_TYPE_VARINT = 0
+WIRE_TYPE_FIXED64 = 1
+WIRE_TYPE_LENGTH_DELIMITED = 2
+WIRE_TYPE_FIXED32 = 5
+
+
+def _read_varint(buffer, position):
+
+    result = 0
+    shift = 0
+    while True:
+        b = buffer[position]
+        position += 1
+        result |= (b & 0x7f) << shift
+        if b < 0x80:
+            return result, position
+        shift += 7
+
+
+def _iter_fields(buffer, start, end):
+    """
+    Yields the fields of a protobuf message as (field_number, wire_type, value), where value is an int for varints,
+    and a (start, end) tuple for the others.
+    """
+    position = start
+    while position < end:
+
+        tag, position = _read_varint(buffer, position)
+        field_number, wire_type = tag >> 3, tag & 0x7
+
+        if wire_type == WIRE_TYPE_VARINT:
+            value, position = _read_varint(buffer, position)
+        elif wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+            length, position = _read_varint(buffer, position)
+            value = (position, position + length)
+            position += length
+        elif wire_type == WIRE_TYPE_FIXED32:
+            value = (position, position + 4)
+            position += 4
+        elif wire_type == WIRE_TYPE_FIXED64:
+            value = (position, position + 8)
+            position += 8
+        else:
+            raise ValueError('Unsupported protobuf wire type %d.' % wire_type)
+
+        yield field_number, wire_type, value
+
+    if position != end:
+        raise ValueError('Truncated protobuf message.')
+
+
+def parse_features(serialized_example):
+    """
+    Parses a serialized tf.train.Example into its features, without copying them.
+
+    Args:
+        serialized_example: bytes-like object.
+
+    Returns:
+        features: dict, of name: (kind, values) where kind is the field number of the list in the Feature message,
+                  and values a list of (start, end) tuples for bytes and floats, or of ints for int64s.
+    """
+    buffer = memoryview(serialized_example).cast('B')
+
+    features = {}
+    for field_number, _, (start, end) in _iter_fields(buffer, 0, len(buffer)):
+
+        if field_number != EXAMPLE_FEATURES_FIELD_NUMBER:
+            continue
+
+        for field_number, _, (entry_start, entry_end) in _iter_fields(buffer, start, end):
+
+            if field_number != FEATURES_FEATURE_FIELD_NUMBER:
+                continue
+
+            name, feature = None, None
+            for field_number, _, value in _iter_fields(buffer, entry_start, entry_end):
+                if field_number == MAP_ENTRY_KEY_FIELD_NUMBER:
+                    name = bytes(buffer[value[0]:value[1]]).decode('utf-8')
+                elif field_number == MAP_ENTRY_VALUE_FIELD_NUMBER:
+                    feature = value
+
+            if name is not None:
+                features[name] = _parse_feature(buffer, *feature) if feature is not None else (None, [])
+
+    return features
+
+
+def _parse_feature(buffer, start, end):
+
+    kind, values = None, []
+    for kind, _, (list_start, list_end) in _iter_fields(buffer, start, end):
+
+        values = []
+        for _, wire_type, value in _iter_fields(buffer, list_start, list_end):
+
+            if kind == FEATURE_INT64_LIST_FIELD_NUMBER and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+                # packed varints
+                position = value[0]
+                while position < value[1]:
+                    v, position = _read_varint(buffer, position)
+                    values.append(v)
+
+            elif kind == FEATURE_FLOAT_LIST_FIELD_NUMBER and wire_type == WIRE_TYPE_LENGTH_DELIMITED:
+                # packed floats, 4 bytes each
+                values.extend((p, p + 4) for p in range(value[0], value[1], 4))
+
+            else:
+                values.append(value)
+
+    return kind, values
+
+
+def _to_signed_int64(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def parse_example(serialized_example, example_class):
+    """
+    Parses a serialized example into the same tuple as Example.parse_from_string, without tensorflow. Scalars come
+    back as numpy scalars, strings as bytes, and arrays as flat numpy arrays viewing the serialized example.
+
+    Args:
+        serialized_example: bytes-like object, e.g. a memoryview of a mapped tfrecord file.
+        example_class: the Example subclass the example was serialized from.
+
+    Returns:
+        parsed_example: tuple, of the values of the @tfrecordable attributes, in the order they are declared.
+    """
+    Field = example_class.Field
+
+    buffer = memoryview(serialized_example).cast('B')
+    features = parse_features(buffer)
+
+    result = []
+    for k, t in example_class.schema.fields:
+
+        _, values = features.get(k, (None, []))
+
+        if t in [Field.TYPE_BOOL,
+                 Field.TYPE_INT32,
+                 Field.TYPE_INT64]:
+
+            v = _to_signed_int64(values[0]) if values else 0
+
+            if t == Field.TYPE_BOOL:
+                v = np.bool_(v)
+            elif t == Field.TYPE_INT32:
+                v = np.int64(v).astype(np.int32)
+            else:
+                v = np.int64(v)
+
+        elif t in [Field.TYPE_FLOAT,
+                   Field.TYPE_DOUBLE]:
+
+            # we have stored as float32 anyways
+            v = np.frombuffer(buffer[values[0][0]:values[0][1]], dtype='<f4')[0] if values else np.float32(0.)
+
+        elif t == Field.TYPE_STRING:
+
+            v = bytes(buffer[values[0][0]:values[0][1]]) if values else b''
+
+        elif t in [Field.TYPE_ARRAY_INT32,
+                   Field.TYPE_ARRAY_FLOAT32]:
+
+            dtype = '<i4' if t == Field.TYPE_ARRAY_INT32 else '<f4'
+            v = np.frombuffer(buffer[values[0][0]:values[0][1]] if values else b'', dtype=dtype)
+
+        else:
+            raise TypeError('Type %s is not supported.' % t)
+
+        result.append(v)
+
+    return tuple(result)
+
+
+def map_tfrecord_file(tfrecord_filepath):
+    """
+    Maps a tfrecord file in memory. The mapping stays valid as long as something refers to it, e.g. the arrays viewing
+    its records. A compressed tfrecord file can not be mapped: it is decompressed in memory instead.
+
+    Returns:
+        buffer: a mmap object, or bytes if the file is compressed or empty.
+    """
+    compression_type = utils.get_tfrecord_file_compression_type(tfrecord_filepath)
+
+    if compression_type is not None:
+        with open(tfrecord_filepath, 'rb') as f:
+            return framing.decompress(f.read(), compression_type)
+
+    if os.path.getsize(tfrecord_filepath) == 0:
+        return b''
+
+    with open(tfrecord_filepath, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_records(tfrecord_filepath, check_crc=False):
+    """
+    Yields the records of a tfrecord file, as memoryviews of the mapped (or decompressed) file.
+
+    Args:
+        tfrecord_filepath: str
+        check_crc: bool, whether to check the CRC32C checksums of the length and of the data of each record. It is
+                   slow unless the crc32c or google-crc32c package is installed.
+
+    Yields:
+        serialized_example: memoryview
+    """
+    buffer = memoryview(map_tfrecord_file(tfrecord_filepath))
+
+    offset = 0
+    while offset < len(buffer):
+
+        if offset + framing.TFRECORD_HEADER_SIZE_IN_BYTES > len(buffer):
+            raise ValueError('Truncated record at offset %d of %s.' % (offset, tfrecord_filepath))
+
+        length, length_crc = struct.unpack_from('<QI', buffer, offset)
+        start = offset + framing.TFRECORD_HEADER_SIZE_IN_BYTES
+        end = start + length
+
+        if end + framing.TFRECORD_FOOTER_SIZE_IN_BYTES > len(buffer):
+            raise ValueError('Truncated record at offset %d of %s.' % (offset, tfrecord_filepath))
+
+        if check_crc:
+            data_crc, = struct.unpack_from('<I', buffer, end)
+            if crc.get_masked_crc32c(buffer[offset:offset + 8]) != length_crc or \
+               crc.get_masked_crc32c(buffer[start:end]) != data_crc:
+                raise ValueError('Corrupted record at offset %d of %s.' % (offset, tfrecord_filepath))
+
+        yield buffer[start:end]
+        offset = end + framing.TFRECORD_FOOTER_SIZE_IN_BYTES
+
+
+class NumpyReader:
+    """
+    Reads the examples of tfrecord files without tensorflow, e.g. for inspection scripts or to feed other
+    frameworks. The examples are parsed according to the @tfrecordable attributes of their Example subclass, into the
+    same tuples as a dataset of the factory, but with numpy values: the arrays are views of the mapped tfrecord files,
+    so that no data is copied. Copy them to keep them writable or independent of the files. Compressed tfrecord files
+    are decompressed in memory, one at a time.
+
+    Usage:
+        for name, label, data in NumpyReader(tfrecord_filepaths, ExampleClass):
+            ...
+    """
+
+    def __init__(self, tfrecord_filepaths, example_class, check_crc=False):
+        """
+        Args:
+            tfrecord_filepaths: list, of str, read in this order.
+            example_class: the Example subclass the examples were serialized from.
+            check_crc: bool, whether to check the CRC32C checksums of the records.
+        """
+        self.tfrecord_filepaths = tfrecord_filepaths
+        self.example_class = example_class
+        self.check_crc = check_crc
+
+
+    def iter_serialized_examples(self):
+
+        for tfrecord_filepath in self.tfrecord_filepaths:
+            yield from iter_records(tfrecord_filepath, check_crc=self.check_crc)
+
+
+    def __iter__(self):
+
+        for serialized_example in self.iter_serialized_examples():
+            yield parse_example(serialized_example, self.example_class)
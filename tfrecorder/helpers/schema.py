@@ -0,0 +1,165 @@
+from collections import OrderedDict
+
+# the lists of the tf.train.Feature messages the @tfrecordable attributes are stored as
+FEATURE_KIND_INT64 = 'int64'
+FEATURE_KIND_FLOAT = 'float'
+FEATURE_KIND_BYTES = 'bytes'
+
+
+def get_feature_kind(dtype, Field):
+    """
+    Returns the list of the tf.train.Feature message a @tfrecordable attribute is stored as.
+
+    Args:
+        dtype: int, one of Example.Field.
+        Field: the Example.Field class.
+
+    Returns:
+        feature_kind: str, 'int64', 'float' or 'bytes'.
+
+    Raises:
+        TypeError: if the dtype is not supported.
+    """
+    if dtype in [Field.TYPE_BOOL,
+                 Field.TYPE_INT32,
+                 Field.TYPE_INT64]:
+        return FEATURE_KIND_INT64
+
+    if dtype in [Field.TYPE_FLOAT,
+                 Field.TYPE_DOUBLE]:
+        return FEATURE_KIND_FLOAT
+
+    if dtype in [Field.TYPE_STRING,
+                 Field.TYPE_ARRAY_FLOAT32,
+                 Field.TYPE_ARRAY_INT32]:
+        return FEATURE_KIND_BYTES
+
+    raise TypeError('Type %s is not supported.' % dtype)
+
+
+class Schema:
+    """
+    The @tfrecordable attributes of an Example subclass, compiled once when the class is defined (see
+    Example.__init_subclass__), so that serializing, checking and parsing examples do not rebuild them from the
+    proto_list of the class for each record.
+
+    It is not to be modified: the fields are tuples, and the feature description and the decoders used to parse the
+    records with tensorflow are built the first time they are needed, as tensorflow is only imported then.
+
+    Args:
+        proto_list: list, of (name, dtype) tuples, in the order the attributes are declared.
+        Field: the Example.Field class.
+    """
+
+    def __init__(self, proto_list, Field):
+
+        self.Field = Field
+
+        # an attribute declared twice (e.g. overridden by a subclass) keeps its first position, as in an OrderedDict
+        self.fields = tuple(OrderedDict(proto_list).items())
+        self.names = tuple(k for k, _ in self.fields)
+        self.dtypes = tuple(t for _, t in self.fields)
+        self.feature_kinds = tuple(get_feature_kind(t, Field) for t in self.dtypes)
+
+        self._feature_description = None
+        self._decoders = None
+        self._batch_decoders = None
+
+
+    def __len__(self):
+        return len(self.fields)
+
+
+    def __iter__(self):
+        return iter(self.fields)
+
+
+    def __repr__(self):
+        return 'Schema(%s)' % ', '.join('%s: %s' % (k, t) for k, t in self.fields)
+
+
+    def get_feature_description(self):
+        """
+        Returns:
+            feature_description: dict, of name: tf.io.FixedLenFeature, to parse the records with
+                                 tf.io.parse_single_example or tf.io.parse_example.
+        """
+        if self._feature_description is None:
+
+            import tensorflow as tf
+
+            defaults = {FEATURE_KIND_INT64: (tf.int64, 0),
+                        FEATURE_KIND_FLOAT: (tf.float32, 0.0),
+                        FEATURE_KIND_BYTES: (tf.string, '')}
+
+            self._feature_description = {k: tf.io.FixedLenFeature([], defaults[kind][0], default_value=defaults[kind][1])
+                                         for k, kind in zip(self.names, self.feature_kinds)}
+
+        return self._feature_description
+
+
+    def get_decoders(self):
+        """
+        Returns:
+            decoders: tuple, of the functions casting each parsed feature to the tensor of its attribute, in the order
+                      the attributes are declared.
+        """
+        if self._decoders is None:
+
+            import tensorflow as tf
+
+            Field = self.Field
+
+            decoders = {Field.TYPE_BOOL: lambda v: tf.cast(v, tf.bool),
+                        Field.TYPE_INT32: lambda v: tf.cast(v, tf.int32),
+                        Field.TYPE_INT64: lambda v: v, # we have stored as int64 already
+                        Field.TYPE_FLOAT: lambda v: v, # we have stored as float32 anyways, as doubles
+                        Field.TYPE_STRING: lambda v: v, # we have stored as b'string already
+                        Field.TYPE_ARRAY_INT32: lambda v: tf.io.decode_raw(v, tf.int32),
+                        Field.TYPE_ARRAY_FLOAT32: lambda v: tf.io.decode_raw(v, tf.float32)}
+
+            self._decoders = tuple(decoders[t] for t in self.dtypes)
+
+        return self._decoders
+
+
+    def get_batch_decoders(self):
+        """
+        Returns:
+            batch_decoders: tuple, of the functions casting each feature parsed for a batch of records, in the order
+                            the attributes are declared. The arrays are decoded as RaggedTensors, with one row per
+                            record, as the records may hold arrays of different sizes.
+        """
+        if self._batch_decoders is None:
+
+            import tensorflow as tf
+
+            Field = self.Field
+
+            # the scalars are cast the same, whether they are batched or not
+            decoders = dict(zip(self.dtypes, self.get_decoders()))
+            decoders[Field.TYPE_ARRAY_INT32] = lambda v: decode_raw_batch(v, tf.int32)
+            decoders[Field.TYPE_ARRAY_FLOAT32] = lambda v: decode_raw_batch(v, tf.float32)
+
+            self._batch_decoders = tuple(decoders[t] for t in self.dtypes)
+
+        return self._batch_decoders
+
+
+def decode_raw_batch(serialized_arrays, dtype):
+    """
+    Decodes a batch of arrays of possibly different sizes with a single tf.io.decode_raw, rather than one per array.
+
+    Args:
+        serialized_arrays: tf.Tensor, of shape [batch_size] and dtype tf.string.
+        dtype: tf.DType, of the arrays.
+
+    Returns:
+        arrays: tf.RaggedTensor, of shape [batch_size, None].
+    """
+    import tensorflow as tf
+
+    values = tf.io.decode_raw(tf.strings.reduce_join(serialized_arrays), dtype)
+    row_lengths = tf.cast(tf.strings.length(serialized_arrays) // dtype.size, tf.int64)
+
+    return tf.RaggedTensor.from_row_lengths(values, row_lengths, validate=False)
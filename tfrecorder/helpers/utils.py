@@ -6,6 +6,9 @@ import time
 import random
 import string
 import sys
+import glob
+
+import tfrecorder.helpers.constants as cts
 
 def elapsed_since(last_time):
 	"""
@@ -62,4 +65,42 @@ def get_logger(name=None, level=logging.INFO, log_to_console=True, logs_director
 			handler.setLevel(level)
 			log.addHandler(handler)
 
-	return log
\ No newline at end of file
+	return log
+
+
+def get_tfrecord_file_extension(compression_type=None):
+	"""
+	Returns the extension of a tfrecord file compressed with this compression type (None for no compression), so that
+	readers can tell how to decompress it from its name.
+	"""
+	if compression_type is None:
+		return cts.TFRECORD_FILE_EXTENSION
+
+	if compression_type not in cts.TFRECORD_FILE_COMPRESSION_EXTENSIONS:
+		raise ValueError('Compression type %s is not supported (use None, %s).' %
+		                 (compression_type, ', '.join(cts.TFRECORD_FILE_COMPRESSION_EXTENSIONS)))
+
+	return cts.TFRECORD_FILE_EXTENSION + cts.TFRECORD_FILE_COMPRESSION_EXTENSIONS[compression_type]
+
+
+def get_tfrecord_file_compression_type(filepath):
+	"""
+	Returns the compression type of a tfrecord file given its name, or None if it is not compressed.
+	"""
+	for compression_type in cts.TFRECORD_FILE_COMPRESSION_EXTENSIONS:
+		if filepath.endswith(get_tfrecord_file_extension(compression_type)):
+			return compression_type
+
+	return None
+
+
+def list_tfrecord_filepaths(dirpath):
+	"""
+	Lists the tfrecord files of a directory, whatever their compression, in the order they were created.
+	"""
+	tfrecord_filepaths = []
+	for compression_type in [None] + list(cts.TFRECORD_FILE_COMPRESSION_EXTENSIONS):
+		tfrecord_filepaths += glob.glob(os.path.join(dirpath, '*%s' % get_tfrecord_file_extension(compression_type)))
+
+	# the files are named after their index, whatever their extension
+	return sorted(tfrecord_filepaths, key=lambda fp: int(os.path.basename(fp).split('.')[0]))
@@ -0,0 +1,403 @@
+import os
+import io
+import csv
+import glob
+
+import tfrecorder.helpers.constants as cts
+import tfrecorder.helpers.utils as utils
+import tfrecorder.helpers.manifest as manifest
+import tfrecorder.helpers.index as index
+import tfrecorder.helpers.reader as reader
+import tfrecorder.helpers.framing as framing
+from tfrecorder.helpers.checkpoint import Checkpoint
+from tfrecorder.helpers.planner import ShardPlanner
+
+# the implementations the tfrecord files can be written with
+BACKEND_TENSORFLOW = 'tensorflow'
+BACKEND_PYTHON = 'python'
+BACKENDS = [BACKEND_TENSORFLOW, BACKEND_PYTHON]
+
+
+class TFRecordsWriter:
+    """
+    Writes serialized examples into the tfrecord files of a directory, starting a new tfrecord file each time the
+    shard planner says that the current one is full, and optionally logs the metadata of the examples in a csv file.
+
+    Both files are kept open for the whole generation, and are flushed according to the flush policy: every
+    flush_every_num_records records, every flush_every_num_bytes bytes, or only when closed if both are None.
+
+    The tfrecord files can be compressed with GZIP or ZLIB, in which case their extension says so (e.g. 0.tfr.gz), so
+    that readers can detect it. The size of a tfrecord file given to the shard planner is its size before compression.
+
+    Each tfrecord file is written under a temporary name and renamed once closed, so that a tfrecord file is never
+    half written. A checkpoint is saved each time a tfrecord file is closed, from which an interrupted generation can
+    be resumed. Once the generation is complete, a manifest lists the tfrecord files with their number of records,
+    size and checksum. The checksum of a tfrecord file is computed as its records are written, rather than by reading
+    it back once closed.
+
+    The tfrecord files are written by tensorflow, or by a pure python implementation that produces the same framing
+    without tensorflow (see TFRecordFileWriter).
+
+    The records of uncompressed tfrecord files can also be indexed by the key of their example, for random access
+    (see RecordIndex). The index of each tfrecord file is saved along with it, and they are merged into the index of
+    the directory once the generation is complete.
+    """
+
+    def __init__(self,
+                 save_directory_path,
+                 shard_planner=None,
+                 log_in_csv_file=True,
+                 flush_every_num_records=None,
+                 flush_every_num_bytes=None,
+                 checkpoint=None,
+                 reopen_last_tfrecord_file=False,
+                 compression_type=None,
+                 compression_level=None,
+                 index_records=False,
+                 backend=BACKEND_TENSORFLOW):
+        """
+        Args:
+            save_directory_path: str, where to save the tfrecord files and the csv file.
+            shard_planner: a ShardPlanner object, or None for tfrecord files of at most 1e6 bytes.
+            log_in_csv_file: bool, whether to log the metadata of the examples in a csv file.
+            flush_every_num_records: int, number of records after which the files are flushed, or None.
+            flush_every_num_bytes: int, number of bytes after which the files are flushed, or None.
+            checkpoint: a Checkpoint object to resume from, or None to start from scratch.
+            reopen_last_tfrecord_file: bool, whether to top up the last tfrecord file of the checkpoint before
+                                       starting new ones, when appending examples to a directory.
+            compression_type: str, 'GZIP' or 'ZLIB', or None for no compression.
+            compression_level: int, from 0 (fastest) to 9 (smallest), or None for the default level of the codec.
+            index_records: bool, whether to index the records by the key of their example. Compressed tfrecord files
+                           can not be indexed, as their records can not be read without decompressing them from the
+                           start.
+            backend: str, 'tensorflow' or 'python', the implementation the tfrecord files are written with.
+        """
+        if backend not in BACKENDS:
+            raise ValueError('Unknown backend %s, expected one of %s.' % (backend, BACKENDS))
+
+        self.save_directory_path = save_directory_path
+        self.shard_planner = shard_planner if shard_planner is not None else ShardPlanner(max_size_in_bytes=1e6)
+        self.flush_every_num_records = flush_every_num_records
+        self.flush_every_num_bytes = flush_every_num_bytes
+
+        self.backend = backend
+        self.compression_type = compression_type
+        self.compression_level = compression_level
+        self.tfrecord_file_extension = utils.get_tfrecord_file_extension(compression_type)
+
+        # the tfrecord files are about to change, the manifest will be saved again once they are complete
+        manifest.remove_manifest(save_directory_path)
+
+        if checkpoint is not None:
+            self._discard_unfinished_files(checkpoint, log_in_csv_file)
+
+        if log_in_csv_file:
+            examples_list_filepath = os.path.join(save_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            self._examples_list_file = open(examples_list_filepath, 'a', newline='')
+            self._examples_list_file_size_in_bytes = os.path.getsize(examples_list_filepath)
+        else:
+            self._examples_list_file = None
+            self._examples_list_file_size_in_bytes = 0
+
+        # the records can be indexed only if those of the tfrecord files already saved, if any, have been
+        first_tfrecord_file_index = checkpoint.first_tfrecord_file_index if checkpoint is not None else 0
+        self.index_records = index_records and compression_type is None and \
+                             (first_tfrecord_file_index == 0 or os.path.exists(index.get_index_filepath(save_directory_path)))
+
+        if checkpoint is None:
+            # overwrite any previous checkpoint and index, that do not describe this generation
+            if os.path.exists(index.get_index_filepath(save_directory_path)):
+                os.remove(index.get_index_filepath(save_directory_path))
+            checkpoint = Checkpoint(save_directory_path,
+                                    examples_list_file_size_in_bytes=self._examples_list_file_size_in_bytes)
+            checkpoint.save()
+
+        self.checkpoint = checkpoint
+        self.num_saved_tfrecord_files = len(checkpoint.tfrecord_files)
+        self.current_tfrecord_file_size_in_bytes = 0
+
+        # the example being written, and where we are in it
+        self._example_index = checkpoint.num_examples - 1
+        self._example_num_written_chunks = 0
+        self._example_key_hash = None
+        self._example_examples_list_file_size_in_bytes = self._examples_list_file_size_in_bytes
+
+        # the content of the current tfrecord file
+        self._current_tfrecord_file_num_records = 0
+        self._current_tfrecord_file_first_example_index = None
+        self._current_tfrecord_file_last_example_index = None
+        self._current_tfrecord_file_index_entries = []
+        self._current_tfrecord_file_records_hash = None
+
+        self._num_records_since_flush = 0
+        self._num_bytes_since_flush = 0
+
+        # as we dont want to keep data in memory, we write it to tfrecord right after it has been loaded.
+        if reopen_last_tfrecord_file and checkpoint.tfrecord_files:
+            self._tfrecord_file_writer = self._reopen_last_tfrecord_file()
+        else:
+            self._tfrecord_file_writer = self._open_tfrecord_file()
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+    def get_tfrecord_filepath(self, tfrecord_file_index):
+        return os.path.join(self.save_directory_path, '%s%s' % (tfrecord_file_index, self.tfrecord_file_extension))
+
+    def _open_tfrecord_file(self):
+        self._current_tfrecord_file_records_hash = manifest.get_records_hash()
+
+        tmp_tfrecord_filepath = self.get_tfrecord_filepath(self.num_saved_tfrecord_files) + cts.TMP_FILE_EXTENSION
+
+        if self.backend == BACKEND_PYTHON:
+            return framing.TFRecordFileWriter(tmp_tfrecord_filepath,
+                                              compression_type=self.compression_type,
+                                              compression_level=self.compression_level)
+
+        import tensorflow as tf
+        return tf.io.TFRecordWriter(tmp_tfrecord_filepath,
+                                    options=tf.io.TFRecordOptions(compression_type=self.compression_type,
+                                                                  compression_level=self.compression_level))
+
+    def _close_tfrecord_file(self):
+
+        # the checkpoint will refer to the csv file as well, so it must be on disk too
+        self._tfrecord_file_writer.close()
+        if self._examples_list_file is not None:
+            self._examples_list_file.flush()
+
+        self._num_records_since_flush = 0
+        self._num_bytes_since_flush = 0
+
+        tfrecord_filepath = self.get_tfrecord_filepath(self.num_saved_tfrecord_files)
+        os.replace(tfrecord_filepath + cts.TMP_FILE_EXTENSION, tfrecord_filepath)
+
+        if self.index_records:
+            index.save_entries(index.get_tfrecord_file_index_filepath(self.save_directory_path,
+                                                                      self.num_saved_tfrecord_files),
+                               self._current_tfrecord_file_index_entries)
+
+        self.checkpoint.add_tfrecord_file(os.path.basename(tfrecord_filepath),
+                                          self._current_tfrecord_file_num_records,
+                                          self._current_tfrecord_file_first_example_index,
+                                          self._current_tfrecord_file_last_example_index,
+                                          size_in_bytes=os.path.getsize(tfrecord_filepath),
+                                          checksum=self._current_tfrecord_file_records_hash.hexdigest())
+
+        self.num_saved_tfrecord_files += 1
+        self._current_tfrecord_file_num_records = 0
+        self._current_tfrecord_file_first_example_index = None
+        self._current_tfrecord_file_last_example_index = None
+        self._current_tfrecord_file_index_entries = []
+
+    def _reopen_last_tfrecord_file(self):
+        """
+        Reopens the last tfrecord file of the checkpoint to add records to it, unless it is already full. As a tfrecord
+        file can not be appended to, its records are copied into the new one, which will replace it once closed.
+        """
+        last_tfrecord_file = self.checkpoint.tfrecord_files[-1]
+        last_tfrecord_filepath = os.path.join(self.save_directory_path, last_tfrecord_file['filename'])
+
+        # a compressed file is smaller than its content, but that's a good enough hint: if the file turns out to be
+        # full, it will be closed as it was before the first new record
+        if self.shard_planner.is_full(0,
+                                      os.path.getsize(last_tfrecord_filepath),
+                                      last_tfrecord_file['num_records'] or 1):
+            return self._open_tfrecord_file()
+
+        # it will be recorded again when closed, and its records are part of this generation
+        self.checkpoint.tfrecord_files.pop()
+        self.num_saved_tfrecord_files -= 1
+        self.checkpoint.first_tfrecord_file_index = self.num_saved_tfrecord_files
+
+        tfrecord_file_writer = self._open_tfrecord_file()
+
+        num_records = 0
+        for serialized_example in reader.iter_records(last_tfrecord_filepath):
+            serialized_example = bytes(serialized_example)
+            tfrecord_file_writer.write(serialized_example)
+            manifest.update_records_hash(self._current_tfrecord_file_records_hash, serialized_example)
+            self.current_tfrecord_file_size_in_bytes += self.shard_planner.get_record_size_in_bytes(serialized_example)
+            num_records += 1
+
+        self._current_tfrecord_file_num_records = num_records
+        self._current_tfrecord_file_first_example_index = last_tfrecord_file['first_example_index']
+        self._current_tfrecord_file_last_example_index = last_tfrecord_file['last_example_index']
+
+        # the records are copied as they were, so are their entries
+        if self.index_records:
+            entries = index.load_entries(index.get_index_filepath(self.save_directory_path))
+            self._current_tfrecord_file_index_entries = \
+                entries[entries['tfrecord_file_index'] == self.num_saved_tfrecord_files].tolist()
+
+        return tfrecord_file_writer
+
+    def _discard_unfinished_files(self, checkpoint, log_in_csv_file):
+        """
+        Removes what was written after the checkpoint we resume from.
+        """
+        for tmp_filepath in glob.glob(os.path.join(self.save_directory_path, '*%s' % cts.TMP_FILE_EXTENSION)):
+            os.remove(tmp_filepath)
+
+        examples_list_filepath = os.path.join(self.save_directory_path, cts.EXAMPLES_LIST_FILENAME)
+        if log_in_csv_file and os.path.exists(examples_list_filepath):
+            with open(examples_list_filepath, 'r+b') as f:
+                f.truncate(checkpoint.examples_list_file_size_in_bytes)
+
+
+    def start_example(self, example_index, num_written_chunks=0, key=None):
+        """
+        Tells the writer that the following csv row and serialized examples belong to this example.
+
+        Args:
+            example_index: int, the index of the example.
+            num_written_chunks: int, number of chunks of this example already stored (when resuming).
+            key: str, the key its records are indexed by, as returned by Example.get_key, or None.
+        """
+        self._example_index = example_index
+        self._example_num_written_chunks = num_written_chunks
+        self._example_key_hash = index.get_key_hash(key) if key is not None else None
+        self._example_examples_list_file_size_in_bytes = self._examples_list_file_size_in_bytes
+
+
+    def write_csv_row(self, row):
+        """
+        Logs the metadata of an example in the csv file.
+
+        Args:
+            row: list, as returned by Example.to_csv_row.
+        """
+        if self._examples_list_file is None:
+            raise ValueError('This writer does not log the metadata of the examples.')
+
+        # we format the row ourselves to keep track of the size of the file without asking the OS
+        line = io.StringIO()
+        csv.writer(line).writerow(row)
+        line = line.getvalue()
+
+        self._examples_list_file.write(line)
+        self._examples_list_file_size_in_bytes += len(line.encode(self._examples_list_file.encoding))
+
+
+    def write(self, serialized_example):
+        """
+        Writes a serialized example in the current tfrecord file, or in a new one if the current one is full.
+
+        Args:
+            serialized_example: bytes, as returned by Example.serialize_to_string.
+        """
+        # now we can check the full size of the example that will be stored
+        serialized_example_size = self.shard_planner.get_record_size_in_bytes(serialized_example)
+
+        # we will stack the data until the tfrecord file is full
+        if self.shard_planner.is_full(self.num_saved_tfrecord_files - self.checkpoint.first_tfrecord_file_index,
+                                      self.current_tfrecord_file_size_in_bytes,
+                                      self._current_tfrecord_file_num_records,
+                                      serialized_example_size):
+
+            # previous file has reach its max size, create another one. We can resume from here.
+            self._close_tfrecord_file()
+            self._save_checkpoint()
+
+            self._tfrecord_file_writer = self._open_tfrecord_file()
+            self.current_tfrecord_file_size_in_bytes = 0
+
+        if self.index_records:
+            if self._example_key_hash is None:
+                raise ValueError('The key of example %d is required to index its records.' % self._example_index)
+            self._current_tfrecord_file_index_entries.append((self._example_key_hash,
+                                                              self._example_num_written_chunks,
+                                                              self.num_saved_tfrecord_files,
+                                                              self.current_tfrecord_file_size_in_bytes,
+                                                              len(serialized_example)))
+
+        self._tfrecord_file_writer.write(serialized_example)
+        manifest.update_records_hash(self._current_tfrecord_file_records_hash, serialized_example)
+        self.current_tfrecord_file_size_in_bytes += serialized_example_size
+
+        if self._current_tfrecord_file_num_records == 0:
+            self._current_tfrecord_file_first_example_index = self._example_index
+        self._current_tfrecord_file_last_example_index = self._example_index
+        self._current_tfrecord_file_num_records += 1
+        self._example_num_written_chunks += 1
+
+        self._num_records_since_flush += 1
+        self._num_bytes_since_flush += serialized_example_size
+
+        if (self.flush_every_num_records and self._num_records_since_flush >= self.flush_every_num_records) or \
+           (self.flush_every_num_bytes and self._num_bytes_since_flush >= self.flush_every_num_bytes):
+            self.flush()
+
+
+    def flush(self):
+
+        self._tfrecord_file_writer.flush()
+
+        if self._examples_list_file is not None:
+            self._examples_list_file.flush()
+
+        self._num_records_since_flush = 0
+        self._num_bytes_since_flush = 0
+
+
+    def _save_checkpoint(self, complete=False):
+
+        if complete:
+            # everything up to the last example is in the closed files
+            self.checkpoint.num_examples = self._example_index + 1
+            self.checkpoint.num_written_chunks = 0
+            self.checkpoint.examples_list_file_size_in_bytes = self._examples_list_file_size_in_bytes
+        else:
+            # the example being written has to be resumed, from the chunks not yet in the closed files
+            self.checkpoint.num_examples = self._example_index
+            self.checkpoint.num_written_chunks = self._example_num_written_chunks
+            self.checkpoint.examples_list_file_size_in_bytes = self._example_examples_list_file_size_in_bytes
+
+        self.checkpoint.complete = complete
+        self.checkpoint.save()
+
+
+    def close(self):
+        """
+        Closes the files, marks the generation as complete, and saves the manifest and the index.
+        """
+        if self._tfrecord_file_writer is None:
+            return
+
+        self._close_tfrecord_file()
+        self._tfrecord_file_writer = None
+
+        if self._examples_list_file is not None:
+            self._examples_list_file.close()
+
+        self._save_checkpoint(complete=True)
+
+        if self.index_records:
+            self.index_records = index.merge_index(self.save_directory_path,
+                                                   self.checkpoint.first_tfrecord_file_index,
+                                                   len(self.checkpoint.tfrecord_files))
+
+        manifest.save_manifest(self.save_directory_path, self.checkpoint.tfrecord_files)
+
+
+    def abort(self):
+        """
+        Closes the files without renaming the current tfrecord file, so that the generation can be resumed from the
+        last checkpoint.
+        """
+        if self._tfrecord_file_writer is None:
+            return
+
+        self._tfrecord_file_writer.close()
+        self._tfrecord_file_writer = None
+
+        if self._examples_list_file is not None:
+            self._examples_list_file.close()
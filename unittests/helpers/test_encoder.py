@@ -0,0 +1,111 @@
+import unittest
+import struct
+import numpy as np
+
+import tfrecorder.helpers.encoder as encoder
+import tfrecorder.helpers.reader as reader
+from unittests.helpers.test_marshaller import ToyExample
+
+
+def encode_feature(dtype, value, Field):
+    """
+    Encodes the value of a @tfrecordable attribute as a tf.train.Feature message, as Example._to_tf_example_proto
+    does, dispatching on its dtype: the reference the compiled encoder is checked against.
+
+    Args:
+        dtype: int, one of Example.Field.
+        value: the value of the attribute.
+        Field: the Example.Field class.
+
+    Returns:
+        feature: bytes
+    """
+    if dtype in [Field.TYPE_BOOL,
+                 Field.TYPE_INT32,
+                 Field.TYPE_INT64]:
+
+        # a packed list of a single varint
+        return encoder.encode_length_delimited(encoder.FEATURE_INT64_LIST_TAG,
+                                               encoder.encode_length_delimited(encoder.LIST_VALUE_TAG,
+                                                                               encoder.encode_varint(int(value))))
+
+    if dtype in [Field.TYPE_FLOAT,
+                 Field.TYPE_DOUBLE]:
+
+        # a packed list of a single float32
+        return encoder.encode_length_delimited(encoder.FEATURE_FLOAT_LIST_TAG,
+                                               encoder.encode_length_delimited(encoder.LIST_VALUE_TAG,
+                                                                               struct.pack('<f', np.float32(value))))
+
+    if dtype in [Field.TYPE_STRING,
+                 Field.TYPE_ARRAY_FLOAT32,
+                 Field.TYPE_ARRAY_INT32]:
+
+        if type(value) is np.ndarray:
+            if value.dtype != np.float32 and value.dtype != np.int32:
+                raise TypeError('Only int32 and float32 numpy arrays are supported. Found %s.' % value.dtype)
+            value = value.tobytes()
+
+        elif type(value) is str:
+            value = value.encode('utf-8')
+
+        else:
+            raise TypeError('Type %s is not supported for bytes message.' % type(value))
+
+        return encoder.encode_length_delimited(encoder.FEATURE_BYTES_LIST_TAG,
+                                               encoder.encode_length_delimited(encoder.LIST_VALUE_TAG, value))
+
+    raise TypeError('Type %s is not supported.' % dtype)
+
+
+class ExampleEncoderTestCase(unittest.TestCase):
+
+
+    def get_toy_examples(self):
+        random_state = np.random.RandomState(0)
+        return [ToyExample(True, 3, 2**63-1, 0.1234, np.pi, 'blabla',
+                           np.ones([3, 4], dtype=np.int32),
+                           random_state.random_sample([3, 4]).astype(np.float32)),
+                # negative and large ints, empty and non-ascii strings, empty and non contiguous arrays
+                ToyExample(np.bool_(False), -5, 300, np.float32(2.5), 0., 'é' * 100,
+                           np.ones([0], dtype=np.int32),
+                           random_state.random_sample([300, 40]).astype(np.float32)[:, ::2])]
+
+
+    def test_encode_example(self):
+        """
+        Here we check that the compiled encoder writes the same entries as the encoding of each feature, and that
+        tensorflow parses them as what it serializes.
+        """
+        for toy_example in self.get_toy_examples():
+
+            serialized = encoder.encode_example(toy_example)
+
+            expected_entries = []
+            for k, t in ToyExample.get_tfrecordable_ordered_dict().items():
+                feature = encode_feature(t, getattr(toy_example, k), ToyExample.Field)
+                map_entry = encoder.encode_length_delimited(encoder.MAP_ENTRY_KEY_TAG, k.encode('utf-8')) + \
+                            encoder.encode_length_delimited(encoder.MAP_ENTRY_VALUE_TAG, feature)
+                expected_entries.append(encoder.encode_length_delimited(encoder.FEATURES_FEATURE_TAG, map_entry))
+
+            self.assertEqual(encoder.encode_length_delimited(encoder.EXAMPLE_FEATURES_TAG, b''.join(expected_entries)),
+                             serialized)
+
+            # the features are not in the same order, but the message has the same size and content
+            tf_serialized = toy_example.serialize_to_string()
+            self.assertEqual(len(tf_serialized), len(serialized))
+
+            for v, expected_v in zip(ToyExample.parse_from_string(serialized),
+                                     ToyExample.parse_from_string(tf_serialized)):
+                np.testing.assert_array_equal(expected_v.numpy(), v.numpy())
+
+            for v, expected_v in zip(reader.parse_example(serialized, ToyExample),
+                                     reader.parse_example(tf_serialized, ToyExample)):
+                np.testing.assert_array_equal(expected_v, v)
+
+        # the encoder is compiled once per class
+        self.assertIs(encoder.get_example_encoder(ToyExample), encoder.get_example_encoder(ToyExample))
+
+        # float64 arrays are rejected, as by tensorflow
+        toy_example.feature_np_array_float32 = np.ones([3, 4])
+        self.assertRaises(TypeError, encoder.encode_example, toy_example)
@@ -1,8 +1,25 @@
 import unittest
+import tensorflow as tf
+import numpy as np
 import tempfile
 import os
+import filecmp
+import glob
+import json
+import threading
+from unittest import mock
 
 import tfrecorder.helpers.checker as checker
+import tfrecorder.helpers.engine as engine
+import tfrecorder.helpers.metrics as metrics
+import tfrecorder.helpers.manifest as manifest
+import tfrecorder.helpers.index as index
+import tfrecorder.helpers.encoder as encoder
+import tfrecorder.helpers.constants as cts
+import tfrecorder.factory as tf_factory
+from tfrecorder.helpers.marshaller import Example
+from tfrecorder.helpers.checkpoint import Checkpoint
+from tfrecorder.helpers.cache import SerializationCache
 import unittests.helpers.toy as toy
 from unittests.helpers.toy_example_1 import ToyExample1
 from unittests.helpers.toy_example_2 import ToyExample2
@@ -57,6 +74,846 @@ class EngineTestCase(unittest.TestCase):
                     self.assertTrue(res)
 
 
+    def test_generate_and_save_tfrecords_files_for_examples_with_workers(self):
+        """
+        Here we check that processing the examples with a pool of workers, optionally prefetching them, or flushing
+        the files at various paces writes exactly the same files than processing them sequentially.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            # each run instantiates the examples from the csv file, as the factory does
+            examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            Example.to_csv_file(examples_list_filepath, examples)
+
+            kwargs = dict(src_data_dirpath = os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath = os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins = 5,
+                          examples_index_records=True)
+
+            various_workers = [dict(examples_num_workers=0),
+                               dict(examples_num_workers=4, examples_executor='thread'),
+                               dict(examples_num_workers=3, examples_executor='process'),
+                               dict(examples_num_workers=0, examples_prefetch_num_examples=4),
+                               dict(examples_num_workers=2, examples_prefetch_num_examples=3,
+                                    examples_prefetch_max_size_in_bytes=1e3),
+                               dict(examples_tfrecords_files_flush_every_num_records=3),
+                               dict(examples_tfrecords_files_flush_every_num_bytes=5e3)]
+            save_directory_paths = []
+            for i, workers_kwargs in enumerate(various_workers):
+
+                save_directory_path = os.path.join(tmp_directory_path, 'tfrecords_%d' % i)
+                engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                      ToyExample2.from_csv_file(examples_list_filepath),
+                                                                      examples_tfrecords_files_max_size_in_bytes=1e4,
+                                                                      **workers_kwargs,
+                                                                      **kwargs)
+                save_directory_paths.append(save_directory_path)
+
+            reference_directory_path = save_directory_paths[0]
+            reference_filepaths = tf_factory.get_tfrecord_filepaths(reference_directory_path)
+            self.assertGreater(len(reference_filepaths), 1)
+
+            for save_directory_path in save_directory_paths[1:]:
+
+                filenames = [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(save_directory_path)]
+                self.assertEqual([os.path.basename(fp) for fp in reference_filepaths], filenames)
+
+                for filename in filenames + [cts.EXAMPLES_LIST_FILENAME, cts.TFRECORDS_FILES_LIST_FILENAME,
+                                             cts.RECORDS_INDEX_FILENAME]:
+                    self.assertTrue(filecmp.cmp(os.path.join(reference_directory_path, filename),
+                                                os.path.join(save_directory_path, filename),
+                                                shallow=False))
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_prefetch_budget(self):
+        """
+        Here we check that the examples loaded ahead, and not yet released by the workers, stay within the memory
+        budget of the prefetcher.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            Example.to_csv_file(examples_list_filepath, examples)
+
+            kwargs = dict(src_data_dirpath = os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath = os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins = 5,
+                          examples_tfrecords_files_max_size_in_bytes=1e4)
+
+            examples[0].load(**kwargs)
+            example_size_in_bytes = engine.get_example_data_size_in_bytes(examples[0])
+            examples[0].release()
+
+            # the examples whose data is loaded, and not released yet
+            lock = threading.Lock()
+            loaded_examples = set()
+            num_loaded_examples = []
+
+            def load(example, **load_kwargs):
+                original_load(example, **load_kwargs)
+                with lock:
+                    loaded_examples.add(id(example))
+                    num_loaded_examples.append(len(loaded_examples))
+
+            def release(example):
+                original_release(example)
+                with lock:
+                    loaded_examples.discard(id(example))
+
+            original_load, original_release = ToyExample2.load, ToyExample2.release
+
+            various_budgets = [(1.5 * example_size_in_bytes, 2), (3.5 * example_size_in_bytes, 4)]
+            for i, (max_size_in_bytes, max_num_loaded_examples) in enumerate(various_budgets):
+
+                num_loaded_examples.clear()
+                with mock.patch.object(ToyExample2, 'load', autospec=True, side_effect=load), \
+                     mock.patch.object(ToyExample2, 'release', autospec=True, side_effect=release):
+                    engine.generate_and_save_tfrecords_files_for_examples(os.path.join(tmp_directory_path, 'tfrecords_%d' % i),
+                                                                          ToyExample2.from_csv_file(examples_list_filepath),
+                                                                          examples_num_workers=2,
+                                                                          examples_prefetch_num_examples=8,
+                                                                          examples_prefetch_max_size_in_bytes=max_size_in_bytes,
+                                                                          **kwargs)
+
+                self.assertEqual(23, len(num_loaded_examples))
+                self.assertLessEqual(max(num_loaded_examples), max_num_loaded_examples)
+                self.assertEqual(set(), loaded_examples)
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_stream(self):
+        """
+        Here we stream the examples from their csv file, and check that we get exactly the same files than with a
+        list of examples.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            Example.to_csv_file(examples_list_filepath, examples)
+
+            kwargs = dict(src_data_dirpath = os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath = os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins = 5,
+                          examples_tfrecords_files_max_size_in_bytes=1e4,
+                          examples_index_records=True)
+
+            reference_directory_path = os.path.join(tmp_directory_path, 'reference')
+            num_examples = engine.generate_and_save_tfrecords_files_for_examples(reference_directory_path,
+                                                                                 ToyExample2.from_csv_file(examples_list_filepath),
+                                                                                 **kwargs)
+            self.assertEqual(23, num_examples)
+
+            save_directory_path = os.path.join(tmp_directory_path, 'streamed')
+            num_examples = engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                                 ToyExample2.iter_csv_file(examples_list_filepath),
+                                                                                 **kwargs)
+            self.assertEqual(23, num_examples)
+
+            filenames = [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(reference_directory_path)]
+            self.assertEqual(filenames,
+                             [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(save_directory_path)])
+
+            for filename in filenames + [cts.EXAMPLES_LIST_FILENAME, cts.TFRECORDS_FILES_LIST_FILENAME,
+                                         cts.RECORDS_INDEX_FILENAME]:
+                self.assertTrue(filecmp.cmp(os.path.join(reference_directory_path, filename),
+                                            os.path.join(save_directory_path, filename),
+                                            shallow=False))
+
+            # a stream can not be balanced, as we dont know how many examples there are
+            self.assertRaises(ValueError,
+                              engine.generate_and_save_tfrecords_files_for_examples,
+                              os.path.join(tmp_directory_path, 'balanced'),
+                              ToyExample2.iter_csv_file(examples_list_filepath),
+                              examples_tfrecords_files_balanced=True,
+                              **kwargs)
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_metrics(self):
+        """
+        Here we check that the time spent in each stage and the throughput are reported to the callback and saved.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            kwargs = dict(src_data_dirpath = os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath = os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins = 5)
+
+            various_workers = [dict(examples_num_workers=0),
+                               dict(examples_num_workers=2, examples_prefetch_num_examples=2)]
+            for i, workers_kwargs in enumerate(various_workers):
+
+                reported_metrics = []
+                save_directory_path = os.path.join(tmp_directory_path, 'tfrecords_%d' % i)
+                metrics_filepath = os.path.join(save_directory_path, cts.EXAMPLES_METRICS_FILENAME)
+
+                def report(m):
+                    # the metrics are saved each time the progress is logged, not only at the end
+                    if m.end_time is None:
+                        with open(metrics_filepath, 'r') as f:
+                            self.assertEqual(m.num_processed_examples, json.load(f)['num_processed_examples'])
+                    reported_metrics.append(m.to_dict())
+
+                engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                      examples,
+                                                                      examples_tfrecords_files_max_size_in_bytes=1e4,
+                                                                      examples_metrics_callback=report,
+                                                                      **workers_kwargs,
+                                                                      **kwargs)
+
+                # twice while processing, and once at the end
+                self.assertEqual(3, len(reported_metrics))
+
+                # without balancing, the total size is extrapolated from the records written so far
+                self.assertIsNone(reported_metrics[0]['total_size_in_bytes'])
+                self.assertAlmostEqual(reported_metrics[0]['num_bytes'] / reported_metrics[0]['num_processed_examples'] * 23,
+                                       reported_metrics[0]['estimated_total_size_in_bytes'])
+                self.assertIsNotNone(reported_metrics[0]['eta'])
+
+                with open(os.path.join(save_directory_path, cts.EXAMPLES_METRICS_FILENAME), 'r') as f:
+                    saved_metrics = json.load(f)
+
+                self.assertEqual(23, saved_metrics['num_processed_examples'])
+                self.assertEqual(23 * 8, saved_metrics['num_records']) # 37 bins in chunks of 5
+                self.assertEqual(sum(os.path.getsize(fp) for fp in tf_factory.get_tfrecord_filepaths(save_directory_path)),
+                                 saved_metrics['num_bytes'])
+
+                for stage in [metrics.STAGE_LOAD, metrics.STAGE_SPLIT, metrics.STAGE_BUILD, metrics.STAGE_SERIALIZE,
+                              metrics.STAGE_WRITE]:
+                    self.assertGreater(saved_metrics['stage_times_in_s'][stage], 0)
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_profile(self):
+        """
+        Here we check that profiling a generation saves a report with the top call sites by time and by memory.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            save_directory_path = os.path.join(tmp_directory_path, 'tfrecords')
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  examples,
+                                                                  examples_profile=True,
+                                                                  examples_profile_start_num_examples=2,
+                                                                  examples_profile_num_examples=5,
+                                                                  examples_profile_snapshot_every_num_examples=10,
+                                                                  src_data_dirpath=os.path.join(corpus_directory_path, 'src'),
+                                                                  tgt_data_dirpath=os.path.join(corpus_directory_path, 'tgt'),
+                                                                  chunk_size_in_bins=5)
+
+            self.assertTrue(os.path.exists(os.path.join(save_directory_path, cts.EXAMPLES_PROFILE_STATS_FILENAME)))
+
+            with open(os.path.join(save_directory_path, cts.EXAMPLES_PROFILE_REPORT_FILENAME), 'r') as f:
+                report = f.read()
+
+            self.assertIn('by cumulative time over 5 examples', report)
+            self.assertIn('process_example', report)
+
+            # after 10, 20 and 23 examples
+            self.assertEqual(3, report.count('allocating call sites'))
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_manifest(self):
+        """
+        Here we check that the manifest describes the tfrecord files, and that the dataset knows its cardinality from
+        it.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            save_directory_path = os.path.join(tmp_directory_path, 'tfrecords')
+            # the checksums are computed as the records are written, not by reading the files back
+            with mock.patch.object(manifest, 'get_checksum', side_effect=AssertionError):
+                engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                      examples,
+                                                                      examples_tfrecords_files_max_size_in_bytes=1e4,
+                                                                      src_data_dirpath=os.path.join(corpus_directory_path, 'src'),
+                                                                      tgt_data_dirpath=os.path.join(corpus_directory_path, 'tgt'),
+                                                                      chunk_size_in_bins=5)
+
+            tfrecord_files = manifest.load_manifest(save_directory_path)
+            tfrecord_filepaths = tf_factory.get_tfrecord_filepaths(save_directory_path)
+
+            self.assertGreater(len(tfrecord_files), 1)
+            self.assertEqual(sorted(tfrecord_filepaths), sorted(glob.glob(os.path.join(save_directory_path, '*.tfr'))))
+            self.assertEqual(0, tfrecord_files[0]['first_example_index'])
+            self.assertEqual(22, tfrecord_files[-1]['last_example_index'])
+
+            for tfrecord_file, tfrecord_filepath in zip(tfrecord_files, tfrecord_filepaths):
+                self.assertEqual(os.path.getsize(tfrecord_filepath), tfrecord_file['size_in_bytes'])
+                self.assertEqual(manifest.get_checksum(tfrecord_filepath), tfrecord_file['checksum'])
+                self.assertEqual(tfrecord_file['num_records'],
+                                 sum(1 for _ in tf_factory.generate_dataset([tfrecord_filepath], ToyExample2)))
+
+            # 37 bins in chunks of 5
+            self.assertEqual(23 * 8, tf_factory.get_num_records(tfrecord_filepaths))
+            self.assertEqual(23 * 8, int(tf_factory.generate_dataset(tfrecord_filepaths, ToyExample2).cardinality()))
+
+            self.assertEqual([], manifest.verify_manifest(save_directory_path))
+
+            with open(tfrecord_filepaths[1], 'r+b') as f:
+                f.seek(100)
+                f.write(b'corrupted')
+            self.assertEqual([os.path.basename(tfrecord_filepaths[1])], manifest.verify_manifest(save_directory_path))
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_index(self):
+        """
+        Here we check that each record can be read by the key of its example and its chunk number.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            # releasing the examples resets their @tfrecordable attributes, so each run re-instantiates them
+            examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            Example.to_csv_file(examples_list_filepath, examples)
+
+            kwargs = dict(src_data_dirpath=os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath=os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins=5,
+                          examples_tfrecords_files_max_size_in_bytes=1e4)
+
+            # by default, the records are not indexed, and the keys of the examples are not even computed
+            save_directory_path = os.path.join(tmp_directory_path, 'not_indexed')
+            with mock.patch.object(ToyExample2, 'get_key', side_effect=AssertionError):
+                engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                      ToyExample2.from_csv_file(examples_list_filepath),
+                                                                      **kwargs)
+
+            self.assertEqual([], glob.glob(os.path.join(save_directory_path, '*' + cts.RECORDS_INDEX_FILE_EXTENSION)))
+
+            save_directory_path = os.path.join(tmp_directory_path, 'tfrecords')
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  ToyExample2.from_csv_file(examples_list_filepath),
+                                                                  examples_index_records=True,
+                                                                  **kwargs)
+
+            # the index of each tfrecord file has been merged into the index of the directory
+            self.assertEqual([os.path.join(save_directory_path, cts.RECORDS_INDEX_FILENAME)],
+                             glob.glob(os.path.join(save_directory_path, '*' + cts.RECORDS_INDEX_FILE_EXTENSION)))
+
+            # the records are stored in the order of the examples and of their chunks
+            serialized_examples = [s.numpy() for s in
+                                   tf.data.TFRecordDataset(tf_factory.get_tfrecord_filepaths(save_directory_path))]
+            keys = [(example.get_key(), chunk) for example in examples for chunk in range(8)]
+
+            with index.RecordIndex(save_directory_path) as record_index:
+
+                self.assertEqual(23 * 8, len(record_index))
+                self.assertEqual(8, record_index.get_num_chunks(examples[3].get_key()))
+
+                for (key, chunk), serialized_example in zip(keys, serialized_examples):
+                    self.assertEqual(serialized_example, record_index.get_record(key, chunk=chunk))
+
+                self.assertEqual([serialized_examples[8 * 17 + 2], serialized_examples[8 * 4 + 2]],
+                                 record_index.get_records([examples[17].get_key(), examples[4].get_key()], chunk=2))
+
+                self.assertRaises(KeyError, record_index.get_record, examples[0].get_key(), chunk=8)
+                self.assertRaises(KeyError, record_index.get_record, 'unknown')
+
+            # compressed records can not be read one by one
+            save_directory_path = os.path.join(tmp_directory_path, 'compressed')
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  ToyExample2.from_csv_file(examples_list_filepath),
+                                                                  examples_tfrecords_files_compression_type='GZIP',
+                                                                  examples_index_records=True,
+                                                                  **kwargs)
+
+            self.assertRaises(ValueError, index.RecordIndex, save_directory_path)
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_resume(self):
+        """
+        Here we interrupt a generation, resume it, and check that we get exactly the same files than an uninterrupted
+        generation.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            Example.to_csv_file(examples_list_filepath, examples)
+
+            kwargs = dict(src_data_dirpath = os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath = os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins = 5,
+                          examples_tfrecords_files_max_size_in_bytes=1e4,
+                          examples_index_records=True)
+
+            reference_directory_path = os.path.join(tmp_directory_path, 'reference')
+            engine.generate_and_save_tfrecords_files_for_examples(reference_directory_path,
+                                                                  ToyExample2.from_csv_file(examples_list_filepath),
+                                                                  **kwargs)
+
+            save_directory_path = os.path.join(tmp_directory_path, 'resumed')
+            self.assertRaises(RuntimeError,
+                              engine.generate_and_save_tfrecords_files_for_examples,
+                              save_directory_path,
+                              InterruptedList(ToyExample2.from_csv_file(examples_list_filepath), 17),
+                              **kwargs)
+
+            checkpoint = Checkpoint.load(save_directory_path)
+            self.assertFalse(checkpoint.complete)
+            self.assertGreater(len(checkpoint.tfrecord_files), 0)
+
+            # the checkpoint resumes after the last example of the closed files, or within it if some of its chunks
+            # are stored
+            last_example_index = checkpoint.tfrecord_files[-1]['last_example_index']
+            self.assertLessEqual(checkpoint.num_examples, 17)
+            self.assertEqual(last_example_index + (0 if checkpoint.num_written_chunks else 1), checkpoint.num_examples)
+
+            saved_tfrecord_files = {tfrecord_file['filename']: os.stat(os.path.join(save_directory_path,
+                                                                                    tfrecord_file['filename'])).st_mtime_ns
+                                    for tfrecord_file in checkpoint.tfrecord_files}
+
+            # only the examples from the checkpoint on are loaded again, and the closed files are kept as they are
+            with mock.patch.object(ToyExample2, 'load', autospec=True, side_effect=ToyExample2.load) as load:
+                engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                      ToyExample2.from_csv_file(examples_list_filepath),
+                                                                      examples_resume=True,
+                                                                      **kwargs)
+
+            self.assertEqual(23 - checkpoint.num_examples, load.call_count)
+            for filename, mtime_ns in saved_tfrecord_files.items():
+                self.assertEqual(mtime_ns, os.stat(os.path.join(save_directory_path, filename)).st_mtime_ns)
+
+            self.assertTrue(Checkpoint.load(save_directory_path).complete)
+
+            filenames = [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(reference_directory_path)]
+            self.assertEqual(filenames,
+                             [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(save_directory_path)])
+
+            for filename in filenames + [cts.EXAMPLES_LIST_FILENAME, cts.TFRECORDS_FILES_LIST_FILENAME,
+                                         cts.RECORDS_INDEX_FILENAME]:
+                self.assertTrue(filecmp.cmp(os.path.join(reference_directory_path, filename),
+                                            os.path.join(save_directory_path, filename),
+                                            shallow=False))
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_append(self):
+        """
+        Here we append examples to a directory in two steps, and check that we get exactly the same files than when
+        saving all the examples at once.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            Example.to_csv_file(examples_list_filepath, examples)
+
+            kwargs = dict(src_data_dirpath = os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath = os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins = 5,
+                          examples_tfrecords_files_max_size_in_bytes=1e4,
+                          examples_index_records=True)
+
+            reference_directory_path = os.path.join(tmp_directory_path, 'reference')
+            engine.generate_and_save_tfrecords_files_for_examples(reference_directory_path,
+                                                                  ToyExample2.from_csv_file(examples_list_filepath),
+                                                                  **kwargs)
+
+            save_directory_path = os.path.join(tmp_directory_path, 'appended')
+            examples = ToyExample2.from_csv_file(examples_list_filepath)
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  examples[:15],
+                                                                  **kwargs)
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  examples[15:],
+                                                                  examples_append=True,
+                                                                  **kwargs)
+
+            checkpoint = Checkpoint.load(save_directory_path)
+            self.assertTrue(checkpoint.complete)
+            self.assertEqual(23, checkpoint.num_examples)
+            self.assertEqual(15, checkpoint.first_example_index)
+
+            filenames = [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(reference_directory_path)]
+            self.assertEqual(filenames,
+                             [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(save_directory_path)])
+
+            for filename in filenames + [cts.EXAMPLES_LIST_FILENAME, cts.TFRECORDS_FILES_LIST_FILENAME,
+                                         cts.RECORDS_INDEX_FILENAME]:
+                self.assertTrue(filecmp.cmp(os.path.join(reference_directory_path, filename),
+                                            os.path.join(save_directory_path, filename),
+                                            shallow=False))
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_shard_planner(self):
+        """
+        Here we check that the tfrecord files are bounded by their size on disk and by their number of records, and
+        that they can be balanced over a given number of files.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            kwargs = dict(src_data_dirpath = os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath = os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins = 5)
+
+            save_directory_path = os.path.join(tmp_directory_path, 'max_size')
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  examples,
+                                                                  examples_tfrecords_files_max_size_in_bytes=1e4,
+                                                                  examples_tfrecords_files_max_num_records=25,
+                                                                  **kwargs)
+
+            checkpoint = Checkpoint.load(save_directory_path)
+            tfrecord_filepaths = tf_factory.get_tfrecord_filepaths(save_directory_path)
+            self.assertGreater(len(tfrecord_filepaths), 1)
+
+            for tfrecord_filepath, tfrecord_file in zip(tfrecord_filepaths, checkpoint.tfrecord_files):
+                self.assertLessEqual(os.path.getsize(tfrecord_filepath), 1e4)
+                self.assertLessEqual(tfrecord_file['num_records'], 25)
+
+            save_directory_path = os.path.join(tmp_directory_path, 'num_files')
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  examples,
+                                                                  examples_tfrecords_files_num_files=4,
+                                                                  examples_tfrecords_files_num_sampled_examples=5,
+                                                                  **kwargs)
+
+            sizes = [os.path.getsize(fp) for fp in tf_factory.get_tfrecord_filepaths(save_directory_path)]
+            self.assertEqual(4, len(sizes))
+            self.assertLess(max(sizes), 2 * min(sizes))
+
+            # the estimate is exact when all the examples are sampled
+            self.assertEqual(sum(sizes), engine.estimate_tfrecords_files_size_in_bytes(examples,
+                                                                                       num_sampled_examples=23,
+                                                                                       **kwargs))
+
+            # as well for sized collections that can not be indexed
+            self.assertEqual(sum(sizes), engine.estimate_tfrecords_files_size_in_bytes(set(examples),
+                                                                                       num_sampled_examples=23,
+                                                                                       **kwargs))
+
+            # the dry run does not release the examples, whose data may not be loaded again
+            for example in examples:
+                example.load(**kwargs)
+
+            save_directory_path = os.path.join(tmp_directory_path, 'in_memory')
+            with mock.patch.object(ToyExample2, 'load', autospec=True) as load:
+                engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                      examples,
+                                                                      examples_tfrecords_files_num_files=4,
+                                                                      examples_tfrecords_files_num_sampled_examples=5,
+                                                                      **kwargs)
+
+            self.assertGreater(load.call_count, 0)
+            self.assertEqual([r.numpy() for r in tf.data.TFRecordDataset(tf_factory.get_tfrecord_filepaths(os.path.join(tmp_directory_path, 'num_files')))],
+                             [r.numpy() for r in tf.data.TFRecordDataset(tf_factory.get_tfrecord_filepaths(save_directory_path))])
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_compression(self):
+        """
+        Here we compress the tfrecord files, and check that they are named after their compression, that their content
+        can be read back transparently, and that compressed files can be appended to.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            Example.to_csv_file(examples_list_filepath, examples)
+
+            kwargs = dict(src_data_dirpath = os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath = os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins = 5)
+
+            various_compressions = [dict(examples_tfrecords_files_compression_type='GZIP'),
+                                    dict(examples_tfrecords_files_compression_type='ZLIB',
+                                         examples_tfrecords_files_compression_level=9)]
+            for compression_kwargs in various_compressions:
+
+                compression_type = compression_kwargs['examples_tfrecords_files_compression_type']
+
+                # the checker reads the tfrecord files back through the factory
+                res = checker.assert_example_serialize_deserialize_is_ok(ToyExample2.from_csv_file(examples_list_filepath),
+                                                                         tfrecords_files_max_size_in_bytes=1e4,
+                                                                         tfrecords_files_compression_type=compression_type,
+                                                                         **kwargs)
+                self.assertTrue(res)
+
+                save_directory_path = os.path.join(tmp_directory_path, compression_type)
+                examples = ToyExample2.from_csv_file(examples_list_filepath)
+                engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                      examples[:15],
+                                                                      examples_tfrecords_files_max_size_in_bytes=1e4,
+                                                                      **compression_kwargs,
+                                                                      **kwargs)
+                engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                      examples[15:],
+                                                                      examples_tfrecords_files_max_size_in_bytes=1e4,
+                                                                      examples_append=True,
+                                                                      **compression_kwargs,
+                                                                      **kwargs)
+
+                tfrecord_filepaths = tf_factory.get_tfrecord_filepaths(save_directory_path)
+                self.assertGreater(len(tfrecord_filepaths), 1)
+                for tfrecord_filepath in tfrecord_filepaths:
+                    self.assertTrue(tfrecord_filepath.endswith(cts.TFRECORD_FILE_EXTENSION +
+                                                               cts.TFRECORD_FILE_COMPRESSION_EXTENSIONS[compression_type]))
+
+                dataset = tf_factory.generate_dataset(tfrecord_filepaths, ToyExample2)
+                checker.assert_examples_content_matches_dataset_content(ToyExample2.from_csv_file(examples_list_filepath),
+                                                                        dataset,
+                                                                        **kwargs)
+
+                # the files of a directory must all be compressed the same way
+                self.assertRaises(ValueError,
+                                  engine.generate_and_save_tfrecords_files_for_examples,
+                                  save_directory_path,
+                                  examples[:3],
+                                  examples_tfrecords_files_max_size_in_bytes=1e4,
+                                  examples_append=True,
+                                  **kwargs)
+                self.assertTrue(Checkpoint.load(save_directory_path).complete)
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_python_backend(self):
+        """
+        Here we write the tfrecord files without tensorflow, and check that they hold the same records, that their
+        framing is the same given the same serialized examples, and that examples can be appended to them.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            # releasing the examples resets their @tfrecordable attributes, so each run re-instantiates them
+            examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            Example.to_csv_file(examples_list_filepath, examples)
+
+            kwargs = dict(src_data_dirpath = os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath = os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins = 5,
+                          examples_tfrecords_files_max_size_in_bytes=1e4,
+                          examples_index_records=True)
+
+            reference_directory_path = os.path.join(tmp_directory_path, 'reference')
+            engine.generate_and_save_tfrecords_files_for_examples(reference_directory_path,
+                                                                  ToyExample2.from_csv_file(examples_list_filepath),
+                                                                  **kwargs)
+
+            filenames = [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(reference_directory_path)]
+
+            # the python backend frames the examples serialized by tensorflow, so that both write the same ones
+            save_directory_path = os.path.join(tmp_directory_path, 'framed')
+            with mock.patch.object(encoder, 'encode_example', side_effect=lambda e: e.serialize_to_string()):
+                engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                      ToyExample2.from_csv_file(examples_list_filepath),
+                                                                      examples_tfrecords_files_writer_backend='python',
+                                                                      **kwargs)
+
+            for filename in filenames + [cts.TFRECORDS_FILES_LIST_FILENAME, cts.RECORDS_INDEX_FILENAME]:
+                self.assertTrue(filecmp.cmp(os.path.join(reference_directory_path, filename),
+                                            os.path.join(save_directory_path, filename),
+                                            shallow=False))
+
+            # serialized without tensorflow, in two steps
+            save_directory_path = os.path.join(tmp_directory_path, 'python')
+            examples = ToyExample2.from_csv_file(examples_list_filepath)
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  examples[:15],
+                                                                  examples_tfrecords_files_writer_backend='python',
+                                                                  **kwargs)
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  examples[15:],
+                                                                  examples_tfrecords_files_writer_backend='python',
+                                                                  examples_append=True,
+                                                                  **kwargs)
+
+            self.assertEqual(filenames,
+                             [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(save_directory_path)])
+            self.assertEqual(manifest.load_manifest(reference_directory_path)[-1]['size_in_bytes'],
+                             manifest.load_manifest(save_directory_path)[-1]['size_in_bytes'])
+
+            dataset = tf_factory.generate_dataset(tf_factory.get_tfrecord_filepaths(save_directory_path), ToyExample2)
+            reference_dataset = tf_factory.generate_dataset(tf_factory.get_tfrecord_filepaths(reference_directory_path),
+                                                            ToyExample2)
+            for parsed_example, reference_parsed_example in zip(dataset.as_numpy_iterator(),
+                                                                reference_dataset.as_numpy_iterator()):
+                for v, reference_v in zip(parsed_example, reference_parsed_example):
+                    np.testing.assert_array_equal(reference_v, v)
+
+            with index.RecordIndex(save_directory_path) as record_index:
+                self.assertEqual(23 * 8, len(record_index))
+
+            self.assertRaises(ValueError,
+                              engine.generate_and_save_tfrecords_files_for_examples,
+                              os.path.join(tmp_directory_path, 'unknown'),
+                              ToyExample2.from_csv_file(examples_list_filepath),
+                              examples_tfrecords_files_writer_backend='unknown',
+                              **kwargs)
+
+
+    def test_generate_and_save_tfrecords_files_for_examples_with_cache(self):
+        """
+        Here we rebuild the tfrecord files with a serialization cache, and check that only the examples whose source
+        files have changed are loaded again, that the files are the same than without cache, and that the cache does
+        not grow over its maximum size.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample2,
+                                                 num_examples=23,
+                                                 data_shape=[37, 3])
+
+            examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            Example.to_csv_file(examples_list_filepath, examples)
+
+            kwargs = dict(src_data_dirpath = os.path.join(corpus_directory_path, 'src'),
+                          tgt_data_dirpath = os.path.join(corpus_directory_path, 'tgt'),
+                          chunk_size_in_bins = 5,
+                          examples_tfrecords_files_max_size_in_bytes=1e4,
+                          examples_index_records=True)
+
+            reference_directory_path = os.path.join(tmp_directory_path, 'reference')
+            engine.generate_and_save_tfrecords_files_for_examples(reference_directory_path,
+                                                                  ToyExample2.from_csv_file(examples_list_filepath),
+                                                                  **kwargs)
+
+            cache_directory_path = os.path.join(tmp_directory_path, 'cache')
+
+            # the second time, only the example whose source file was touched is loaded again
+            various_num_loads = [23, 0, 1]
+            for i, expected_num_loads in enumerate(various_num_loads):
+
+                if i == 2:
+                    src_data_filepath = os.path.join(kwargs['src_data_dirpath'], '%s.npy' % examples[3].name)
+                    stat = os.stat(src_data_filepath)
+                    os.utime(src_data_filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+                save_directory_path = os.path.join(tmp_directory_path, 'cached_%d' % i)
+                with mock.patch.object(ToyExample2, 'load', autospec=True, side_effect=ToyExample2.load) as load:
+                    engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                          ToyExample2.from_csv_file(examples_list_filepath),
+                                                                          examples_cache_directory_path=cache_directory_path,
+                                                                          examples_prefetch_num_examples=2 if i == 2 else 0,
+                                                                          **kwargs)
+                self.assertEqual(expected_num_loads, load.call_count)
+
+                filenames = [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(reference_directory_path)]
+                self.assertEqual(filenames,
+                                 [os.path.basename(fp) for fp in tf_factory.get_tfrecord_filepaths(save_directory_path)])
+
+                for filename in filenames + [cts.EXAMPLES_LIST_FILENAME, cts.TFRECORDS_FILES_LIST_FILENAME,
+                                             cts.RECORDS_INDEX_FILENAME]:
+                    self.assertTrue(filecmp.cmp(os.path.join(reference_directory_path, filename),
+                                                os.path.join(save_directory_path, filename),
+                                                shallow=False))
+
+            # the key does not depend on the order of the kwargs, nor on the memory addresses of their values, but
+            # depends on the backend, whose features are not written in the same order
+            key = SerializationCache.get_key(examples[0], 'tensorflow', a={1, 2}, b=KwargValue(3), **kwargs)
+            self.assertEqual(key, SerializationCache.get_key(examples[0], 'tensorflow', b=KwargValue(3), a={2, 1}, **kwargs))
+            self.assertNotEqual(key, SerializationCache.get_key(examples[0], 'tensorflow', a={1, 2}, b=KwargValue(4), **kwargs))
+            self.assertNotEqual(key, SerializationCache.get_key(examples[0], 'python', a={1, 2}, b=KwargValue(3), **kwargs))
+
+            # the least recently used entries are evicted
+            serialization_cache = SerializationCache(cache_directory_path, max_size_in_bytes=1e4)
+            self.assertGreater(serialization_cache.evict(), 0)
+
+            cache_size_in_bytes = 0
+            for directory_path, _, filenames in os.walk(cache_directory_path):
+                cache_size_in_bytes += sum(os.path.getsize(os.path.join(directory_path, fn)) for fn in filenames)
+            self.assertLessEqual(cache_size_in_bytes, 1e4)
+
+
+class KwargValue:
+    """
+    A kwarg whose repr holds its memory address.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+class InterruptedList(list):
+    """
+    A list whose iteration fails at a given index, as if the generation was killed.
+    """
+
+    def __init__(self, items, interruption_index):
+        super(InterruptedList, self).__init__(items)
+        self.interruption_index = interruption_index
+
+    def __iter__(self):
+        for i, item in enumerate(super(InterruptedList, self).__iter__()):
+            if i == self.interruption_index:
+                raise RuntimeError('Interrupted at example %d.' % i)
+            yield item
 
 
 if __name__ == '__main__':
@@ -0,0 +1,65 @@
+import unittest
+import tempfile
+import os
+import numpy as np
+import tensorflow as tf
+
+import tfrecorder.helpers.crc as crc
+import tfrecorder.helpers.framing as framing
+
+
+class TFRecordFileWriterTestCase(unittest.TestCase):
+
+
+    def get_serialized_examples(self):
+        random_state = np.random.RandomState(0)
+        return [random_state.bytes(size) for size in [0, 1, 3, 300, 1024, 5000, 70000]]
+
+
+    def test_crc32c(self):
+
+        for serialized_example in self.get_serialized_examples():
+            self.assertEqual(crc.crc32c_python(serialized_example), crc.crc32c_numpy(serialized_example))
+
+        self.assertEqual(0xe3069283, crc.crc32c(b'123456789'))
+
+
+    def test_tfrecord_file_writer(self):
+        """
+        Here we check that the pure python writer writes the same tfrecord files as tensorflow.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            for compression_type in [None, 'GZIP', 'ZLIB']:
+
+                tf_filepath = os.path.join(tmp_directory_path, 'tf.tfr')
+                with tf.io.TFRecordWriter(tf_filepath, options=tf.io.TFRecordOptions(compression_type=compression_type)) as w:
+                    for serialized_example in self.get_serialized_examples():
+                        w.write(serialized_example)
+
+                python_filepath = os.path.join(tmp_directory_path, 'python.tfr')
+                with framing.TFRecordFileWriter(python_filepath, compression_type=compression_type) as w:
+                    for i, serialized_example in enumerate(self.get_serialized_examples()):
+                        w.write(serialized_example)
+                        if i == 3:
+                            w.flush()
+
+                with open(tf_filepath, 'rb') as f:
+                    tf_content = f.read()
+                with open(python_filepath, 'rb') as f:
+                    python_content = f.read()
+
+                # the compressed bytes may differ, but not their content
+                if compression_type is not None:
+                    tf_content = framing.decompress(tf_content, compression_type)
+                    python_content = framing.decompress(python_content, compression_type)
+
+                self.assertEqual(tf_content, python_content)
+
+                # tensorflow reads them back
+                self.assertEqual(self.get_serialized_examples(),
+                                 [s.numpy() for s in tf.data.TFRecordDataset(python_filepath,
+                                                                             compression_type=compression_type)])
+
+            self.assertRaises(ValueError, framing.TFRecordFileWriter, python_filepath, compression_type='LZ4')
@@ -53,6 +53,10 @@ class MarshallerTestCase(unittest.TestCase):
 
         # check that the example has the expected size
         self.assertNotEqual(0, toy_example.get_byte_size())
+        self.assertEqual(toy_example.get_byte_size(), len(toy_example.serialize_to_string()))
+
+        # check that the protobuf message is not retained by the example once serialized
+        self.assertFalse(hasattr(toy_example, 'proto'))
 
         # marhall and unmarshall and check we have what was expected
         tensors = ToyExample.parse_from_string(toy_example.serialize_to_string())
@@ -95,6 +99,11 @@ class MarshallerTestCase(unittest.TestCase):
 
                 self.assertEqual(ev, v)
 
+        # releasing the example clears all its @tfrecordable attributes, strings and scalars included
+        toy_example.release()
+        for k in expected_proto_dict.keys():
+            self.assertIsNone(getattr(toy_example, k))
+
 
         # test that numpy with float64 raises exception
         toy_example = ToyExample(feature_bool = feature_bool,
@@ -109,6 +118,39 @@ class MarshallerTestCase(unittest.TestCase):
         self.assertRaises(TypeError, toy_example.serialize_to_string)
 
 
+    def test_schema(self):
+        """
+        Test that the schema of an Example subclass is compiled when it is defined, and that a subclass of it adds its
+        own @tfrecordable attributes to a copy of those of its parent.
+        """
+
+        self.assertEqual(('feature_bool', 'feature_int32', 'feature_int64', 'feature_float', 'feature_double',
+                          'feature_string', 'feature_np_array_int32', 'feature_np_array_float32'),
+                         ToyExample.schema.names)
+        self.assertEqual(list(ToyExample.get_tfrecordable_ordered_dict().items()), list(ToyExample.schema.fields))
+        self.assertEqual(('int64', 'int64', 'int64', 'float', 'float', 'bytes', 'bytes', 'bytes'),
+                         ToyExample.schema.feature_kinds)
+
+        class ChildToyExample(ToyExample):
+
+            @tfrecordable(dtype=Example.Field.TYPE_INT32)
+            def feature_child(self):
+                return 0
+
+        self.assertEqual(ToyExample.schema.names + ('feature_child',), ChildToyExample.schema.names)
+        self.assertEqual(8, len(ToyExample.schema))
+        self.assertEqual(8, len(ToyExample.proto_list))
+
+        # unsupported types are rejected as soon as the class is defined
+        with self.assertRaises(TypeError):
+
+            class UnsupportedToyExample(Example):
+
+                @tfrecordable(dtype=11)
+                def feature_message(self):
+                    return None
+
+
 class ToyExample(Example):
     """
     This class is used to check that all attribute types are correctly handled.
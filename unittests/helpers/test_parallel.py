@@ -0,0 +1,56 @@
+import unittest
+import threading
+
+import tfrecorder.helpers.parallel as parallel
+
+
+class PrefetcherTestCase(unittest.TestCase):
+
+
+    def test_release_on_early_exit(self):
+        """
+        Here we stop consuming the prefetched items early, and check that those loaded and never released by the
+        consumer are discarded, and no longer charged against the budget.
+        """
+        various_num_workers = [0, 2]
+        for num_workers in various_num_workers:
+
+            lock = threading.Lock()
+            loaded_items = set()
+
+            def load(item):
+                with lock:
+                    loaded_items.add(item)
+                return item
+
+            def discard(item):
+                with lock:
+                    loaded_items.discard(item)
+
+            prefetcher = parallel.Prefetcher(load,
+                                             range(100),
+                                             num_prefetched=4,
+                                             max_size_in_bytes=3e3,
+                                             get_size_in_bytes=lambda item: 1e3,
+                                             discard=discard)
+
+            def process(future):
+                try:
+                    return future.result()
+                finally:
+                    discard(future.result())
+                    prefetcher.release(future)
+
+            processed_items = parallel.imap_ordered(process, iter(prefetcher), num_workers=num_workers)
+            for future in processed_items:
+                if future.result() == 5:
+                    break
+
+            processed_items.close()
+
+            self.assertEqual(set(), loaded_items)
+            self.assertEqual(0, prefetcher.get_charged_size_in_bytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
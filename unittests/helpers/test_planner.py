@@ -0,0 +1,70 @@
+import unittest
+
+from tfrecorder.helpers.planner import ShardPlanner
+
+
+class ShardPlannerTestCase(unittest.TestCase):
+
+
+    def plan(self, shard_planner, record_sizes):
+        """
+        Distributes records of these sizes as the writer would, and returns the sizes of the tfrecord files.
+        """
+        sizes, num_records = [0], 0
+        for record_size in record_sizes:
+
+            if shard_planner.is_full(len(sizes) - 1, sizes[-1], num_records, record_size):
+                sizes.append(0)
+                num_records = 0
+
+            sizes[-1] += record_size
+            num_records += 1
+
+        return sizes
+
+
+    def test_max_size_in_bytes(self):
+
+        shard_planner = ShardPlanner(max_size_in_bytes=100)
+        self.assertEqual([90, 100, 30], self.plan(shard_planner, [30, 30, 30, 50, 50, 30]))
+
+        # a record larger than the maximum size is stored alone
+        self.assertEqual([30, 150, 30], self.plan(shard_planner, [30, 150, 30]))
+
+
+    def test_max_num_records(self):
+
+        shard_planner = ShardPlanner(max_num_records=2)
+        self.assertEqual([20, 20, 10], self.plan(shard_planner, [10] * 5))
+
+
+    def test_num_files(self):
+
+        record_sizes = [10] * 47
+        shard_planner = ShardPlanner(num_files=4, total_size_in_bytes=sum(record_sizes))
+        sizes = self.plan(shard_planner, record_sizes)
+
+        self.assertEqual(4, len(sizes))
+        self.assertLessEqual(max(sizes) - min(sizes), 10)
+
+        # the last file takes what remains if the total size was underestimated
+        shard_planner = ShardPlanner(num_files=4, total_size_in_bytes=sum(record_sizes) / 2)
+        self.assertEqual(4, len(self.plan(shard_planner, record_sizes)))
+
+        self.assertRaises(ValueError, ShardPlanner, num_files=4)
+
+
+    def test_balanced_max_size_in_bytes(self):
+
+        # without balancing, the last file would only contain 10 bytes
+        record_sizes = [10] * 21
+        shard_planner = ShardPlanner(max_size_in_bytes=100, total_size_in_bytes=sum(record_sizes))
+        sizes = self.plan(shard_planner, record_sizes)
+
+        self.assertEqual(3, len(sizes))
+        self.assertLessEqual(max(sizes), 100)
+        self.assertGreaterEqual(min(sizes), 60)
+
+
+    def test_get_record_size_in_bytes(self):
+        self.assertEqual(16 + 3, ShardPlanner.get_record_size_in_bytes(b'abc'))
@@ -0,0 +1,89 @@
+import unittest
+import tempfile
+import os
+import numpy as np
+
+import tfrecorder.helpers.engine as engine
+import tfrecorder.helpers.reader as reader
+import tfrecorder.helpers.crc as crc
+import tfrecorder.factory as tf_factory
+import unittests.helpers.toy as toy
+from unittests.helpers.toy_example_1 import ToyExample1
+from unittests.helpers.toy_example_2 import ToyExample2
+
+
+class NumpyReaderTestCase(unittest.TestCase):
+
+
+    def test_numpy_reader(self):
+        """
+        Here we check that the numpy reader parses the records exactly as the datasets of the factory.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+
+            for example_class, kwargs in [(ToyExample1, dict(data_dirpath=corpus_directory_path)),
+                                          (ToyExample2, dict(src_data_dirpath=os.path.join(corpus_directory_path, 'src'),
+                                                             tgt_data_dirpath=os.path.join(corpus_directory_path, 'tgt'),
+                                                             chunk_size_in_bins=5))]:
+
+                examples = toy.generate_toy_examples(corpus_directory_path,
+                                                     example_class,
+                                                     num_examples=13,
+                                                     data_shape=[37, 3])
+
+                save_directory_path = os.path.join(tmp_directory_path, example_class.__name__)
+                engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                      examples,
+                                                                      examples_tfrecords_files_max_size_in_bytes=1e4,
+                                                                      **kwargs)
+
+                tfrecord_filepaths = tf_factory.get_tfrecord_filepaths(save_directory_path)
+                parsed_examples = list(reader.NumpyReader(tfrecord_filepaths, example_class, check_crc=True))
+                expected_parsed_examples = list(tf_factory.generate_dataset(tfrecord_filepaths, example_class).as_numpy_iterator())
+
+                self.assertEqual(len(expected_parsed_examples), len(parsed_examples))
+
+                for parsed_example, expected_parsed_example in zip(parsed_examples, expected_parsed_examples):
+                    for v, expected_v in zip(parsed_example, expected_parsed_example):
+
+                        self.assertEqual(np.asarray(expected_v).dtype, np.asarray(v).dtype)
+                        np.testing.assert_array_equal(expected_v, v)
+
+                        # arrays are not copied out of the tfrecord files
+                        if isinstance(v, np.ndarray):
+                            self.assertFalse(v.flags.owndata)
+                            self.assertFalse(v.flags.writeable)
+
+
+    def test_check_crc(self):
+        """
+        Here we check that corrupted records are detected.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 ToyExample1,
+                                                 num_examples=3,
+                                                 data_shape=[37, 3])
+
+            save_directory_path = os.path.join(tmp_directory_path, 'tfrecords')
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  examples,
+                                                                  data_dirpath=corpus_directory_path)
+
+            tfrecord_filepath, = tf_factory.get_tfrecord_filepaths(save_directory_path)
+            with open(tfrecord_filepath, 'r+b') as f:
+                f.seek(100)
+                f.write(b'corrupted')
+
+            # the framing is fine, only the checksums tell
+            self.assertEqual(3, sum(1 for _ in reader.iter_records(tfrecord_filepath)))
+            self.assertRaises(ValueError, list, reader.iter_records(tfrecord_filepath, check_crc=True))
+
+            self.assertEqual(crc.crc32c_python(b'123456789'), 0xe3069283)
+            self.assertEqual(crc.crc32c(b'123456789'), 0xe3069283)
@@ -74,6 +74,12 @@ class ToyExample1(Example):
 
         self.data = data
 
+    def get_source_filepaths(self, **kwargs):
+        """
+        The data of this example is loaded from a single file.
+        """
+        return [self.data_filepath]
+
     def to_csv_row(self):
         """
         This is used to write in a csv file a single row that should be enough to recreate this Example afterward.
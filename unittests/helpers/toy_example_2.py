@@ -84,6 +84,14 @@ class ToyExample2(Example):
         return chunked_examples
 
 
+    def get_source_filepaths(self, src_data_dirpath=None, tgt_data_dirpath=None, **kwargs):
+        """
+        The data of this example is loaded from a source and a target file.
+        """
+        return [os.path.join(src_data_dirpath, '%s.npy' % self.name),
+                os.path.join(tgt_data_dirpath, '%s.npy' % self.name)]
+
+
     def to_csv_row(self):
         """
         This is used to write in a csv file a single row that should be enough to recreate this Example afterward.
@@ -1,9 +1,13 @@
 import unittest
 import tempfile
 import os
+import math
+import tensorflow as tf
 
 import tfrecorder.factory as tf_factory
+import tfrecorder.helpers.engine as engine
 import tfrecorder.helpers.constants as cts
+import tfrecorder.config.parser as config_parser
 from tfrecorder.helpers.marshaller import Example
 import unittests.helpers.toy as toy
 from unittests.helpers.toy_example_1 import ToyExample1
@@ -12,6 +16,35 @@ from unittests.helpers.toy_example_2 import ToyExample2
 
 class FactoryTestCase(unittest.TestCase):
 
+    @staticmethod
+    def _generate_corpus(tmp_directory_path):
+        """
+        Generates 30 toy examples, and saves them in several small tfrecords files.
+
+        Returns:
+            save_directory_path: str, the directory of the tfrecords files.
+            tfrecord_filepaths: list, of str, the paths of the tfrecords files.
+        """
+        corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+        examples = toy.generate_toy_examples(corpus_directory_path,
+                                             example_class=ToyExample1,
+                                             num_examples=30,
+                                             data_shape=[10, 3])
+
+        save_directory_path = os.path.join(tmp_directory_path, 'tfrecords')
+        engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                              examples,
+                                                              examples_tfrecords_files_max_size_in_bytes=500,
+                                                              data_dirpath=corpus_directory_path)
+
+        return save_directory_path, tf_factory.get_tfrecord_filepaths(save_directory_path)
+
+
+    @staticmethod
+    def _get_names(dataset):
+        return [name for name, _, _, _ in dataset.as_numpy_iterator()]
+
+
 
 
 
@@ -155,6 +188,10 @@ class FactoryTestCase(unittest.TestCase):
                                                      example_class=example_class,
                                                      num_examples=num_examples)
 
+                # releasing the examples resets their @tfrecordable attributes, so each run re-instantiates them
+                examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+                Example.to_csv_file(examples_list_filepath, examples)
+
                 kwargs = {}
                 if example_class is ToyExample1:
                     kwargs.update(dict(data_dirpath = corpus_directory_path))
@@ -170,7 +207,7 @@ class FactoryTestCase(unittest.TestCase):
                     save_directory_path = os.path.join(tmp_directory_path, 'tfrecords_%d' % i)
 
                     tf_factory.generate_and_save_train_eval_test_tfrecords_files_for_examples(save_directory_path,
-                                                                                              examples,
+                                                                                              example_class.from_csv_file(examples_list_filepath, **kwargs),
                                                                                               ratios,
                                                                                               **kwargs)
 
@@ -226,6 +263,242 @@ class FactoryTestCase(unittest.TestCase):
                 self._test_train_eval_test_sets_directories(save_directory_path, expect_config_file=True)
 
 
+    def test_generate_and_save_train_eval_test_tfrecords_files_with_append(self):
+        """
+        Here we append the examples of a csv file to train/eval/test sets twice, and check that the config file counts
+        all the examples.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            num_examples = 13
+            ratios = [0.5, 0.3, 0.2]
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 example_class=ToyExample1,
+                                                 num_examples=num_examples)
+
+            examples_list_filepath = os.path.join(corpus_directory_path, cts.EXAMPLES_LIST_FILENAME)
+            Example.to_csv_file(examples_list_filepath, examples)
+
+            save_directory_path = os.path.join(tmp_directory_path, 'tfrecords')
+
+            for examples_append in [False, True]:
+                tf_factory.generate_and_save_train_eval_test_tfrecords_files(save_directory_path,
+                                                                             ToyExample1,
+                                                                             examples_list_filepath,
+                                                                             ratios,
+                                                                             examples_append=examples_append,
+                                                                             data_dirpath=corpus_directory_path)
+
+            counts = config_parser.load_counts(os.path.join(save_directory_path,
+                                                            cts.EXAMPLES_TFRECORD_FILES_CONFIG_FILENAME))
+            self.assertEqual(2*num_examples, sum(counts.values()))
+
+            # the examples csv files have been extended as well
+            for subdir_name, count in counts.items():
+                with open(tf_factory.get_examples_list_filepaths(os.path.join(save_directory_path, subdir_name))) as f:
+                    self.assertEqual(count, len(f.readlines()))
+
+
+    def test_generate_dataset_with_batched_parse(self):
+        """
+        Here we check that parsing the records by batches yields the same batches as parsing them one at a time and
+        batching them, including when the arrays of the records of a batch have different sizes (the last chunk of
+        each example).
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            corpus_directory_path = os.path.join(tmp_directory_path, 'corpus')
+            examples = toy.generate_toy_examples(corpus_directory_path,
+                                                 example_class=ToyExample2,
+                                                 num_examples=7,
+                                                 data_shape=[37, 3])
+
+            save_directory_path = os.path.join(tmp_directory_path, 'tfrecords')
+            engine.generate_and_save_tfrecords_files_for_examples(save_directory_path,
+                                                                  examples,
+                                                                  src_data_dirpath=os.path.join(corpus_directory_path, 'src'),
+                                                                  tgt_data_dirpath=os.path.join(corpus_directory_path, 'tgt'),
+                                                                  chunk_size_in_bins=5)
+
+            tfrecord_filepaths = tf_factory.get_tfrecord_filepaths(save_directory_path)
+            expected_dataset = tf_factory.generate_dataset(tfrecord_filepaths, ToyExample2).ragged_batch(6)
+            dataset = tf_factory.generate_dataset(tfrecord_filepaths,
+                                                  ToyExample2,
+                                                  dataset_parse_mode=cts.DATASET_PARSE_MODE_BATCHED,
+                                                  dataset_parse_batch_size=6)
+
+            self.assertEqual(expected_dataset.element_spec, dataset.element_spec)
+
+            expected_batches = list(expected_dataset)
+            batches = list(dataset)
+
+            self.assertEqual(math.ceil(7 * 8 / 6), len(batches))
+            for batch, expected_batch in zip(batches, expected_batches):
+                for v, expected_v in zip(batch, expected_batch):
+                    self.assertEqual(expected_v.dtype, v.dtype)
+                    self.assertIs(type(expected_v), type(v))
+                    if isinstance(v, tf.RaggedTensor):
+                        self.assertEqual(expected_v.to_list(), v.to_list())
+                    else:
+                        self.assertEqual(expected_v.numpy().tolist(), v.numpy().tolist())
+
+            self.assertRaises(ValueError, tf_factory.generate_dataset, tfrecord_filepaths, ToyExample2,
+                              dataset_parse_mode='vectorized')
+
+
+    def test_generate_dataset_with_shuffle_and_interleave(self):
+        """
+        Here we check that the tfrecords files are shuffled rather than their records, and that the records of several
+        files are interleaved.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            save_directory_path, tfrecord_filepaths = self._generate_corpus(tmp_directory_path)
+            self.assertLess(4, len(tfrecord_filepaths))
+
+            names_per_file = [self._get_names(tf_factory.generate_dataset([fp], ToyExample1)) for fp in tfrecord_filepaths]
+
+            # by default, the files are read one after another
+            self.assertEqual(sum(names_per_file, []), self._get_names(tf_factory.generate_dataset(tfrecord_filepaths, ToyExample1)))
+
+            # the shuffled files are still read one after another, in another order at each iteration
+            dataset = tf_factory.generate_dataset(tfrecord_filepaths,
+                                                  ToyExample1,
+                                                  dataset_num_shuffled_tfrecord_files=len(tfrecord_filepaths),
+                                                  dataset_shuffle_seed=0)
+
+            orders = []
+            for _ in range(3):
+                names = self._get_names(dataset)
+                order = []
+                while names:
+                    file_names = next(fn for fn in names_per_file if fn == names[:len(fn)])
+                    order.append(names_per_file.index(file_names))
+                    names = names[len(file_names):]
+                orders.append(order)
+
+            self.assertEqual(sorted(orders[0]), list(range(len(tfrecord_filepaths))))
+            self.assertNotEqual(orders[0], orders[1])
+
+            # the records of 2 files are interleaved, 2 at a time
+            dataset = tf_factory.generate_dataset(tfrecord_filepaths[:2],
+                                                  ToyExample1,
+                                                  dataset_interleave_cycle_length=2,
+                                                  dataset_interleave_block_length=2)
+
+            expected_names = []
+            for i in range(0, max(len(fn) for fn in names_per_file[:2]), 2):
+                expected_names += names_per_file[0][i:i + 2] + names_per_file[1][i:i + 2]
+            self.assertEqual(expected_names, self._get_names(dataset))
+
+            # in parallel, but in the same order
+            dataset = tf_factory.generate_dataset(tfrecord_filepaths[:2],
+                                                  ToyExample1,
+                                                  dataset_interleave_cycle_length=2,
+                                                  dataset_interleave_block_length=2,
+                                                  dataset_interleave_num_parallel_calls=2)
+            self.assertEqual(expected_names, self._get_names(dataset))
+
+            # in parallel, and not deterministically
+            dataset = tf_factory.generate_dataset(tfrecord_filepaths,
+                                                  ToyExample1,
+                                                  dataset_interleave_cycle_length=3,
+                                                  dataset_interleave_num_parallel_calls=3,
+                                                  dataset_deterministic=False)
+
+            self.assertEqual(sorted(sum(names_per_file, [])), sorted(self._get_names(dataset)))
+            self.assertEqual(30, int(dataset.cardinality()))
+
+
+    def test_generate_dataset_with_cache(self):
+        """
+        Here we check that the cached records are read again without reading the tfrecords files, and that the disk
+        cache is rebuilt when the files change.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            save_directory_path, tfrecord_filepaths = self._generate_corpus(tmp_directory_path)
+            cache_directory_path = os.path.join(save_directory_path, cts.DATASET_CACHE_DIRECTORY_NAME)
+
+            expected_names = self._get_names(tf_factory.generate_dataset(tfrecord_filepaths, ToyExample1))
+
+            memory_dataset = tf_factory.generate_dataset(tfrecord_filepaths,
+                                                         ToyExample1,
+                                                         dataset_cache=cts.DATASET_CACHE_MEMORY)
+            disk_dataset = tf_factory.generate_dataset(tfrecord_filepaths,
+                                                       ToyExample1,
+                                                       dataset_cache=cts.DATASET_CACHE_DISK)
+
+            self.assertEqual(expected_names, self._get_names(memory_dataset))
+            self.assertEqual(expected_names, self._get_names(disk_dataset))
+            cache_filenames = os.listdir(cache_directory_path)
+            self.assertTrue(cache_filenames)
+
+            # another subset of the files is cached next to them
+            subset_disk_dataset = tf_factory.generate_dataset(tfrecord_filepaths[2:4],
+                                                              ToyExample1,
+                                                              dataset_cache=cts.DATASET_CACHE_DISK)
+            subset_expected_names = self._get_names(subset_disk_dataset)
+            subset_cache_filenames = set(os.listdir(cache_directory_path)) - set(cache_filenames)
+            self.assertTrue(subset_cache_filenames)
+
+            # the first file now holds the records of the second one, which the cached datasets do not read
+            with open(tfrecord_filepaths[1], 'rb') as f:
+                data = f.read()
+            with open(tfrecord_filepaths[0], 'wb') as f:
+                f.write(data)
+
+            self.assertEqual(expected_names, self._get_names(memory_dataset))
+            self.assertEqual(expected_names, self._get_names(disk_dataset))
+
+            # while a new dataset rebuilds the disk cache, and removes the stale one
+            new_expected_names = self._get_names(tf_factory.generate_dataset(tfrecord_filepaths, ToyExample1))
+            self.assertNotEqual(expected_names, new_expected_names)
+
+            disk_dataset = tf_factory.generate_dataset(tfrecord_filepaths,
+                                                       ToyExample1,
+                                                       dataset_cache=cts.DATASET_CACHE_DISK)
+
+            self.assertFalse(set(cache_filenames) & set(os.listdir(cache_directory_path)))
+
+            # the cache of the other subset of the files is not stale, and is kept
+            cache_filenames = set(os.listdir(cache_directory_path))
+            self.assertLessEqual(subset_cache_filenames, cache_filenames)
+
+            subset_disk_dataset = tf_factory.generate_dataset(tfrecord_filepaths[2:4],
+                                                              ToyExample1,
+                                                              dataset_cache=cts.DATASET_CACHE_DISK)
+            self.assertEqual(subset_expected_names, self._get_names(subset_disk_dataset))
+            self.assertEqual(cache_filenames, set(os.listdir(cache_directory_path)))
+            self.assertEqual(new_expected_names, self._get_names(disk_dataset))
+            self.assertEqual(new_expected_names, self._get_names(disk_dataset))
+
+            # the records are shuffled after the cache, and not cached beyond the memory budget
+            dataset = tf_factory.generate_dataset(tfrecord_filepaths,
+                                                  ToyExample1,
+                                                  dataset_num_shuffled_records=30,
+                                                  dataset_shuffle_seed=0,
+                                                  dataset_cache=cts.DATASET_CACHE_MEMORY)
+            names = [self._get_names(dataset) for _ in range(2)]
+            self.assertEqual(sorted(new_expected_names), sorted(names[0]))
+            self.assertNotEqual(names[0], names[1])
+
+            with self.assertLogs(engine.LOGGER_NAME, level='WARNING'):
+                dataset = tf_factory.generate_dataset(tfrecord_filepaths,
+                                                      ToyExample1,
+                                                      dataset_cache=cts.DATASET_CACHE_MEMORY,
+                                                      dataset_cache_max_size_in_bytes=100)
+            self.assertEqual(new_expected_names, self._get_names(dataset))
+
+            self.assertRaises(ValueError, tf_factory.generate_dataset, tfrecord_filepaths, ToyExample1,
+                              dataset_cache='snapshot')
+
+
     # common tests routines
 
     def _test_train_eval_test_sets_directories(self, save_directory_path, expect_test_set=True, expect_config_file=False):
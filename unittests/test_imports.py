@@ -0,0 +1,75 @@
+import unittest
+import tempfile
+import subprocess
+import sys
+import os
+
+# the root of the repository, from which the modules are imported
+ROOT_DIRECTORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ImportsTestCase(unittest.TestCase):
+
+
+    def run_python(self, code):
+        """
+        Runs code in a fresh python interpreter, where nothing has been imported yet, and returns what it prints.
+        """
+        completed_process = subprocess.run([sys.executable, '-c', code],
+                                           cwd=ROOT_DIRECTORY_PATH,
+                                           stdout=subprocess.PIPE,
+                                           stderr=subprocess.PIPE,
+                                           check=True)
+
+        return completed_process.stdout.decode('utf-8').strip().splitlines()[-1]
+
+
+    def test_tensorflow_is_imported_lazily(self):
+        """
+        Here we check that importing tfrecorder, defining Example subclasses, and writing and reading tfrecord files
+        without tensorflow never import it.
+        """
+        with tempfile.TemporaryDirectory() as tmp_directory_path:
+
+            code = '\n'.join(['import sys, os',
+                              'import tfrecorder.factory, tfrecorder.helpers.checker',
+                              'import tfrecorder.helpers.engine as engine',
+                              'import tfrecorder.helpers.reader as reader',
+                              'import unittests.helpers.toy as toy',
+                              'from unittests.helpers.toy_example_2 import ToyExample2',
+                              'd = %r' % tmp_directory_path,
+                              'examples = toy.generate_toy_examples(os.path.join(d, "corpus"), ToyExample2, num_examples=3, data_shape=[7, 3])',
+                              'engine.generate_and_save_tfrecords_files_for_examples(os.path.join(d, "tfrecords"), examples,'
+                              '    examples_tfrecords_files_writer_backend="python",'
+                              '    src_data_dirpath=os.path.join(d, "corpus", "src"),'
+                              '    tgt_data_dirpath=os.path.join(d, "corpus", "tgt"),'
+                              '    chunk_size_in_bins=5)',
+                              'records = list(reader.NumpyReader(tfrecorder.factory.get_tfrecord_filepaths(os.path.join(d, "tfrecords")), ToyExample2))',
+                              'print(len(records), "tensorflow" in sys.modules)'])
+
+            self.assertEqual('6 False', self.run_python(code))
+
+        # it is imported when first needed
+        code = '\n'.join(['import sys',
+                          'import numpy as np',
+                          'from unittests.helpers.toy_example_1 import ToyExample1',
+                          'example = ToyExample1("name", 0, 0., None)',
+                          'example.data = np.zeros(3, dtype=np.float32)',
+                          'example.serialize_to_string()',
+                          'print("tensorflow" in sys.modules)'])
+
+        self.assertEqual('True', self.run_python(code))
+
+
+    def test_posix_modules_are_imported_lazily(self):
+        """
+        Here we check that the engine can be imported where the resource module does not exist (e.g. on windows), the
+        profiler then reporting the peak resident set size as unknown.
+        """
+        code = '\n'.join(['import sys',
+                          'sys.modules["resource"] = None # makes import resource fail',
+                          'import tfrecorder.helpers.engine',
+                          'import tfrecorder.helpers.profiler as profiler',
+                          'print(profiler.get_peak_rss_in_bytes())'])
+
+        self.assertEqual('None', self.run_python(code))